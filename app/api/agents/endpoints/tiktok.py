@@ -1,41 +1,311 @@
 """
 Endpoints para la API de TikTok Scraper.
 """
+import asyncio
+import json
+import threading
+from typing import Optional
+
 from fastapi import APIRouter, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, StreamingResponse
 
 from app.api.agents.services.tiktok_service.tiktok_scraper import TikTokScraperService
+from app.api.agents.services.tiktok_service.tiktok_browser_pool import obtener_pool_navegadores
+from app.api.agents.services.tiktok_service.tiktok_jobs import gestor_trabajos
+from app.api.agents.services.tiktok_service.tiktok_waits import estadisticas_esperas
+from app.api.agents.services.tiktok_service.tiktok_persistencia import obtener_persistidor
+from app.api.agents.services.tiktok_service.tiktok_vistos import obtener_filtro_vistos
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import obtener_prefiltro
+from app.api.agents.services.tiktok_service.tiktok_cache_clasificacion import obtener_cache_clasificacion
+from app.api.agents.services.tiktok_service.tiktok_clasificador_llm import obtener_clasificador_llm
+from app.api.agents.services.tiktok_service.tiktok_clasificador_local import obtener_clasificador_local
 
 router = APIRouter()
 
+
+def _parsear_num_videos(num_videos: str) -> int:
+    """
+    Convierte y valida el parámetro num_videos.
+
+    Args:
+        num_videos: Número de videos recibido como texto
+
+    Returns:
+        int: Número de videos validado
+    """
+    try:
+        num_videos_int = int(num_videos)
+        if num_videos_int < 1:
+            raise ValueError("El número de videos debe ser mayor que 0")
+        return num_videos_int
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=f"Parámetro inválido: {str(e)}")
+
+
 @router.get("/transcribe")
 async def tiktok_transcribe(num_videos: str = "1"):
     """
     Endpoint para procesar videos de TikTok y extraer información relevante.
-    
+
     Args:
         num_videos: Número de videos a procesar
-        
+
     Returns:
         JSONResponse con los resultados del procesamiento
     """
+    num_videos_int = _parsear_num_videos(num_videos)
+
     try:
-        # Convertimos el parámetro a entero
-        num_videos_int = int(num_videos)
-        if num_videos_int < 1:
-            raise ValueError("El número de videos debe ser mayor que 0")
-        
-        # Creamos e iniciamos el servicio
-        scraper_service = TikTokScraperService()
-        results = await scraper_service.procesar_videos(num_videos_int)
-        
+        # Comparte el límite de crawls simultáneos con la cola de trabajos
+        async with gestor_trabajos.semaforo:
+            scraper_service = TikTokScraperService(pool=obtener_pool_navegadores())
+            results = await scraper_service.procesar_videos(num_videos_int)
+
         # Si hay un error, lanzamos una excepción
         if "error" in results:
             raise HTTPException(status_code=500, detail=results["error"])
-        
+
         return results
-        
+
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Error en el servidor: {str(e)}")
+
+
+def _formatear_evento(tipo: str, datos: dict, formato: str) -> str:
+    """
+    Serializa un evento del stream en NDJSON o SSE.
+
+    Args:
+        tipo: Tipo de evento ("video" o "fin")
+        datos: Datos del evento
+        formato: "ndjson" o "sse"
+
+    Returns:
+        str: Evento listo para enviar
+    """
+    if formato == "sse":
+        return f"event: {tipo}\ndata: {json.dumps(datos, ensure_ascii=False, default=str)}\n\n"
+    return json.dumps({"tipo": tipo, **datos}, ensure_ascii=False, default=str) + "\n"
+
+
+async def _generar_eventos_transcripcion(num_videos: int, formato: str):
+    """
+    Procesa videos y emite el resultado de cada uno en cuanto se guarda.
+
+    Espera un hueco en el límite de crawls simultáneos de la cola de trabajos.
+    Si el cliente se desconecta, se cancela el procesamiento antes del siguiente video.
+
+    Args:
+        num_videos: Número de videos a procesar
+        formato: "ndjson" o "sse"
+
+    Yields:
+        str: Eventos serializados
+    """
+    loop = asyncio.get_running_loop()
+    cola: asyncio.Queue = asyncio.Queue()
+    cancelacion = threading.Event()
+
+    def al_procesar_video(video_result):
+        # Se invoca desde los hilos del scraper
+        loop.call_soon_threadsafe(cola.put_nowait, video_result)
+
+    async with gestor_trabajos.semaforo:
+        scraper_service = TikTokScraperService(pool=obtener_pool_navegadores())
+        tarea = asyncio.ensure_future(scraper_service.procesar_videos(
+            num_videos,
+            al_procesar_video=al_procesar_video,
+            cancelacion=cancelacion,
+            conservar_resultados=False
+        ))
+
+        try:
+            while True:
+                siguiente = asyncio.ensure_future(cola.get())
+                await asyncio.wait({siguiente, tarea}, return_when=asyncio.FIRST_COMPLETED)
+                if siguiente.done():
+                    yield _formatear_evento("video", siguiente.result(), formato)
+                    continue
+
+                siguiente.cancel()
+                while not cola.empty():
+                    yield _formatear_evento("video", cola.get_nowait(), formato)
+
+                try:
+                    resultado = tarea.result()
+                except Exception as e:
+                    resultado = {"error": f"Error en el servidor: {str(e)}"}
+                resultado.pop("results", None)
+                yield _formatear_evento("fin", resultado, formato)
+                break
+        finally:
+            cancelacion.set()
+            # Conserva el hueco hasta que el crawl se detenga de verdad
+            await asyncio.wait({tarea})
+
+
+@router.get("/transcribe/stream")
+async def tiktok_transcribe_stream(num_videos: str = "1", formato: str = "ndjson"):
+    """
+    Variante en streaming de /transcribe: emite cada video en cuanto se guarda.
+
+    Args:
+        num_videos: Número de videos a procesar
+        formato: "ndjson" (una línea JSON por video) o "sse" (Server-Sent Events)
+
+    Returns:
+        StreamingResponse con un evento por video y un evento final
+    """
+    num_videos_int = _parsear_num_videos(num_videos)
+    if formato not in ("ndjson", "sse"):
+        raise HTTPException(status_code=400, detail="Parámetro inválido: formato debe ser 'ndjson' o 'sse'")
+
+    media_type = "text/event-stream" if formato == "sse" else "application/x-ndjson"
+    return StreamingResponse(
+        _generar_eventos_transcripcion(num_videos_int, formato),
+        media_type=media_type,
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@router.post("/jobs", status_code=202)
+async def crear_trabajo(num_videos: str = "1", num_procesos: str = "1"):
+    """
+    Encola un trabajo de scraping y devuelve su ID de inmediato.
+
+    Args:
+        num_videos: Número de videos a procesar
+        num_procesos: Número de procesos en paralelo, cada uno con su navegador
+
+    Returns:
+        Estado inicial del trabajo
+    """
+    num_videos_int = _parsear_num_videos(num_videos)
+    try:
+        num_procesos_int = int(num_procesos)
+        if num_procesos_int < 1:
+            raise ValueError("El número de procesos debe ser mayor que 0")
     except ValueError as e:
         raise HTTPException(status_code=400, detail=f"Parámetro inválido: {str(e)}")
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error en el servidor: {str(e)}")
\ No newline at end of file
+
+    trabajo = gestor_trabajos.crear_trabajo(num_videos_int, num_procesos_int)
+    return trabajo.a_dict(incluir_resultados=False)
+
+
+@router.get("/jobs")
+async def listar_trabajos(estado: Optional[str] = None):
+    """
+    Lista los trabajos de scraping conocidos.
+
+    Args:
+        estado: Filtra por estado (en_cola, ejecutando, completado, fallido, cancelado)
+
+    Returns:
+        Lista de trabajos sin los resultados por video
+    """
+    trabajos = gestor_trabajos.listar(estado)
+    return {"jobs": [trabajo.a_dict(incluir_resultados=False) for trabajo in trabajos]}
+
+
+@router.get("/jobs/{job_id}")
+async def obtener_trabajo(job_id: str):
+    """
+    Devuelve el estado, el progreso por video y el resultado de un trabajo.
+
+    Args:
+        job_id: ID del trabajo
+
+    Returns:
+        Estado completo del trabajo
+    """
+    trabajo = gestor_trabajos.obtener(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+    return trabajo.a_dict()
+
+
+@router.delete("/jobs/{job_id}")
+async def cancelar_trabajo(job_id: str):
+    """
+    Cancela un trabajo en cola o detiene uno en ejecución tras el video actual.
+
+    Args:
+        job_id: ID del trabajo
+
+    Returns:
+        Estado del trabajo tras solicitar la cancelación
+    """
+    trabajo = gestor_trabajos.cancelar(job_id)
+    if not trabajo:
+        raise HTTPException(status_code=404, detail=f"Trabajo no encontrado: {job_id}")
+    return trabajo.a_dict(incluir_resultados=False)
+
+
+@router.get("/pool")
+async def estado_pool_navegadores():
+    """
+    Devuelve el estado del pool de navegadores reutilizables.
+
+    Returns:
+        Estadísticas del pool o indicación de que está desactivado
+    """
+    pool = obtener_pool_navegadores()
+    if not pool:
+        return {"activo": False}
+    return {"activo": True, **pool.obtener_estadisticas()}
+
+
+@router.get("/persistencia")
+async def estado_persistencia():
+    """
+    Devuelve el estado de la persistencia diferida.
+
+    Returns:
+        Registros enviados, guardados, rechazados, reintentos y derrame a disco
+    """
+    return obtener_persistidor().obtener_estadisticas()
+
+
+@router.get("/vistos")
+async def estado_filtro_vistos():
+    """
+    Devuelve el estado del filtro de videos ya vistos.
+
+    Returns:
+        Tamaño del filtro y videos descartados antes de capturarlos
+    """
+    filtro = obtener_filtro_vistos()
+    if filtro is None:
+        return {"activo": False}
+    return {"activo": True, **filtro.obtener_estadisticas()}
+
+
+@router.get("/clasificacion")
+async def estadisticas_de_clasificacion():
+    """
+    Devuelve cuántas clasificaciones se resolvieron sin llamar a OpenAI
+    (prefiltro local y caché de textos ya clasificados) y cómo se usó la API.
+
+    Returns:
+        Estadísticas del prefiltro, de la caché y de los clasificadores LLM y local
+    """
+    local = obtener_clasificador_local()
+    return {
+        "prefiltro": obtener_prefiltro().obtener_estadisticas(),
+        "cache": obtener_cache_clasificacion().obtener_estadisticas(),
+        "llm": obtener_clasificador_llm().obtener_estadisticas(),
+        "local": local.obtener_estadisticas() if local is not None else None
+    }
+
+
+@router.get("/esperas")
+async def estadisticas_de_esperas():
+    """
+    Devuelve cuánto tiempo real tomó cada tipo de espera del navegador.
+
+    Returns:
+        Estadísticas por espera (llamadas, timeouts y segundos)
+    """
+    return {"esperas": estadisticas_esperas.obtener()}
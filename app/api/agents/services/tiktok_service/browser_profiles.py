@@ -0,0 +1,172 @@
+"""
+Persistent Chrome user-data profiles for authenticated TikTok sessions.
+"""
+import os
+import json
+import time
+import uuid
+import shutil
+import threading
+from typing import Optional
+
+# Directory where profiles are stored (empty disables persistent profiles)
+PROFILES_DIR = os.getenv("TIKTOK_CHROME_PROFILES_DIR", "chrome_profiles")
+
+# Cookie that proves the TikTok session is authenticated
+SESSION_COOKIE = "sessionid"
+
+# Files and folders that are not copied into per-session copies
+_COPY_IGNORE = shutil.ignore_patterns(
+    "Singleton*", "*.lock", "lockfile", ".in_use",
+    "Cache", "Code Cache", "GPUCache", "ShaderCache", "GrShaderCache",
+    "CacheStorage", "ScriptCache", "Crashpad", "BrowserMetrics*"
+)
+
+_local_lock = threading.Lock()
+
+
+class ChromeProfile:
+    """Reusable Chrome user-data directory for one TikTok account."""
+
+    def __init__(self, account: str, cookies_path: str = "cookies.json", base_dir: str = PROFILES_DIR):
+        """
+        Initialize the profile.
+
+        Args:
+            account: Account name (used as the profile folder name)
+            cookies_path: Cookies file used to re-hydrate the session when it expires
+            base_dir: Directory containing all profiles
+        """
+        self.account = account
+        self.cookies_path = cookies_path
+        self.base_dir = os.path.abspath(base_dir)
+        self.base_path = os.path.join(self.base_dir, account)
+        self.sessions_dir = os.path.join(self.base_dir, "_sessions")
+        self._marker_path = os.path.join(self.base_path, ".validated")
+        self._lock_path = os.path.join(self.base_path, ".in_use")
+
+    @classmethod
+    def for_cookies(cls, cookies_path: str) -> Optional["ChromeProfile"]:
+        """
+        Build the profile associated with a cookies file.
+
+        Args:
+            cookies_path: Path to the cookies file (its name is the account name)
+
+        Returns:
+            ChromeProfile, or None if persistent profiles are disabled
+        """
+        if not PROFILES_DIR:
+            return None
+        account = os.path.splitext(os.path.basename(cookies_path))[0] or "default"
+        return cls(account, cookies_path)
+
+    def _cookies_mtime(self) -> float:
+        """Return the modification time of the cookies file (0 if missing)."""
+        try:
+            return os.path.getmtime(self.cookies_path)
+        except OSError:
+            return 0.0
+
+    def is_validated(self) -> bool:
+        """
+        Check whether the base profile holds a session validated from the current cookies file.
+
+        Returns:
+            bool: True if the cookie dance can be skipped
+        """
+        try:
+            with open(self._marker_path, "r", encoding="utf-8") as f:
+                marker = json.load(f)
+        except (OSError, json.JSONDecodeError):
+            return False
+        # A newer cookies file means the user refreshed the session: re-hydrate
+        return marker.get("cookies_mtime", 0) >= self._cookies_mtime()
+
+    def mark_validated(self):
+        """Record that the base profile holds a valid session."""
+        os.makedirs(self.base_path, exist_ok=True)
+        with open(self._marker_path, "w", encoding="utf-8") as f:
+            json.dump({"validated_at": time.time(), "cookies_mtime": self._cookies_mtime()}, f)
+
+    def invalidate(self):
+        """Forget the validation so the next start re-hydrates from the cookies file."""
+        try:
+            os.remove(self._marker_path)
+        except OSError:
+            pass
+
+    def _try_lock_base(self) -> bool:
+        """
+        Try to take exclusive use of the base profile (across threads and processes).
+
+        Returns:
+            bool: True if the base profile is now owned by the caller
+        """
+        os.makedirs(self.base_path, exist_ok=True)
+        with _local_lock:
+            try:
+                fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._lock_is_stale():
+                    return False
+                os.remove(self._lock_path)
+                fd = os.open(self._lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            with os.fdopen(fd, "w") as f:
+                f.write(str(os.getpid()))
+            return True
+
+    def _lock_is_stale(self) -> bool:
+        """Check whether the lock file belongs to a process that no longer exists."""
+        try:
+            with open(self._lock_path, "r") as f:
+                pid = int(f.read().strip() or 0)
+            if pid == os.getpid():
+                return False
+            os.kill(pid, 0)
+            return False
+        except (OSError, ValueError):
+            return True
+
+    def acquire(self) -> str:
+        """
+        Get a user-data directory for a new browser session.
+
+        The first session uses the base profile directly; parallel sessions get a
+        copy of it so each Chrome has its own directory (copy-on-write).
+
+        Returns:
+            str: Path to pass as Chrome's user-data directory
+        """
+        if self._try_lock_base():
+            return self.base_path
+
+        os.makedirs(self.sessions_dir, exist_ok=True)
+        session_path = os.path.join(self.sessions_dir, f"{self.account}-{uuid.uuid4().hex[:8]}")
+        try:
+            shutil.copytree(self.base_path, session_path, ignore=_COPY_IGNORE)
+            print(f"Using a copy of profile '{self.account}' for a parallel session")
+        except (OSError, shutil.Error) as e:
+            print(f"Could not copy profile '{self.account}', starting empty: {str(e)}")
+            os.makedirs(session_path, exist_ok=True)
+        return session_path
+
+    def is_base(self, path: str) -> bool:
+        """Check whether a path returned by acquire() is the base profile."""
+        return os.path.abspath(path) == self.base_path
+
+    def release(self, path: str):
+        """
+        Release a directory returned by acquire().
+
+        Args:
+            path: The user-data directory used by the session
+        """
+        if self.is_base(path):
+            with _local_lock:
+                try:
+                    os.remove(self._lock_path)
+                except OSError:
+                    pass
+        else:
+            shutil.rmtree(path, ignore_errors=True)
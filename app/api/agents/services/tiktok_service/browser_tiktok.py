@@ -13,18 +13,26 @@ from selenium.webdriver.support import expected_conditions as EC
 from selenium.common.exceptions import TimeoutException, NoSuchElementException
 from fastapi import HTTPException
 
+from app.api.agents.services.tiktok_service.browser_profiles import ChromeProfile, SESSION_COOKIE
+from app.api.agents.services.tiktok_service.tiktok_network_comments import MODO_COMENTARIOS_RED, activar_captura_red
+
 class TikTokBrowser:
     """Class for managing browser automation for TikTok interactions."""
     
-    def __init__(self, cookies_path: str = "cookies.json"):
+    def __init__(self, cookies_path: str = "cookies.json", profile: Optional[ChromeProfile] = None,
+                 use_profile: bool = True):
         """
         Initialize the TikTok browser manager.
         
         Args:
             cookies_path: Path to the JSON file containing TikTok cookies
+            profile: Persistent Chrome profile to use (defaults to the one for cookies_path)
+            use_profile: Set to False to always start from a fresh profile
         """
         self.cookies_path = cookies_path
         self.driver = None
+        self.profile = profile or (ChromeProfile.for_cookies(cookies_path) if use_profile else None)
+        self.user_data_dir = None
         
     def _setup_browser(self):
         """
@@ -46,12 +54,23 @@ class TikTokBrowser:
             # Critical: Enable tab audio capture
             options.add_argument("--enable-features=TabAudioCapturing")
             
-            # Create the browser instance
-            driver = uc.Chrome(options=options, version_main=135)
+            # Network capture mode: keep CDP network events in the performance log
+            if MODO_COMENTARIOS_RED:
+                options.set_capability("goog:loggingPrefs", {"performance": "ALL"})
+            
+            # Create the browser instance, reusing the persistent profile if there is one
+            if self.profile:
+                self.user_data_dir = self.profile.acquire()
+                driver = uc.Chrome(options=options, version_main=135, user_data_dir=self.user_data_dir)
+            else:
+                driver = uc.Chrome(options=options, version_main=135)
             
             # Set window size to a common resolution
             driver.set_window_size(1280, 800)
             
+            if MODO_COMENTARIOS_RED:
+                activar_captura_red(driver)
+            
             return driver
             
         except Exception as e:
@@ -163,6 +182,16 @@ class TikTokBrowser:
             # Set up browser
             self.driver = self._setup_browser()
             
+            # With a validated profile the session is already in Chrome: skip the cookie dance
+            if self.profile and self.profile.is_validated():
+                print("Opening TikTok with persistent profile...")
+                self.driver.get("https://www.tiktok.com/foryou")
+                if self._has_session():
+                    print("Session restored from persistent profile")
+                    return self.driver
+                print("Persistent profile session expired, re-hydrating from cookies...")
+                self.profile.invalidate()
+            
             # Navigate to TikTok
             print("Opening TikTok...")
             self.driver.get("https://www.tiktok.com/")
@@ -184,17 +213,33 @@ class TikTokBrowser:
             # Navigate to "For You" feed
             self._navigate_to_for_you()
             
+            # Remember the session in the base profile for the next cold start
+            if self.profile and self.profile.is_base(self.user_data_dir) and self._has_session():
+                self.profile.mark_validated()
+                print(f"Persistent profile '{self.profile.account}' validated")
+            
             return self.driver
             
         except Exception as e:
             # Clean up on error
-            if self.driver:
-                self.driver.quit()
+            self.close()
             raise HTTPException(
                 status_code=500,
                 detail=f"Failed to navigate to TikTok: {str(e)}"
             )
     
+    def _has_session(self):
+        """
+        Check whether the browser holds an authenticated TikTok session.
+        
+        Returns:
+            bool: True if the session cookie is present
+        """
+        try:
+            return self.driver.get_cookie(SESSION_COOKIE) is not None
+        except Exception:
+            return False
+    
     def _navigate_to_for_you(self):
         """Navigate to the 'For You' feed on TikTok."""
         try:
@@ -261,6 +306,23 @@ class TikTokBrowser:
             print(f"Error scrolling to next video: {str(e)}")
             return False
     
+    def is_alive(self):
+        """
+        Check whether the browser session is still usable.
+        
+        Returns:
+            bool: True if the driver responds and is on TikTok
+        """
+        if not self.driver:
+            return False
+        try:
+            if not self.driver.window_handles:
+                return False
+            return "tiktok.com" in self.driver.current_url
+        except Exception as e:
+            print(f"Browser health check failed: {str(e)}")
+            return False
+    
     def close(self):
         """Close the browser and clean up resources."""
         if self.driver:
@@ -268,4 +330,7 @@ class TikTokBrowser:
                 self.driver.quit()
             except:
                 pass
-            self.driver = None
\ No newline at end of file
+            self.driver = None
+        if self.profile and self.user_data_dir:
+            self.profile.release(self.user_data_dir)
+            self.user_data_dir = None
\ No newline at end of file
@@ -0,0 +1,236 @@
+"""
+Interfaz de almacenamiento de los datos de TikTok y selección del backend (PostgreSQL o SQLite).
+"""
+import os
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+# Backend de almacenamiento: "postgres" (por defecto) o "sqlite"
+BACKEND_ALMACEN = os.getenv("TIKTOK_ALMACEN", "postgres").lower()
+
+# Archivo de la base de datos cuando se usa SQLite
+RUTA_SQLITE = os.getenv("TIKTOK_SQLITE_RUTA", "tiktok.db")
+
+
+class AlmacenTikTok(ABC):
+    """
+    Almacenamiento de redes sociales, canales, videos y comentarios.
+
+    Las implementaciones guardan lotes de registros en una transacción con la misma
+    semántica que tiktok_database.guardar_registros: un registro inválido se rechaza
+    sin afectar al resto y los errores de conexión se propagan para reintentar.
+    """
+
+    # Excepciones de guardar_registros que indican que la base de datos no está
+    # disponible (se reintentan); cualquier otra rechaza el lote
+    errores_conexion: Tuple[type, ...] = (Exception,)
+
+    @abstractmethod
+    def guardar_registros(self, registros: List[Dict[str, Any]]) -> List[Any]:
+        """
+        Guarda un lote de registros de videos ('video') y comentarios ('comentarios').
+
+        Args:
+            registros: Registros con el formato de tiktok_database.guardar_registros
+
+        Returns:
+            list: Por cada registro, el diccionario de IDs generados o la excepción que lo rechazó
+        """
+
+    @abstractmethod
+    def obtener_id_canal(self, url: str) -> Optional[int]:
+        """
+        Busca un canal por su URL.
+
+        Args:
+            url: URL del canal
+
+        Returns:
+            ID del canal o None si no existe
+        """
+
+    @abstractmethod
+    def obtener_id_video(self, video_id: str) -> Optional[int]:
+        """
+        Busca un video guardado por su ID de TikTok.
+
+        Args:
+            video_id: ID del video en TikTok
+
+        Returns:
+            ID del registro en scrapper_results o None si no existe
+        """
+
+    @abstractmethod
+    def listar_video_ids(self) -> Iterable[str]:
+        """
+        Recorre los ID de TikTok de todos los videos guardados.
+
+        Returns:
+            Iterable de video_id
+        """
+
+    @abstractmethod
+    def listar_transcripciones(self) -> Iterable[str]:
+        """
+        Recorre las transcripciones guardadas (todas de videos clasificados como políticos).
+
+        Returns:
+            Iterable de textos
+        """
+
+    def guardar_video(self, info_channel: Dict[str, Any], info_video: Dict[str, Any],
+                      info_comments: Optional[List[Dict[str, Any]]] = None,
+                      subtitulos: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Guarda un video con su canal y comentarios en su propia transacción.
+
+        Args:
+            info_channel: Diccionario con información del canal
+            info_video: Diccionario con información del video
+            info_comments: Lista de diccionarios con información de comentarios
+            subtitulos: Texto completo de los subtítulos capturados (opcional)
+
+        Returns:
+            Diccionario con los IDs generados
+
+        Raises:
+            Exception: Si el registro fue rechazado
+        """
+        resultado = self.guardar_registros([{
+            "tipo": "video",
+            "info_channel": info_channel,
+            "info_video": info_video,
+            "info_comments": info_comments or [],
+            "subtitulos": subtitulos
+        }])[0]
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado
+
+    def guardar_comentarios(self, video_id: str, comentarios: List[Dict[str, Any]]) -> List[int]:
+        """
+        Guarda comentarios de un video ya guardado en su propia transacción.
+
+        Args:
+            video_id: ID del video en TikTok
+            comentarios: Lista de diccionarios con información de comentarios
+
+        Returns:
+            list: IDs de los comentarios insertados
+
+        Raises:
+            Exception: Si el registro fue rechazado
+        """
+        resultado = self.guardar_registros([{"tipo": "comentarios", "video_id": video_id, "comentarios": comentarios}])[0]
+        if isinstance(resultado, Exception):
+            raise resultado
+        return resultado["comments_ids"]
+
+    def cerrar(self):
+        """Libera las conexiones del almacén."""
+
+
+class AlmacenPostgres(AlmacenTikTok):
+    """
+    Almacén sobre PostgreSQL usando el pool de conexiones de tiktok_database.
+    """
+
+    def __init__(self):
+        """Carga la configuración de la base de datos."""
+        # Importación diferida: el backend SQLite no necesita psycopg2
+        from app.api.agents.services.tiktok_service import tiktok_database
+        self._db = tiktok_database
+        self.errores_conexion = tiktok_database.ERRORES_CONEXION
+        self._db.obtener_configuracion_db()
+
+    def guardar_registros(self, registros: List[Dict[str, Any]]) -> List[Any]:
+        return self._db.guardar_registros(registros)
+
+    def _buscar_id(self, consulta: str, valor: Any) -> Optional[int]:
+        """Ejecuta una consulta de un solo ID con una conexión del pool."""
+        with self._db.obtener_pool_conexiones().conexion() as conn:
+            with conn.cursor() as cur:
+                cur.execute(consulta, (valor,))
+                resultado = cur.fetchone()
+        return resultado[0] if resultado else None
+
+    def obtener_id_canal(self, url: str) -> Optional[int]:
+        channel_id = self._db.cache_ids.obtener(('channels', url))
+        if channel_id is None:
+            channel_id = self._buscar_id("SELECT id FROM channels WHERE url = %s", url)
+            if channel_id is not None:
+                self._db.cache_ids.guardar(('channels', url), channel_id)
+        return channel_id
+
+    def obtener_id_video(self, video_id: str) -> Optional[int]:
+        return self._buscar_id("SELECT id FROM scrapper_results WHERE video_id = %s", video_id)
+
+    def listar_video_ids(self) -> Iterable[str]:
+        with self._db.obtener_pool_conexiones().conexion() as conn:
+            # Cursor con nombre: las filas se leen del servidor por bloques
+            with conn.cursor(name="video_ids") as cur:
+                cur.itersize = 10000
+                cur.execute("SELECT video_id FROM scrapper_results WHERE video_id IS NOT NULL")
+                for (video_id,) in cur:
+                    yield video_id
+
+    def listar_transcripciones(self) -> Iterable[str]:
+        with self._db.obtener_pool_conexiones().conexion() as conn:
+            with conn.cursor(name="transcripciones") as cur:
+                cur.itersize = 1000
+                cur.execute("SELECT transcript FROM scrapper_results WHERE transcript IS NOT NULL AND transcript <> ''")
+                for (transcript,) in cur:
+                    yield transcript
+
+    def cerrar(self):
+        self._db.cerrar_pool_conexiones()
+
+
+_almacen: Optional[AlmacenTikTok] = None
+_almacen_lock = threading.Lock()
+
+
+def crear_almacen(backend: str = BACKEND_ALMACEN) -> AlmacenTikTok:
+    """
+    Crea un almacén del backend indicado.
+
+    Args:
+        backend: "postgres" o "sqlite"
+
+    Returns:
+        AlmacenTikTok: Almacén listo para usarse
+
+    Raises:
+        ValueError: Si el backend no existe
+    """
+    if backend == "postgres":
+        return AlmacenPostgres()
+    if backend == "sqlite":
+        from app.api.agents.services.tiktok_service.tiktok_almacen_sqlite import AlmacenSQLite
+        return AlmacenSQLite(RUTA_SQLITE)
+    raise ValueError(f"Backend de almacenamiento desconocido: {backend}")
+
+
+def obtener_almacen() -> AlmacenTikTok:
+    """
+    Devuelve el almacén compartido, creándolo según TIKTOK_ALMACEN si no existe.
+
+    Returns:
+        AlmacenTikTok: Almacén del proceso
+    """
+    global _almacen
+    with _almacen_lock:
+        if _almacen is None:
+            _almacen = crear_almacen()
+        return _almacen
+
+
+def cerrar_almacen():
+    """Cierra el almacén compartido si existe."""
+    global _almacen
+    with _almacen_lock:
+        if _almacen is not None:
+            _almacen.cerrar()
+            _almacen = None
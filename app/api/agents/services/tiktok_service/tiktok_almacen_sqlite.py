@@ -0,0 +1,307 @@
+"""
+Almacén de datos de TikTok sobre SQLite para ejecuciones locales y benchmarks.
+"""
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from app.api.agents.services.tiktok_service.tiktok_almacen import AlmacenTikTok
+from app.api.agents.services.tiktok_service.tiktok_database import (
+    video_id_para_guardar, _filas_comentarios, COLUMNAS_COMENTARIOS, FILAS_POR_INSERT_COMENTARIOS
+)
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS social_networks (
+    id INTEGER PRIMARY KEY,
+    name TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS channels (
+    id INTEGER PRIMARY KEY,
+    social_network_id INTEGER REFERENCES social_networks (id),
+    name TEXT,
+    url TEXT NOT NULL UNIQUE
+);
+CREATE TABLE IF NOT EXISTS scrapper_results (
+    id INTEGER PRIMARY KEY,
+    channel_id INTEGER REFERENCES channels (id),
+    comment_count INTEGER,
+    like_count INTEGER,
+    view_count INTEGER,
+    scraped_at TIMESTAMP,
+    video_id TEXT UNIQUE,
+    transcript TEXT
+);
+CREATE TABLE IF NOT EXISTS comments (
+    id INTEGER PRIMARY KEY,
+    scrapper_result_id INTEGER REFERENCES scrapper_results (id),
+    username TEXT,
+    content TEXT,
+    like_count INTEGER,
+    comment_id TEXT,
+    reply_count INTEGER,
+    commented_at TIMESTAMP
+);
+CREATE INDEX IF NOT EXISTS comments_scrapper_result_id_idx ON comments (scrapper_result_id);
+"""
+
+# Columnas agregadas después de crear el esquema (migración 0002 en PostgreSQL)
+_COLUMNAS_AGREGADAS = {
+    "comments": (("comment_id", "TEXT"), ("reply_count", "INTEGER"), ("commented_at", "TIMESTAMP")),
+}
+
+
+class AlmacenSQLite(AlmacenTikTok):
+    """
+    Almacén sobre un archivo SQLite en modo WAL, con el mismo esquema que PostgreSQL.
+    """
+
+    errores_conexion = (sqlite3.OperationalError,)
+
+    def __init__(self, ruta: str):
+        """
+        Abre (o crea) la base de datos y su esquema.
+
+        Args:
+            ruta: Archivo de la base de datos (":memory:" para una base temporal)
+        """
+        self.ruta = ruta
+        # Una sola conexión compartida; el lock serializa las transacciones
+        self._conn = sqlite3.connect(ruta, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute("PRAGMA foreign_keys=ON")
+        self._conn.executescript(_ESQUEMA)
+        self._agregar_columnas()
+        self._crear_indice_comentarios()
+
+    def _agregar_columnas(self):
+        """Agrega a una base creada con un esquema anterior las columnas que le faltan."""
+        for tabla, columnas in _COLUMNAS_AGREGADAS.items():
+            existentes = {fila[1] for fila in self._conn.execute(f"PRAGMA table_info({tabla})")}
+            for nombre, tipo in columnas:
+                if nombre not in existentes:
+                    self._conn.execute(f"ALTER TABLE {tabla} ADD COLUMN {nombre} {tipo}")
+
+    def _crear_indice_comentarios(self):
+        """
+        Crea los índices únicos de comentarios (migración 0003 en PostgreSQL): por
+        comment_id para los capturados por red y por usuario y contenido para los del
+        DOM. Antes elimina los duplicados que pudiera tener una base anterior.
+        """
+        self._conn.executescript(
+            """
+            BEGIN;
+            DROP INDEX IF EXISTS comments_video_usuario_contenido_key;
+            DELETE FROM comments WHERE comment_id IS NOT NULL AND id NOT IN (
+                SELECT MIN(id) FROM comments WHERE comment_id IS NOT NULL
+                GROUP BY scrapper_result_id, comment_id
+            );
+            DELETE FROM comments WHERE comment_id IS NULL AND id NOT IN (
+                SELECT MIN(id) FROM comments WHERE comment_id IS NULL
+                GROUP BY scrapper_result_id, username, content
+            );
+            CREATE UNIQUE INDEX IF NOT EXISTS comments_video_comment_id_key
+                ON comments (scrapper_result_id, comment_id) WHERE comment_id IS NOT NULL;
+            CREATE UNIQUE INDEX IF NOT EXISTS comments_video_usuario_contenido_dom_key
+                ON comments (scrapper_result_id, username, content) WHERE comment_id IS NULL;
+            COMMIT;
+            """
+        )
+
+    def _upsert(self, cur, insercion: str, parametros: tuple) -> int:
+        """Ejecuta un INSERT ... ON CONFLICT DO UPDATE ... RETURNING id y devuelve el ID de la fila."""
+        cur.execute(insercion, parametros)
+        return cur.fetchone()[0]
+
+    def _guardar_video(self, cur, registro: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Guarda red social, canal, video y comentarios de un registro 'video'.
+
+        Args:
+            cur: Cursor dentro de la transacción
+            registro: Registro de tipo 'video'
+
+        Returns:
+            Diccionario con los IDs generados
+        """
+        info_channel = registro["info_channel"]
+        info_video = registro["info_video"]
+        video_id = video_id_para_guardar(info_video)
+        ids_generados = {
+            'social_network_id': None,
+            'channel_id': None,
+            'scrapper_result_id': None,
+            'comments_ids': [],
+            'video_id': video_id
+        }
+
+        # El DO UPDATE sin cambios hace que RETURNING devuelva también la fila existente
+        social_network_id = self._upsert(
+            cur,
+            "INSERT INTO social_networks (name) VALUES (?) "
+            "ON CONFLICT (name) DO UPDATE SET name = excluded.name RETURNING id",
+            ('TikTok',)
+        )
+        ids_generados['social_network_id'] = social_network_id
+
+        if not (info_channel.get('url') and info_channel.get('name')):
+            return ids_generados
+
+        channel_id = self._upsert(
+            cur,
+            "INSERT INTO channels (social_network_id, name, url) VALUES (?, ?, ?) "
+            "ON CONFLICT (url) DO UPDATE SET name = excluded.name RETURNING id",
+            (social_network_id, info_channel['name'], info_channel['url'])
+        )
+        ids_generados['channel_id'] = channel_id
+
+        scraped_at = datetime.now()
+        if info_video.get('fecha_exacta'):
+            try:
+                scraped_at = datetime.strptime(info_video['fecha_exacta'], '%Y-%m-%d %H:%M:%S')
+            except ValueError as e:
+                print(f"Error al convertir fecha_exacta: {e}")
+
+        # Si el video ya existe se conserva el registro original
+        scrapper_result_id = self._upsert(
+            cur,
+            """
+            INSERT INTO scrapper_results
+            (channel_id, comment_count, like_count, view_count, scraped_at, video_id, transcript)
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (video_id) DO UPDATE SET video_id = excluded.video_id
+            RETURNING id
+            """,
+            (
+                channel_id,
+                info_video.get('comentarios', 0),
+                info_video.get('likes', 0),
+                0,
+                scraped_at.strftime('%Y-%m-%d %H:%M:%S'),
+                video_id,
+                registro.get("subtitulos") or None
+            )
+        )
+        ids_generados['scrapper_result_id'] = scrapper_result_id
+        ids_generados['comments_ids'] = self._insertar_comentarios(
+            cur, scrapper_result_id, registro.get("info_comments") or []
+        )
+        return ids_generados
+
+    def _insertar_comentarios(self, cur, scrapper_result_id: int, comentarios: List[Dict[str, Any]]) -> List[int]:
+        """
+        Inserta comentarios con INSERT de varias filas, omitiendo los que el video ya tiene.
+
+        Args:
+            cur: Cursor dentro de la transacción
+            scrapper_result_id: ID del registro en scrapper_results
+            comentarios: Lista de diccionarios con información de comentarios
+
+        Returns:
+            list: IDs de los comentarios insertados, en orden; los repetidos no aparecen
+        """
+        filas = _filas_comentarios(scrapper_result_id, comentarios)
+        marcadores_fila = "(" + ", ".join("?" * len(COLUMNAS_COMENTARIOS.split(","))) + ")"
+        comments_ids = []
+        for inicio in range(0, len(filas), FILAS_POR_INSERT_COMENTARIOS):
+            pagina = filas[inicio:inicio + FILAS_POR_INSERT_COMENTARIOS]
+            cur.execute(
+                f"INSERT INTO comments ({COLUMNAS_COMENTARIOS}) "
+                f"VALUES {', '.join([marcadores_fila] * len(pagina))} "
+                "ON CONFLICT DO NOTHING RETURNING id",
+                [valor for fila in pagina for valor in fila]
+            )
+            comments_ids.extend(fila[0] for fila in cur.fetchall())
+        return comments_ids
+
+    def guardar_registros(self, registros: List[Dict[str, Any]]) -> List[Any]:
+        resultados = []
+        with self._lock:
+            cur = self._conn.cursor()
+            try:
+                cur.execute("BEGIN IMMEDIATE")
+                for registro in registros:
+                    cur.execute("SAVEPOINT registro")
+                    try:
+                        if registro["tipo"] == "video":
+                            resultado = self._guardar_video(cur, registro)
+                        else:
+                            video_id = registro["video_id"]
+                            cur.execute("SELECT id FROM scrapper_results WHERE video_id = ?", (video_id,))
+                            fila = cur.fetchone()
+                            if fila:
+                                comments_ids = self._insertar_comentarios(cur, fila[0], registro["comentarios"])
+                            else:
+                                print(f"El video {video_id} no está guardado. Se descartan {len(registro['comentarios'])} comentarios.")
+                                comments_ids = []
+                            resultado = {'video_id': video_id, 'comments_ids': comments_ids}
+                        cur.execute("RELEASE SAVEPOINT registro")
+                    except sqlite3.OperationalError:
+                        raise
+                    except Exception as e:
+                        print(f"Registro de tipo '{registro.get('tipo')}' rechazado por SQLite: {e}")
+                        cur.execute("ROLLBACK TO SAVEPOINT registro")
+                        cur.execute("RELEASE SAVEPOINT registro")
+                        resultado = e
+                    resultados.append(resultado)
+                cur.execute("COMMIT")
+            except Exception:
+                if self._conn.in_transaction:
+                    cur.execute("ROLLBACK")
+                raise
+            finally:
+                cur.close()
+        return resultados
+
+    def _buscar_id(self, consulta: str, valor: Any) -> Optional[int]:
+        """Ejecuta una consulta de un solo ID."""
+        with self._lock:
+            fila = self._conn.execute(consulta, (valor,)).fetchone()
+        return fila[0] if fila else None
+
+    def obtener_id_canal(self, url: str) -> Optional[int]:
+        return self._buscar_id("SELECT id FROM channels WHERE url = ?", url)
+
+    def obtener_id_video(self, video_id: str) -> Optional[int]:
+        return self._buscar_id("SELECT id FROM scrapper_results WHERE video_id = ?", video_id)
+
+    def _recorrer(self, consulta: str, tamano_bloque: int) -> Iterable[Any]:
+        """
+        Recorre la primera columna de una consulta leyendo las filas por bloques.
+
+        El lock se toma solo mientras se lee cada bloque, así los guardados no
+        esperan a que el llamador termine de recorrer.
+
+        Args:
+            consulta: Consulta de una columna
+            tamano_bloque: Filas leídas en cada bloque
+
+        Yields:
+            El valor de cada fila
+        """
+        with self._lock:
+            cur = self._conn.execute(consulta)
+        try:
+            while True:
+                with self._lock:
+                    filas = cur.fetchmany(tamano_bloque)
+                if not filas:
+                    return
+                for (valor,) in filas:
+                    yield valor
+        finally:
+            cur.close()
+
+    def listar_video_ids(self) -> Iterable[str]:
+        return self._recorrer("SELECT video_id FROM scrapper_results WHERE video_id IS NOT NULL", 10000)
+
+    def listar_transcripciones(self) -> Iterable[str]:
+        return self._recorrer(
+            "SELECT transcript FROM scrapper_results WHERE transcript IS NOT NULL AND transcript <> ''", 1000
+        )
+
+    def cerrar(self):
+        with self._lock:
+            self._conn.close()
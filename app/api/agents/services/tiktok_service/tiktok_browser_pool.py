@@ -0,0 +1,237 @@
+"""
+Pool de navegadores de TikTok ya autenticados y reutilizables entre peticiones.
+"""
+import os
+import queue
+import threading
+import time
+from typing import Dict, Any, Optional
+
+from app.api.agents.services.tiktok_service.browser_tiktok import TikTokBrowser
+
+# Tamaño del pool (0 desactiva el pool y cada petición abre su propio navegador).
+# Por defecto hay un navegador por cada trabajo que puede ejecutarse a la vez
+# (TIKTOK_MAX_TRABAJOS), así ningún crawl espera a que otro devuelva el suyo.
+TAMANO_POOL_NAVEGADORES = int(os.getenv("TIKTOK_POOL_NAVEGADORES",
+                                        os.getenv("TIKTOK_MAX_TRABAJOS", "2")))
+
+# Segundos máximos que una petición espera a que se libere un navegador.
+# Mientras espera ocupa un hilo del ejecutor de sesiones, por eso es corto.
+TIMEOUT_CHECKOUT = float(os.getenv("TIKTOK_POOL_TIMEOUT_CHECKOUT", "30"))
+
+# Número de sesiones tras las cuales un navegador se recicla (0 = sin límite)
+MAX_USOS_NAVEGADOR = int(os.getenv("TIKTOK_POOL_MAX_USOS", "50"))
+
+
+class TikTokBrowserPool:
+    """
+    Mantiene un conjunto de navegadores autenticados con checkout/checkin y verificación de salud.
+    """
+
+    def __init__(self, tamano: int = TAMANO_POOL_NAVEGADORES, cookies_path: str = "cookies.json",
+                 max_usos: int = MAX_USOS_NAVEGADOR):
+        """
+        Inicializa el pool sin abrir navegadores todavía.
+
+        Args:
+            tamano: Número máximo de navegadores en el pool
+            cookies_path: Ruta al archivo de cookies para autenticar los navegadores
+            max_usos: Número de sesiones tras las cuales se recicla un navegador
+        """
+        self.tamano = max(1, tamano)
+        self.cookies_path = cookies_path
+        self.max_usos = max_usos
+        self._libres: "queue.LifoQueue[TikTokBrowser]" = queue.LifoQueue()
+        self._usos: Dict[int, int] = {}
+        self._total = 0
+        self._lock = threading.Lock()
+        self._cerrado = False
+        self.estadisticas = {
+            "checkouts": 0,
+            "navegadores_creados": 0,
+            "navegadores_descartados": 0,
+            "segundos_arranque": 0.0
+        }
+
+    def _crear_navegador(self) -> TikTokBrowser:
+        """
+        Abre y autentica un navegador nuevo.
+
+        Returns:
+            TikTokBrowser: Navegador listo en el feed 'Para ti'
+        """
+        inicio = time.time()
+        browser = TikTokBrowser(self.cookies_path)
+        try:
+            browser.navigate_to_tiktok()
+        except Exception:
+            with self._lock:
+                self._total -= 1
+            raise
+
+        with self._lock:
+            self._usos[id(browser)] = 0
+            self.estadisticas["navegadores_creados"] += 1
+            self.estadisticas["segundos_arranque"] += time.time() - inicio
+        print(f"Navegador agregado al pool en {time.time() - inicio:.1f}s")
+        return browser
+
+    def _reservar_hueco(self) -> bool:
+        """
+        Reserva un hueco para crear un navegador nuevo si el pool no está lleno.
+
+        Returns:
+            bool: True si se reservó el hueco
+        """
+        with self._lock:
+            if self._total < self.tamano:
+                self._total += 1
+                return True
+            return False
+
+    def _descartar(self, browser: TikTokBrowser):
+        """
+        Cierra un navegador y libera su hueco en el pool.
+
+        Args:
+            browser: Navegador a descartar
+        """
+        browser.close()
+        with self._lock:
+            self._usos.pop(id(browser), None)
+            self._total -= 1
+            self.estadisticas["navegadores_descartados"] += 1
+
+    def precalentar(self):
+        """Abre navegadores hasta llenar el pool. Es bloqueante."""
+        print(f"Precalentando pool de navegadores ({self.tamano})...")
+        while not self._cerrado and self._reservar_hueco():
+            try:
+                self._libres.put(self._crear_navegador())
+            except Exception as e:
+                print(f"No se pudo precalentar un navegador: {str(e)}")
+                break
+
+    def checkout(self, timeout: Optional[float] = TIMEOUT_CHECKOUT) -> TikTokBrowser:
+        """
+        Toma un navegador saludable del pool, creando uno si hay hueco libre.
+
+        Args:
+            timeout: Segundos máximos de espera por un navegador libre
+
+        Returns:
+            TikTokBrowser: Navegador autenticado y en uso exclusivo
+        """
+        if self._cerrado:
+            raise RuntimeError("El pool de navegadores está cerrado")
+
+        limite = time.time() + timeout if timeout is not None else None
+        while True:
+            try:
+                browser = self._libres.get_nowait()
+            except queue.Empty:
+                if self._reservar_hueco():
+                    browser = self._crear_navegador()
+                else:
+                    restante = None if limite is None else limite - time.time()
+                    if restante is not None and restante <= 0:
+                        raise self._error_agotado(timeout)
+                    try:
+                        browser = self._libres.get(timeout=restante)
+                    except queue.Empty:
+                        raise self._error_agotado(timeout)
+
+            if not browser.is_alive():
+                print("Navegador del pool no saludable. Reemplazándolo...")
+                self._descartar(browser)
+                continue
+
+            with self._lock:
+                self._usos[id(browser)] = self._usos.get(id(browser), 0) + 1
+                self.estadisticas["checkouts"] += 1
+            return browser
+
+    def _error_agotado(self, timeout: Optional[float]) -> TimeoutError:
+        """
+        Construye el error de checkout cuando todos los navegadores están en uso.
+
+        Args:
+            timeout: Segundos que se esperó por un navegador libre
+
+        Returns:
+            TimeoutError con el tamaño del pool y cómo ampliarlo
+        """
+        return TimeoutError(
+            f"Los {self.tamano} navegadores del pool siguen en uso tras esperar {timeout:.0f}s. "
+            f"Aumenta TIKTOK_POOL_NAVEGADORES o reduce TIKTOK_MAX_TRABAJOS."
+        )
+
+    def checkin(self, browser: TikTokBrowser, saludable: bool = True):
+        """
+        Devuelve un navegador al pool o lo descarta si ya no sirve.
+
+        Args:
+            browser: Navegador tomado con checkout
+            saludable: False si la sesión terminó con un error del navegador
+        """
+        usos = self._usos.get(id(browser), 0)
+        agotado = self.max_usos and usos >= self.max_usos
+        if self._cerrado or not saludable or agotado or not browser.is_alive():
+            self._descartar(browser)
+            return
+        self._libres.put(browser)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve el estado actual del pool.
+
+        Returns:
+            Diccionario con tamaño, navegadores libres y contadores
+        """
+        with self._lock:
+            datos = dict(self.estadisticas)
+            datos.update({
+                "tamano": self.tamano,
+                "navegadores_abiertos": self._total,
+                "navegadores_libres": self._libres.qsize()
+            })
+        return datos
+
+    def cerrar(self):
+        """Cierra todos los navegadores libres; los que estén en uso se cierran al devolverse."""
+        self._cerrado = True
+        while True:
+            try:
+                browser = self._libres.get_nowait()
+            except queue.Empty:
+                break
+            self._descartar(browser)
+
+
+_pool: Optional[TikTokBrowserPool] = None
+_pool_lock = threading.Lock()
+
+
+def obtener_pool_navegadores() -> Optional[TikTokBrowserPool]:
+    """
+    Devuelve el pool compartido de navegadores, o None si está desactivado.
+
+    Returns:
+        TikTokBrowserPool o None si TIKTOK_POOL_NAVEGADORES es 0
+    """
+    global _pool
+    if TAMANO_POOL_NAVEGADORES <= 0:
+        return None
+    with _pool_lock:
+        if _pool is None:
+            _pool = TikTokBrowserPool()
+        return _pool
+
+
+def cerrar_pool_navegadores():
+    """Cierra el pool compartido de navegadores si existe."""
+    global _pool
+    with _pool_lock:
+        if _pool is not None:
+            _pool.cerrar()
+            _pool = None
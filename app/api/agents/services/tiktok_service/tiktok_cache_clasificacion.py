@@ -0,0 +1,193 @@
+"""
+Caché de resultados de clasificación para no enviar dos veces el mismo texto a OpenAI.
+"""
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import normalizar_texto
+
+# Clasificaciones que se conservan en memoria (las menos usadas se descartan primero)
+TAMANO_CACHE_CLASIFICACION = int(os.getenv("TIKTOK_CACHE_CLASIFICACION", "10000"))
+
+# Archivo JSONL donde se conservan las clasificaciones entre ejecuciones (vacío lo desactiva)
+ARCHIVO_CACHE_CLASIFICACION = os.getenv("TIKTOK_CACHE_CLASIFICACION_ARCHIVO", "")
+
+
+def clave_clasificacion(texto_subtitulos: str, texto_descripcion: str = "") -> str:
+    """
+    Calcula la clave de caché de un par subtítulos/descripción.
+
+    El texto se normaliza antes (tildes, mayúsculas, signos), de modo que un repost
+    o un video en bucle con los mismos subtítulos produce la misma clave.
+
+    Args:
+        texto_subtitulos: Subtítulos capturados
+        texto_descripcion: Descripción del video
+
+    Returns:
+        str: Hash SHA-1 del texto normalizado
+    """
+    normalizado = normalizar_texto(texto_subtitulos) + "\x1f" + normalizar_texto(texto_descripcion)
+    return hashlib.sha1(normalizado.encode("utf-8")).hexdigest()
+
+
+class CacheClasificacion:
+    """
+    Caché LRU de clasificaciones por hash del texto normalizado.
+
+    Si dos hilos piden el mismo texto a la vez, el segundo espera el resultado del
+    primero en lugar de lanzar otra llamada a OpenAI.
+    """
+
+    def __init__(self, capacidad: int = TAMANO_CACHE_CLASIFICACION, archivo: str = ARCHIVO_CACHE_CLASIFICACION):
+        """
+        Inicializa la caché y carga las clasificaciones guardadas en disco.
+
+        Args:
+            capacidad: Número máximo de clasificaciones en memoria
+            archivo: Archivo JSONL de persistencia (vacío la desactiva)
+        """
+        self.capacidad = max(1, capacidad)
+        self.archivo = archivo
+        self._datos: "OrderedDict[str, Any]" = OrderedDict()
+        self._en_curso: Dict[str, Future] = {}
+        self._lock = threading.Lock()
+        self.estadisticas = {"aciertos": 0, "fallos": 0, "esperas_compartidas": 0}
+        if archivo:
+            self._cargar()
+
+    def _cargar(self):
+        """Carga el archivo de persistencia y lo compacta si acumuló demasiadas líneas."""
+        if not os.path.exists(self.archivo):
+            return
+        lineas = 0
+        with open(self.archivo, "r", encoding="utf-8") as f:
+            for linea in f:
+                try:
+                    dato = json.loads(linea)
+                except ValueError:
+                    continue
+                lineas += 1
+                self._datos[dato["clave"]] = dato["resultado"]
+                self._datos.move_to_end(dato["clave"])
+                if len(self._datos) > self.capacidad:
+                    self._datos.popitem(last=False)
+
+        # Reescribimos solo lo que sigue en memoria
+        if lineas > 2 * self.capacidad:
+            temporal = self.archivo + ".tmp"
+            with open(temporal, "w", encoding="utf-8") as f:
+                for clave, resultado in self._datos.items():
+                    f.write(json.dumps({"clave": clave, "resultado": resultado}) + "\n")
+            os.replace(temporal, self.archivo)
+        print(f"Caché de clasificación cargada con {len(self._datos)} textos")
+
+    def _guardar(self, clave: str, resultado: Any):
+        """Guarda un resultado nuevo en memoria y en disco (requiere tener self._lock)."""
+        self._datos[clave] = resultado
+        self._datos.move_to_end(clave)
+        if len(self._datos) > self.capacidad:
+            self._datos.popitem(last=False)
+        if self.archivo:
+            try:
+                with open(self.archivo, "a", encoding="utf-8") as f:
+                    f.write(json.dumps({"clave": clave, "resultado": resultado}) + "\n")
+            except OSError as e:
+                print(f"No se pudo escribir la caché de clasificación: {str(e)}")
+
+    def obtener_o_clasificar(self, texto_subtitulos: str, texto_descripcion: str,
+                             clasificar: Callable[[str, str], Any]) -> Any:
+        """
+        Devuelve la clasificación en caché o la calcula una sola vez.
+
+        Args:
+            texto_subtitulos: Subtítulos capturados
+            texto_descripcion: Descripción del video
+            clasificar: Función que clasifica el texto si no está en caché
+
+        Returns:
+            Resultado de la clasificación
+        """
+        clave = clave_clasificacion(texto_subtitulos, texto_descripcion)
+        with self._lock:
+            if clave in self._datos:
+                self._datos.move_to_end(clave)
+                self.estadisticas["aciertos"] += 1
+                return self._datos[clave]
+            en_curso = self._en_curso.get(clave)
+            if en_curso is not None:
+                self.estadisticas["esperas_compartidas"] += 1
+            else:
+                self.estadisticas["fallos"] += 1
+                futuro = Future()
+                self._en_curso[clave] = futuro
+        if en_curso is not None:
+            return en_curso.result()
+
+        try:
+            resultado = clasificar(texto_subtitulos, texto_descripcion)
+        except Exception as e:
+            # Los errores no se guardan: el próximo intento vuelve a consultar
+            with self._lock:
+                del self._en_curso[clave]
+            futuro.set_exception(e)
+            raise
+
+        with self._lock:
+            self._guardar(clave, resultado)
+            del self._en_curso[clave]
+        futuro.set_result(resultado)
+        return resultado
+
+    def consultar(self, texto_subtitulos: str, texto_descripcion: str = "") -> Optional[Any]:
+        """
+        Devuelve la clasificación guardada de un texto sin calcularla ni contar estadísticas.
+
+        Args:
+            texto_subtitulos: Subtítulos capturados
+            texto_descripcion: Descripción del video
+
+        Returns:
+            Resultado guardado o None si el texto no está en la caché
+        """
+        with self._lock:
+            return self._datos.get(clave_clasificacion(texto_subtitulos, texto_descripcion))
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve el tamaño de la caché y su tasa de aciertos.
+
+        Returns:
+            Diccionario con entradas, aciertos, fallos y esperas compartidas
+        """
+        with self._lock:
+            datos = dict(self.estadisticas)
+            datos["entradas"] = len(self._datos)
+            datos["en_curso"] = len(self._en_curso)
+        consultas = datos["aciertos"] + datos["fallos"] + datos["esperas_compartidas"]
+        datos["tasa_aciertos"] = round((datos["aciertos"] + datos["esperas_compartidas"]) / consultas, 3) \
+            if consultas else None
+        return datos
+
+
+_cache: Optional[CacheClasificacion] = None
+_cache_lock = threading.Lock()
+
+
+def obtener_cache_clasificacion() -> CacheClasificacion:
+    """
+    Devuelve la caché compartida de clasificaciones, creándola si no existe.
+
+    Returns:
+        CacheClasificacion: Caché del proceso
+    """
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = CacheClasificacion()
+        return _cache
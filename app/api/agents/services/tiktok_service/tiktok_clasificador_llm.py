@@ -0,0 +1,351 @@
+"""
+Cliente asíncrono de clasificación con OpenAI: límite de concurrencia, plazos,
+reintentos con jitter y lotes de varios textos por llamada.
+"""
+import asyncio
+import concurrent.futures
+import json
+import os
+import random
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+import openai
+
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import PRECANDIDATOS_2026
+
+# Modelo de OpenAI usado para clasificar
+MODELO_LLM = os.getenv("TIKTOK_LLM_MODELO", "gpt-3.5-turbo")
+
+# Llamadas simultáneas máximas a la API (compartidas por todos los crawlers del proceso)
+CONCURRENCIA_LLM = int(os.getenv("TIKTOK_LLM_CONCURRENCIA", "4"))
+
+# Segundos máximos por llamada a la API
+TIMEOUT_LLM = float(os.getenv("TIKTOK_LLM_TIMEOUT", "15"))
+
+# Reintentos ante errores transitorios (timeout, conexión, límite de tasa, error del servidor)
+REINTENTOS_LLM = int(os.getenv("TIKTOK_LLM_REINTENTOS", "3"))
+
+# Espera base del primer reintento en segundos (se duplica en cada intento, con jitter)
+ESPERA_REINTENTO_LLM = float(os.getenv("TIKTOK_LLM_REINTENTO_BASE", "0.5"))
+
+# Textos máximos por llamada (1 desactiva los lotes)
+TAMANO_LOTE_LLM = int(os.getenv("TIKTOK_LLM_LOTE", "8"))
+
+# Segundos que se espera a que lleguen más textos antes de enviar un lote incompleto
+ESPERA_LOTE_LLM = float(os.getenv("TIKTOK_LLM_ESPERA_LOTE", "0.05"))
+
+PROMPT_SISTEMA = (
+    'Eres un clasificador de texto que determina si una transcripción y/o descripción de TikTok contiene alguna alusión al proceso electoral presidencial de Perú 2026 o a sus precandidatos. '
+    'Instrucciones: '
+    '1. Recibe como entrada una transcripción de TikTok y/o su descripción. '
+    '2. Devuelve únicamente: '
+    '   - "true" si el texto menciona directa o indirectamente: '
+    '     • El proceso electoral presidencial de 2026 (p. ej., elecciones, campaña, debates, encuestas, partidos, votaciones, candidaturas, etc.). '
+    '     • Cualquier precandidatura o aspiración presidencial (incluso sin nombrar al precandidato concreto). '
+    '   - "false" en caso contrario (temas distintos al proceso o candidatos presidenciales). '
+    'IMPORTANTE: Si el texto habla de elecciones en otros países (como Ecuador, Colombia, etc.) pero NO menciona el proceso electoral de Perú 2026, debes responder "false". '
+    'Para la detección, ten en cuenta esta lista de precandidatos oficialmente declarados para 2026 en Perú: '
+    + ''.join(f'- {nombre} — {partido}  ' for nombre, partido in PRECANDIDATOS_2026)
+)
+
+PROMPT_LOTE = (
+    ' Recibirás varios textos numerados. Clasifica cada uno por separado con el mismo criterio '
+    'y responde solo con un objeto JSON de la forma {"resultados": [true, false, ...]}, '
+    'con un valor por texto y en el mismo orden.'
+)
+
+# Errores de la API que vale la pena reintentar
+_ERRORES_TRANSITORIOS = (
+    asyncio.TimeoutError,
+    openai.APITimeoutError,
+    openai.APIConnectionError,
+    openai.RateLimitError,
+    openai.InternalServerError,
+)
+
+
+# Síntomas de una respuesta que no se puede interpretar (JSON inválido, campos o elementos faltantes)
+_ERRORES_RESPUESTA = (ValueError, KeyError, TypeError, IndexError, AttributeError)
+
+
+class ErrorClasificacionLLM(Exception):
+    """La clasificación no se pudo obtener tras agotar los reintentos."""
+
+
+def _como_error_clasificacion(error: BaseException) -> ErrorClasificacionLLM:
+    """
+    Convierte cualquier fallo de una clasificación en ErrorClasificacionLLM, para que
+    quien llama pueda recurrir al modelo local sin conocer los errores internos.
+
+    Args:
+        error: Excepción con la que terminó la clasificación
+
+    Returns:
+        ErrorClasificacionLLM con el error original como causa
+    """
+    if isinstance(error, ErrorClasificacionLLM):
+        return error
+    envoltorio = ErrorClasificacionLLM(f"La clasificación con OpenAI falló ({type(error).__name__}): {str(error)}")
+    envoltorio.__cause__ = error
+    return envoltorio
+
+
+class ClasificadorLLM:
+    """
+    Servicio de clasificación con un event loop propio en un hilo de fondo.
+
+    Los hilos de los crawlers llaman a clasificar() de forma síncrona; los textos se
+    agrupan en lotes y se envían con un cliente asíncrono que respeta el límite de
+    llamadas simultáneas.
+    """
+
+    def __init__(self, concurrencia: int = CONCURRENCIA_LLM, tamano_lote: int = TAMANO_LOTE_LLM):
+        """
+        Arranca el event loop del servicio.
+
+        Args:
+            concurrencia: Llamadas simultáneas máximas a la API
+            tamano_lote: Textos máximos por llamada
+        """
+        self.concurrencia = max(1, concurrencia)
+        self.tamano_lote = max(1, tamano_lote)
+        self._lock = threading.Lock()
+        self.estadisticas = {
+            "textos": 0,
+            "llamadas": 0,
+            "lotes": 0,
+            "reintentos": 0,
+            "errores": 0,
+            "lotes_fallidos": 0,
+            "segundos_api": 0.0
+        }
+
+        self._loop = asyncio.new_event_loop()
+        self._listo = threading.Event()
+        self._hilo = threading.Thread(target=self._ejecutar_loop, name="tiktok-clasificador-llm", daemon=True)
+        self._hilo.start()
+        self._listo.wait()
+
+    def _ejecutar_loop(self):
+        """Hilo del event loop: crea el cliente, la cola y el agrupador de lotes."""
+        asyncio.set_event_loop(self._loop)
+        # Los reintentos y el plazo los controla el servicio, no el cliente
+        self._cliente = openai.AsyncOpenAI(api_key=os.getenv("OPENAI_API_KEY"), timeout=TIMEOUT_LLM, max_retries=0)
+        self._cola: "asyncio.Queue[Tuple[str, asyncio.Future]]" = asyncio.Queue()
+        self._semaforo = asyncio.Semaphore(self.concurrencia)
+        self._agrupador = self._loop.create_task(self._agrupar())
+        self._loop.call_soon(self._listo.set)
+        self._loop.run_forever()
+
+    def _sumar(self, **valores):
+        """Suma valores a las estadísticas."""
+        with self._lock:
+            for clave, valor in valores.items():
+                self.estadisticas[clave] += valor
+
+    async def _agrupar(self):
+        """Junta los textos que llegan casi a la vez en lotes y lanza cada lote."""
+        while True:
+            lote = [await self._cola.get()]
+            limite = self._loop.time() + ESPERA_LOTE_LLM
+            while len(lote) < self.tamano_lote:
+                restante = limite - self._loop.time()
+                if restante <= 0:
+                    break
+                try:
+                    lote.append(await asyncio.wait_for(self._cola.get(), restante))
+                except asyncio.TimeoutError:
+                    break
+            self._loop.create_task(self._procesar_lote(lote))
+
+    async def _procesar_lote(self, lote: List[Tuple[str, asyncio.Future]]):
+        """
+        Clasifica un lote y resuelve los futures de sus textos.
+
+        Si la respuesta de un lote no se puede interpretar, cada texto se clasifica por
+        separado. Todo fallo se entrega como ErrorClasificacionLLM.
+        """
+        textos = [texto for texto, _ in lote]
+        cancelado = None
+        try:
+            if len(lote) > 1:
+                try:
+                    resultados = await self._con_reintentos(self._llamar_lote, textos)
+                    self._sumar(lotes=1)
+                except _ERRORES_RESPUESTA as e:
+                    print(f"Respuesta de lote no válida ({str(e)}). Se clasifican los {len(lote)} textos por separado.")
+                    self._sumar(lotes_fallidos=1)
+                    resultados = await asyncio.gather(
+                        *(self._con_reintentos(self._llamar_uno, texto) for texto in textos),
+                        return_exceptions=True
+                    )
+            else:
+                resultados = [await self._con_reintentos(self._llamar_uno, textos[0])]
+        except asyncio.CancelledError as e:
+            # Al cerrar el servicio: se resuelven los futures antes de propagar la cancelación
+            cancelado = e
+            resultados = [e] * len(lote)
+        except Exception as e:
+            resultados = [e] * len(lote)
+
+        for (_, futuro), resultado in zip(lote, resultados):
+            if futuro.done():
+                continue
+            # gather(return_exceptions=True) también devuelve CancelledError, que no es Exception
+            if isinstance(resultado, BaseException):
+                self._sumar(errores=1)
+                futuro.set_exception(_como_error_clasificacion(resultado))
+            else:
+                futuro.set_result(resultado)
+
+        if cancelado is not None:
+            raise cancelado
+
+    async def _con_reintentos(self, llamada, argumento):
+        """
+        Ejecuta una llamada a la API con plazo y reintentos con backoff exponencial y jitter.
+
+        Raises:
+            ErrorClasificacionLLM: Si los errores transitorios agotan los reintentos o la API
+                rechaza la petición (autenticación, petición inválida, etc.)
+        """
+        for intento in range(REINTENTOS_LLM + 1):
+            try:
+                async with self._semaforo:
+                    inicio = time.perf_counter()
+                    try:
+                        return await asyncio.wait_for(llamada(argumento), TIMEOUT_LLM)
+                    finally:
+                        self._sumar(llamadas=1, segundos_api=time.perf_counter() - inicio)
+            except _ERRORES_TRANSITORIOS as e:
+                if intento == REINTENTOS_LLM:
+                    raise ErrorClasificacionLLM(f"OpenAI no respondió tras {intento + 1} intentos: {str(e)}") from e
+                espera = random.uniform(0, ESPERA_REINTENTO_LLM * 2 ** intento)
+                print(f"Error transitorio con OpenAI ({type(e).__name__}). Reintentando en {espera:.2f}s...")
+                self._sumar(reintentos=1)
+                await asyncio.sleep(espera)
+            except openai.APIError as e:
+                # Reintentar no sirve: se propaga como fallo de clasificación para usar el respaldo
+                raise ErrorClasificacionLLM(f"OpenAI rechazó la petición ({type(e).__name__}): {str(e)}") from e
+
+    async def _llamar_uno(self, texto: str) -> bool:
+        """Clasifica un solo texto."""
+        respuesta = await self._cliente.chat.completions.create(
+            model=MODELO_LLM,
+            messages=[
+                {"role": "system", "content": PROMPT_SISTEMA},
+                {"role": "user", "content": f'Texto: "{texto}"'}
+            ],
+            temperature=0,
+            max_tokens=5
+        )
+        return respuesta.choices[0].message.content.strip().lower().startswith("true")
+
+    async def _llamar_lote(self, textos: List[str]) -> List[bool]:
+        """
+        Clasifica varios textos en una sola llamada con salida JSON.
+
+        Raises:
+            ValueError: Si la respuesta no trae un resultado booleano por texto
+        """
+        contenido = "\n".join(f'{i}. Texto: "{texto}"' for i, texto in enumerate(textos, 1))
+        respuesta = await self._cliente.chat.completions.create(
+            model=MODELO_LLM,
+            messages=[
+                {"role": "system", "content": PROMPT_SISTEMA + PROMPT_LOTE},
+                {"role": "user", "content": contenido}
+            ],
+            temperature=0,
+            max_tokens=20 + 8 * len(textos),
+            response_format={"type": "json_object"}
+        )
+        resultados = json.loads(respuesta.choices[0].message.content)["resultados"]
+        if len(resultados) != len(textos) or not all(isinstance(r, bool) for r in resultados):
+            raise ValueError(f"se esperaban {len(textos)} booleanos y llegó {resultados!r}")
+        return resultados
+
+    async def _encolar(self, texto: str) -> bool:
+        """Encola un texto para el próximo lote y espera su resultado."""
+        futuro = self._loop.create_future()
+        await self._cola.put((texto, futuro))
+        return await futuro
+
+    def clasificar(self, texto: str) -> bool:
+        """
+        Clasifica un texto desde un hilo cualquiera (puente síncrono).
+
+        Args:
+            texto: Subtítulos y/o descripción ya combinados
+
+        Returns:
+            bool: True si el texto trata del proceso electoral peruano de 2026
+
+        Raises:
+            ErrorClasificacionLLM: Si la API no respondió tras los reintentos, rechazó la
+                petición o se agotó el plazo total
+        """
+        self._sumar(textos=1)
+        futuro = asyncio.run_coroutine_threadsafe(self._encolar(texto), self._loop)
+        # Plazo total: todos los intentos más sus esperas y la del lote
+        plazo = (REINTENTOS_LLM + 1) * (TIMEOUT_LLM + ESPERA_REINTENTO_LLM * 2 ** REINTENTOS_LLM) + ESPERA_LOTE_LLM
+        try:
+            return futuro.result(timeout=plazo)
+        except concurrent.futures.TimeoutError as e:
+            futuro.cancel()
+            self._sumar(errores=1)
+            raise ErrorClasificacionLLM(f"OpenAI no respondió en {plazo:.0f}s") from e
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve las estadísticas del servicio.
+
+        Returns:
+            Diccionario con textos, llamadas, lotes, reintentos, errores y tiempo en la API
+        """
+        with self._lock:
+            datos = {clave: round(valor, 3) if isinstance(valor, float) else valor
+                     for clave, valor in self.estadisticas.items()}
+        datos["textos_por_llamada"] = round(datos["textos"] / datos["llamadas"], 2) if datos["llamadas"] else None
+        return datos
+
+    def cerrar(self):
+        """Detiene el event loop y cierra el cliente."""
+        async def _detener():
+            self._agrupador.cancel()
+            await self._cliente.close()
+
+        try:
+            asyncio.run_coroutine_threadsafe(_detener(), self._loop).result(timeout=5)
+        except Exception as e:
+            print(f"Error al cerrar el clasificador: {str(e)}")
+        self._loop.call_soon_threadsafe(self._loop.stop)
+        self._hilo.join(timeout=5)
+
+
+_clasificador: Optional[ClasificadorLLM] = None
+_clasificador_lock = threading.Lock()
+
+
+def obtener_clasificador_llm() -> ClasificadorLLM:
+    """
+    Devuelve el clasificador compartido, creándolo si no existe.
+
+    Returns:
+        ClasificadorLLM: Clasificador del proceso
+    """
+    global _clasificador
+    with _clasificador_lock:
+        if _clasificador is None:
+            _clasificador = ClasificadorLLM()
+        return _clasificador
+
+
+def cerrar_clasificador_llm():
+    """Cierra el clasificador compartido si existe."""
+    global _clasificador
+    with _clasificador_lock:
+        if _clasificador is not None:
+            _clasificador.cerrar()
+            _clasificador = None
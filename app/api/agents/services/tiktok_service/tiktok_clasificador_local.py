@@ -0,0 +1,440 @@
+"""
+Clasificador local (sin API) de contenido político: n-gramas con hashing y regresión
+logística entrenada con las transcripciones guardadas y los negativos recolectados.
+
+Entrenamiento (desde la raíz del repositorio):
+    python -m app.api.agents.services.tiktok_service.tiktok_clasificador_local --negativos tiktok_negativos.jsonl
+
+Los negativos se recolectan durante el crawl solo si TIKTOK_NEGATIVOS_ARCHIVO está definido.
+"""
+import argparse
+import json
+import math
+import os
+import random
+import threading
+import time
+import zlib
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import normalizar_texto
+
+# Archivo del modelo entrenado
+RUTA_MODELO_LOCAL = os.getenv("TIKTOK_MODELO_LOCAL", "modelo_politico.npz")
+
+# Archivo JSONL donde se recolectan los subtítulos que OpenAI clasificó como no políticos (vacío lo desactiva)
+ARCHIVO_NEGATIVOS = os.getenv("TIKTOK_NEGATIVOS_ARCHIVO", "")
+
+# Tamaño máximo del archivo de negativos en MB (al llegar se deja de recolectar)
+MAX_MB_NEGATIVOS = float(os.getenv("TIKTOK_NEGATIVOS_MAX_MB", "50"))
+
+# Probabilidad calibrada a partir de la cual un texto se considera político
+UMBRAL_LOCAL = float(os.getenv("TIKTOK_LOCAL_UMBRAL", "0.5"))
+
+# Versión del formato del archivo del modelo (cambia si cambian las características)
+FORMATO_MODELO = 1
+
+# Dimensión del espacio de características (potencia de 2)
+DIMENSION_POR_DEFECTO = 2 ** 18
+
+_lock_negativos = threading.Lock()
+
+
+def caracteristicas(texto: str, dimension: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Convierte un texto en un vector disperso de unigramas y bigramas con hashing.
+
+    Args:
+        texto: Texto original (se normaliza)
+        dimension: Tamaño del espacio de características (potencia de 2)
+
+    Returns:
+        tuple: (índices, valores) con pesos 1 + log(frecuencia) y norma L2 unitaria
+    """
+    palabras = normalizar_texto(texto).split()
+    gramas = Counter(palabras)
+    gramas.update(f"{a} {b}" for a, b in zip(palabras, palabras[1:]))
+
+    pesos: Dict[int, float] = {}
+    mascara = dimension - 1
+    for grama, frecuencia in gramas.items():
+        indice = zlib.crc32(grama.encode("utf-8")) & mascara
+        pesos[indice] = pesos.get(indice, 0.0) + 1.0 + math.log(frecuencia)
+
+    indices = np.fromiter(pesos.keys(), dtype=np.int64, count=len(pesos))
+    valores = np.fromiter(pesos.values(), dtype=np.float32, count=len(pesos))
+    norma = float(np.sqrt(np.dot(valores, valores)))
+    if norma > 0:
+        valores /= norma
+    return indices, valores
+
+
+def registrar_negativo(texto: str):
+    """
+    Guarda unos subtítulos que OpenAI clasificó como no políticos para entrenar el modelo local.
+
+    Solo deben registrarse veredictos del modelo remoto y solo subtítulos, igual que
+    las transcripciones positivas: así el modelo local no aprende de sus propias
+    etiquetas ni de las del prefiltro, ni a distinguir el tipo de texto.
+
+    Args:
+        texto: Subtítulos del video
+    """
+    if not ARCHIVO_NEGATIVOS or not texto.strip():
+        return
+    with _lock_negativos:
+        try:
+            if os.path.exists(ARCHIVO_NEGATIVOS) and os.path.getsize(ARCHIVO_NEGATIVOS) >= MAX_MB_NEGATIVOS * 1024 * 1024:
+                return
+            with open(ARCHIVO_NEGATIVOS, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"texto": texto}, ensure_ascii=False) + "\n")
+        except OSError as e:
+            print(f"No se pudo guardar el negativo: {str(e)}")
+
+
+def _sigmoide(x):
+    return 1.0 / (1.0 + np.exp(-np.clip(x, -35, 35)))
+
+
+class ClasificadorLocal:
+    """
+    Regresión logística sobre n-gramas con hashing y confianza calibrada con Platt.
+    """
+
+    def __init__(self, pesos: np.ndarray, sesgo: float, platt: Tuple[float, float], metadatos: Dict[str, Any]):
+        """
+        Inicializa el clasificador con un modelo ya entrenado.
+
+        Args:
+            pesos: Pesos de la regresión logística (uno por característica)
+            sesgo: Término independiente
+            platt: Parámetros (a, b) de la calibración sigmoide(a * puntaje + b)
+            metadatos: Versión, fecha y métricas del entrenamiento
+        """
+        self.pesos = pesos.astype(np.float32)
+        self.sesgo = float(sesgo)
+        self.platt = (float(platt[0]), float(platt[1]))
+        self.metadatos = metadatos
+        self.dimension = len(pesos)
+        self._lock = threading.Lock()
+        self.estadisticas = {"predicciones": 0, "segundos_prediciendo": 0.0}
+
+    def puntaje(self, texto: str) -> float:
+        """Puntaje lineal (sin calibrar) de un texto."""
+        indices, valores = caracteristicas(texto, self.dimension)
+        return float(np.dot(self.pesos[indices], valores)) + self.sesgo
+
+    def probabilidad(self, texto: str) -> float:
+        """
+        Probabilidad calibrada de que el texto trate del proceso electoral peruano de 2026.
+
+        Args:
+            texto: Subtítulos del video (el modelo se entrena solo con subtítulos)
+
+        Returns:
+            float: Probabilidad entre 0 y 1
+        """
+        inicio = time.perf_counter()
+        a, b = self.platt
+        probabilidad = float(_sigmoide(a * self.puntaje(texto) + b))
+        with self._lock:
+            self.estadisticas["predicciones"] += 1
+            self.estadisticas["segundos_prediciendo"] += time.perf_counter() - inicio
+        return probabilidad
+
+    def clasificar(self, texto: str) -> bool:
+        """
+        Clasifica un texto con el umbral TIKTOK_LOCAL_UMBRAL.
+
+        Args:
+            texto: Subtítulos del video (el modelo se entrena solo con subtítulos)
+
+        Returns:
+            bool: True si el texto se considera político
+        """
+        return self.probabilidad(texto) >= UMBRAL_LOCAL
+
+    def guardar(self, ruta: str):
+        """
+        Guarda el modelo en un archivo .npz (se escribe aparte y se reemplaza al final).
+
+        Args:
+            ruta: Archivo de destino
+        """
+        temporal = ruta + ".tmp.npz"
+        np.savez_compressed(
+            temporal,
+            pesos=self.pesos,
+            sesgo=np.array(self.sesgo),
+            platt=np.array(self.platt),
+            metadatos=np.array(json.dumps(self.metadatos))
+        )
+        os.replace(temporal, ruta)
+
+    @classmethod
+    def cargar(cls, ruta: str) -> "ClasificadorLocal":
+        """
+        Carga un modelo guardado con guardar().
+
+        Args:
+            ruta: Archivo del modelo
+
+        Returns:
+            ClasificadorLocal: Clasificador listo para predecir
+
+        Raises:
+            ValueError: Si el archivo tiene otro formato de modelo
+        """
+        with np.load(ruta, allow_pickle=False) as datos:
+            metadatos = json.loads(str(datos["metadatos"]))
+            if metadatos.get("formato") != FORMATO_MODELO:
+                raise ValueError(f"Formato de modelo {metadatos.get('formato')} no soportado (se espera {FORMATO_MODELO})")
+            return cls(datos["pesos"], float(datos["sesgo"]), tuple(datos["platt"]), metadatos)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve la versión del modelo y el tiempo medio de predicción.
+
+        Returns:
+            Diccionario con metadatos del modelo, predicciones y microsegundos por predicción
+        """
+        with self._lock:
+            datos = dict(self.estadisticas)
+        datos["microsegundos_por_prediccion"] = round(
+            1e6 * datos.pop("segundos_prediciendo") / datos["predicciones"], 1
+        ) if datos["predicciones"] else None
+        datos["modelo"] = self.metadatos
+        return datos
+
+
+def _matriz_dispersa(textos: List[str], dimension: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Apila las características de varios textos en formato CSR (índices, valores, fila de cada valor)."""
+    indices, valores, filas = [], [], []
+    for fila, texto in enumerate(textos):
+        i, v = caracteristicas(texto, dimension)
+        indices.append(i)
+        valores.append(v)
+        filas.append(np.full(len(i), fila, dtype=np.int64))
+    return np.concatenate(indices), np.concatenate(valores), np.concatenate(filas)
+
+
+def _puntajes(pesos, sesgo, indices, valores, filas, n_filas):
+    """Puntajes lineales de todas las filas de una matriz dispersa."""
+    return np.bincount(filas, weights=pesos[indices] * valores, minlength=n_filas) + sesgo
+
+
+def _ajustar_platt(puntajes: np.ndarray, etiquetas: np.ndarray, iteraciones: int = 100) -> Tuple[float, float]:
+    """
+    Ajusta la calibración de Platt con el método de Newton amortiguado (Lin, Lin y Weng).
+
+    Usa los objetivos suavizados de Platt para no sobreajustar con pocos ejemplos, parte
+    de a = 0 y la tasa base de cada clase, y reduce el paso a la mitad hasta que la
+    pérdida baje, para no divergir cuando los puntajes separan bien las clases.
+    """
+    positivos = float(etiquetas.sum())
+    negativos = len(etiquetas) - positivos
+    objetivo = np.where(etiquetas == 1, (positivos + 1) / (positivos + 2), 1 / (negativos + 2))
+
+    def perdida(a, b):
+        z = a * puntajes + b
+        # -t*log(p) - (1-t)*log(1-p) con p = sigmoide(z), sin desbordes
+        return float(np.sum(np.logaddexp(0, z) - objetivo * z))
+
+    a, b = 0.0, math.log((positivos + 1) / (negativos + 1))
+    actual = perdida(a, b)
+    for _ in range(iteraciones):
+        p = _sigmoide(a * puntajes + b)
+        error = p - objetivo
+        peso = p * (1 - p)
+        gradiente = np.array([np.dot(error, puntajes), error.sum()])
+        if np.abs(gradiente).max() < 1e-5:
+            break
+        hessiano = np.array([
+            [np.dot(peso, puntajes * puntajes), np.dot(peso, puntajes)],
+            [np.dot(peso, puntajes), peso.sum()]
+        ]) + 1e-12 * np.eye(2)
+        paso = -np.linalg.solve(hessiano, gradiente)
+        descenso = float(np.dot(gradiente, paso))
+
+        # Búsqueda lineal: el paso completo de Newton puede empeorar la pérdida
+        tamano = 1.0
+        while tamano >= 1e-10:
+            nuevo = perdida(a + tamano * paso[0], b + tamano * paso[1])
+            if nuevo < actual + 1e-4 * tamano * descenso:
+                break
+            tamano /= 2
+        else:
+            break
+        a, b, actual = a + tamano * paso[0], b + tamano * paso[1], nuevo
+    return float(a), float(b)
+
+
+def entrenar(positivos: Iterable[str], negativos: Iterable[str], dimension: int = DIMENSION_POR_DEFECTO,
+             epocas: int = 200, tasa: float = 0.1, regularizacion: float = 1e-5,
+             fraccion_calibracion: float = 0.2, semilla: int = 13) -> ClasificadorLocal:
+    """
+    Entrena el clasificador local.
+
+    La regresión logística se ajusta con Adam sobre el lote completo, con las clases
+    balanceadas; la calibración de Platt y las métricas usan una partición aparte.
+
+    Args:
+        positivos: Subtítulos políticos (transcripciones guardadas)
+        negativos: Subtítulos no políticos recolectados con registrar_negativo
+        dimension: Tamaño del espacio de características (potencia de 2)
+        epocas: Pasadas de descenso de gradiente
+        tasa: Tasa de aprendizaje de Adam
+        regularizacion: Penalización L2 de los pesos
+        fraccion_calibracion: Fracción de ejemplos reservada para calibrar y medir
+        semilla: Semilla del reparto aleatorio
+
+    Returns:
+        ClasificadorLocal: Modelo entrenado
+
+    Raises:
+        ValueError: Si falta alguna de las dos clases
+    """
+    # Textos únicos (tras normalizar) y no vacíos; si un texto aparece en ambas clases gana la positiva
+    ejemplos: Dict[str, Tuple[str, int]] = {}
+    for etiqueta, textos in ((0, negativos), (1, positivos)):
+        for texto in textos:
+            clave = normalizar_texto(texto)
+            if clave:
+                ejemplos[clave] = (texto, etiqueta)
+    datos = list(ejemplos.values())
+    random.Random(semilla).shuffle(datos)
+    n_positivos = sum(etiqueta for _, etiqueta in datos)
+    if n_positivos == 0 or n_positivos == len(datos):
+        raise ValueError("Se necesitan ejemplos positivos y negativos para entrenar")
+
+    corte = max(1, int(len(datos) * (1 - fraccion_calibracion)))
+    entrenamiento, calibracion = datos[:corte], datos[corte:] or datos[:corte]
+
+    textos = [texto for texto, _ in entrenamiento]
+    y = np.array([etiqueta for _, etiqueta in entrenamiento], dtype=np.float64)
+    indices, valores, filas = _matriz_dispersa(textos, dimension)
+    n = len(textos)
+    # Pesos por clase para que ambas cuenten lo mismo en la pérdida
+    peso_clase = np.where(y == 1, n / (2 * y.sum()), n / (2 * (n - y.sum())))
+
+    pesos = np.zeros(dimension, dtype=np.float64)
+    sesgo = 0.0
+    m, v = np.zeros(dimension), np.zeros(dimension)
+    m_b = v_b = 0.0
+    beta1, beta2, eps = 0.9, 0.999, 1e-8
+    for t in range(1, epocas + 1):
+        error = (_sigmoide(_puntajes(pesos, sesgo, indices, valores, filas, n)) - y) * peso_clase / n
+        gradiente = np.bincount(indices, weights=error[filas] * valores, minlength=dimension) + regularizacion * pesos
+        gradiente_b = error.sum()
+
+        m = beta1 * m + (1 - beta1) * gradiente
+        v = beta2 * v + (1 - beta2) * gradiente * gradiente
+        pesos -= tasa * (m / (1 - beta1 ** t)) / (np.sqrt(v / (1 - beta2 ** t)) + eps)
+        m_b = beta1 * m_b + (1 - beta1) * gradiente_b
+        v_b = beta2 * v_b + (1 - beta2) * gradiente_b * gradiente_b
+        sesgo -= tasa * (m_b / (1 - beta1 ** t)) / (math.sqrt(v_b / (1 - beta2 ** t)) + eps)
+
+    textos_cal = [texto for texto, _ in calibracion]
+    y_cal = np.array([etiqueta for _, etiqueta in calibracion], dtype=np.float64)
+    i_cal, v_cal, f_cal = _matriz_dispersa(textos_cal, dimension)
+    puntajes_cal = _puntajes(pesos, sesgo, i_cal, v_cal, f_cal, len(textos_cal))
+    platt = _ajustar_platt(puntajes_cal, y_cal)
+
+    probabilidades = np.clip(_sigmoide(platt[0] * puntajes_cal + platt[1]), 1e-7, 1 - 1e-7)
+    metadatos = {
+        "formato": FORMATO_MODELO,
+        "version": datetime.now().strftime("%Y%m%d-%H%M%S"),
+        "dimension": dimension,
+        "positivos": n_positivos,
+        "negativos": len(datos) - n_positivos,
+        "exactitud_calibracion": round(float(((probabilidades >= 0.5) == (y_cal == 1)).mean()), 4),
+        "log_loss_calibracion": round(float(-np.mean(
+            y_cal * np.log(probabilidades) + (1 - y_cal) * np.log(1 - probabilidades)
+        )), 4)
+    }
+    return ClasificadorLocal(pesos, sesgo, platt, metadatos)
+
+
+def leer_negativos(ruta: str) -> List[str]:
+    """
+    Lee los textos negativos recolectados con registrar_negativo.
+
+    Args:
+        ruta: Archivo JSONL de negativos
+
+    Returns:
+        list: Textos no políticos
+    """
+    textos = []
+    with open(ruta, "r", encoding="utf-8") as f:
+        for linea in f:
+            try:
+                textos.append(json.loads(linea)["texto"])
+            except (ValueError, KeyError):
+                continue
+    return textos
+
+
+_clasificador: Optional[ClasificadorLocal] = None
+_clasificador_cargado = False
+_clasificador_lock = threading.Lock()
+
+
+def obtener_clasificador_local() -> Optional[ClasificadorLocal]:
+    """
+    Devuelve el clasificador local, cargándolo de TIKTOK_MODELO_LOCAL la primera vez.
+
+    Returns:
+        ClasificadorLocal o None si no hay un modelo entrenado válido
+    """
+    global _clasificador, _clasificador_cargado
+    with _clasificador_lock:
+        if not _clasificador_cargado:
+            _clasificador_cargado = True
+            try:
+                _clasificador = ClasificadorLocal.cargar(RUTA_MODELO_LOCAL)
+                print(f"Modelo local {_clasificador.metadatos['version']} cargado de {RUTA_MODELO_LOCAL}")
+            except FileNotFoundError:
+                print(f"No hay modelo local en {RUTA_MODELO_LOCAL}")
+            except Exception as e:
+                print(f"No se pudo cargar el modelo local: {str(e)}")
+        return _clasificador
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--negativos", default=ARCHIVO_NEGATIVOS or None, required=not ARCHIVO_NEGATIVOS,
+                        help="JSONL de subtítulos no políticos (por defecto TIKTOK_NEGATIVOS_ARCHIVO)")
+    parser.add_argument("--salida", default=RUTA_MODELO_LOCAL, help="Archivo del modelo")
+    parser.add_argument("--dimension", type=int, default=DIMENSION_POR_DEFECTO)
+    parser.add_argument("--epocas", type=int, default=200)
+    args = parser.parse_args()
+
+    from app.api.agents.services.tiktok_service.tiktok_almacen import obtener_almacen, cerrar_almacen
+    try:
+        positivos = list(obtener_almacen().listar_transcripciones())
+    finally:
+        cerrar_almacen()
+    negativos = leer_negativos(args.negativos)
+    print(f"Entrenando con {len(positivos)} transcripciones políticas y {len(negativos)} negativos...")
+
+    inicio = time.perf_counter()
+    clasificador = entrenar(positivos, negativos, dimension=args.dimension, epocas=args.epocas)
+    print(f"Entrenado en {time.perf_counter() - inicio:.1f}s: {clasificador.metadatos}")
+
+    muestra = (positivos + negativos)[:1000]
+    inicio = time.perf_counter()
+    for texto in muestra:
+        clasificador.probabilidad(texto)
+    print(f"Predicción: {1e6 * (time.perf_counter() - inicio) / len(muestra):.0f} µs por texto")
+
+    clasificador.guardar(args.salida)
+    print(f"Modelo guardado en {args.salida}")
+
+
+if __name__ == "__main__":
+    main()
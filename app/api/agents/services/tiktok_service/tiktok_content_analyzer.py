@@ -3,12 +3,39 @@ Servicio mejorado para capturar y analizar subtítulos de videos TikTok en tiemp
 """
 import time
 import os
-import openai
-from selenium.webdriver.common.by import By
+from concurrent.futures import Future
 from app.api.agents.services.tiktok_service.tiktok_interaction import dar_like
+from app.api.agents.services.tiktok_service.tiktok_pipeline import obtener_etapa_clasificacion
+from app.api.agents.services.tiktok_service.tiktok_subtitles import (
+    instalar_colector_subtitulos, drenar_subtitulos, INTERVALO_DRENADO
+)
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import (
+    obtener_prefiltro, normalizar_texto, SI, NO, CONSULTAR
+)
+from app.api.agents.services.tiktok_service.tiktok_cache_clasificacion import obtener_cache_clasificacion
+from app.api.agents.services.tiktok_service.tiktok_clasificador_llm import obtener_clasificador_llm, ErrorClasificacionLLM
+from app.api.agents.services.tiktok_service.tiktok_clasificador_local import obtener_clasificador_local, registrar_negativo
 
-# Inicialización del cliente de OpenAI
-client = openai.OpenAI(api_key=os.getenv("OPENAI_API_KEY"))
+# Caracteres nuevos de subtítulos necesarios para volver a clasificar un video ya analizado
+MIN_CARACTERES_REANALISIS = int(os.getenv("TIKTOK_MIN_CARACTERES_REANALISIS", "60"))
+
+# Decidir con la descripción y los hashtags antes de capturar subtítulos (0 lo desactiva)
+DECISION_POR_DESCRIPCION = os.getenv("TIKTOK_DECISION_DESCRIPCION", "1") == "1"
+
+# Palabras mínimas de la descripción para descartar un video sin ver sus subtítulos
+MIN_PALABRAS_DESCARTE = int(os.getenv("TIKTOK_MIN_PALABRAS_DESCARTE", "4"))
+
+# Segundos máximos de captura completa pedida por la descripción si el clasificador no confirma
+MAX_CAPTURA_COMPLETA_SEGUNDOS = float(os.getenv("TIKTOK_MAX_CAPTURA_COMPLETA", "90"))
+
+# Clasificador principal: "llm" (OpenAI) o "local" (modelo entrenado con tiktok_clasificador_local)
+CLASIFICADOR_PRINCIPAL = os.getenv("TIKTOK_CLASIFICADOR", "llm").lower()
+
+# Usar el modelo local cuando OpenAI no responde (0 lo desactiva)
+RESPALDO_LOCAL = os.getenv("TIKTOK_RESPALDO_LOCAL", "1") == "1"
+
+# Con el clasificador local, confianza mínima (0.5-1) para decidir sin consultar a OpenAI
+CONFIANZA_MINIMA_LOCAL = float(os.getenv("TIKTOK_LOCAL_CONFIANZA_MINIMA", "0.8"))
 
 def analizar_contenido_politico(texto_subtitulos: str, texto_descripcion: str = "") -> bool:
     """
@@ -20,62 +47,87 @@ def analizar_contenido_politico(texto_subtitulos: str, texto_descripcion: str =
         
     Returns:
         bool: True si el texto está relacionado con política peruana, False en caso contrario
+
+    Raises:
+        ErrorClasificacionLLM: Si OpenAI no respondió tras los reintentos y no hay modelo
+            local (o no hay subtítulos para el modelo local)
     """
-    # Combinar subtítulos y descripción para el análisis
-    texto_completo = texto_subtitulos
-    if texto_descripcion:
-        texto_descripcion+= " | DESCRIPCIÓN: " + texto_completo
-    
-    system_prompt = (
-        'Eres un clasificador de texto que determina si una transcripción y/o descripción de TikTok contiene alguna alusión al proceso electoral presidencial de Perú 2026 o a sus precandidatos. '
-        'Instrucciones: '
-        '1. Recibe como entrada una transcripción de TikTok y/o su descripción. '
-        '2. Devuelve únicamente: '
-        '   - "true" si el texto menciona directa o indirectamente: '
-        '     • El proceso electoral presidencial de 2026 (p. ej., elecciones, campaña, debates, encuestas, partidos, votaciones, candidaturas, etc.). '
-        '     • Cualquier precandidatura o aspiración presidencial (incluso sin nombrar al precandidato concreto). '
-        '   - "false" en caso contrario (temas distintos al proceso o candidatos presidenciales). '
-        'IMPORTANTE: Si el texto habla de elecciones en otros países (como Ecuador, Colombia, etc.) pero NO menciona el proceso electoral de Perú 2026, debes responder "false". '
-        'Para la detección, ten en cuenta esta lista de precandidatos oficialmente declarados para 2026 en Perú: '
-        '- Keiko Fujimori — Fuerza Popular  '
-        '- Rafael López Aliaga — Renovación Popular  '
-        '- Carlos Álvarez — País para Todos  '
-        '- Hernando de Soto — Avanza País  '
-        '- César Acuña — Alianza para el Progreso  '
-        '- Verónika Mendoza — Nuevo Perú  '
-        '- Alfonso López Chau — Ahora Nación  '
-        '- Susel Paredes — Partido Morado  '
-        '- Rafael Belaunde — Acción Popular  '
-        '- Alfredo Barnechea — Acción Popular  '
-        '- Phillip Butters — Avanza País  '
-        '- Fernando Olivera — Frente de la Esperanza  '
-        '- Guillermo Bermejo — Perú Libre  '
-    )
-
-    user_prompt = f'Texto: "{texto_completo}"'
+    # El modelo local se entrena solo con subtítulos (transcripciones guardadas y
+    # negativos de registrar_negativo): sin subtítulos no tiene nada que evaluar
+    local = None
+    if texto_subtitulos.strip() and (CLASIFICADOR_PRINCIPAL == "local" or RESPALDO_LOCAL):
+        local = obtener_clasificador_local()
+
+    if CLASIFICADOR_PRINCIPAL == "local" and local is not None:
+        probabilidad = local.probabilidad(texto_subtitulos)
+        # Solo los casos con poca confianza se consultan a OpenAI
+        if max(probabilidad, 1 - probabilidad) >= CONFIANZA_MINIMA_LOCAL:
+            return probabilidad >= 0.5
 
+    # Un texto ya clasificado (repost, video en bucle) no vuelve a consultarse
     try:
-        respuesta = client.chat.completions.create(
-            model="gpt-3.5-turbo",
-            messages=[
-                {"role": "system", "content": system_prompt},
-                {"role": "user", "content": user_prompt}
-            ],
-            temperature=0,
-            max_tokens=5
+        return obtener_cache_clasificacion().obtener_o_clasificar(
+            texto_subtitulos, texto_descripcion, _clasificar_con_openai
         )
+    except ErrorClasificacionLLM as e:
+        if local is None:
+            raise
+        # La respuesta de respaldo no se guarda en la caché
+        print(f"{str(e)}. Se usa el modelo local.")
+        return local.clasificar(texto_subtitulos)
+
+
+def _combinar_textos(texto_subtitulos: str, texto_descripcion: str = "") -> str:
+    """Combina subtítulos y descripción en el texto que se clasifica."""
+    texto_completo = texto_subtitulos
+    if texto_descripcion:
+        texto_completo += " | DESCRIPCIÓN: " + texto_descripcion
+    return texto_completo
+
+
+def _clasificar_con_openai(texto_subtitulos: str, texto_descripcion: str = "") -> bool:
+    """
+    Consulta a OpenAI si el texto trata del proceso electoral peruano de 2026.
+
+    Args:
+        texto_subtitulos: El texto de los subtítulos del video
+        texto_descripcion: El texto de la descripción del video (opcional)
+
+    Returns:
+        bool: Respuesta del modelo
+
+    Raises:
+        Exception: Si falla la llamada (el error no se guarda en la caché)
+    """
+    return obtener_clasificador_llm().clasificar(_combinar_textos(texto_subtitulos, texto_descripcion))
 
-        contenido = respuesta.choices[0].message.content.strip().lower()
-        if contenido.startswith("true"):
-            return True
-        elif contenido.startswith("false"):
-            return False
-        else:
-            return False
 
-    except Exception as e:
-        print(f"Error con OpenAI: {e}")
-        return False
+def _resultado_inmediato(valor: bool) -> Future:
+    """Envuelve una decisión ya tomada en un Future resuelto, como los de la etapa de clasificación."""
+    futuro = Future()
+    futuro.set_result(valor)
+    return futuro
+
+
+def decidir_por_descripcion(descripcion_texto: str, hashtags: list) -> str:
+    """
+    Decide con la descripción y los hashtags si vale la pena capturar los subtítulos.
+
+    Una descripción corta o vacía no basta para descartar: en ese caso se consulta
+    al modelo como con cualquier texto ambiguo.
+
+    Args:
+        descripcion_texto: Texto completo de la descripción
+        hashtags: Hashtags del video
+
+    Returns:
+        str: "si" (captura completa), "no" (descartar el video) o "consultar"
+    """
+    texto = " ".join([descripcion_texto or ""] + list(hashtags or []))
+    decision = obtener_prefiltro().evaluar(texto)
+    if decision == NO and len(normalizar_texto(texto).split()) < MIN_PALABRAS_DESCARTE:
+        return CONSULTAR
+    return decision
 
 
 def capturar_y_analizar_subtitulos(driver, tiempo_minimo_segundos=25):
@@ -98,16 +150,47 @@ def capturar_y_analizar_subtitulos(driver, tiempo_minimo_segundos=25):
     print(f"Descripción del video: {descripcion_texto}")
     print(f"Hashtags encontrados: {', '.join(hashtags)}")
     
+    # Primera decisión solo con la descripción, antes de la ventana de subtítulos
+    decision_descripcion = decidir_por_descripcion(descripcion_texto, hashtags) if DECISION_POR_DESCRIPCION else CONSULTAR
+    if decision_descripcion == NO:
+        print("La descripción no tiene relación con política. Se descarta el video sin capturar subtítulos.")
+        return {
+            "subtitulos": "",
+            "segmentos": [],
+            "es_politico": False,
+            "fragmentos_capturados": 0,
+            "caracteres_totales": 0,
+            "tiempo_captura": 0.0,
+            "like_dado": False,
+            "descartado_por_descripcion": True,
+            "error_clasificacion": False
+        }
+    
     # Variables para el seguimiento
     subtitulos_unicos = set()
     texto_completo = []
+    segmentos = []  # Subtítulos con el segundo del video en que aparecieron
+    instalar_colector_subtitulos(driver)
     tiempo_inicio = time.time()
     tiempo_final_minimo = tiempo_inicio + tiempo_minimo_segundos
     
-    # Control de análisis
+    # Control de análisis (la clasificación corre en su propia etapa mientras seguimos capturando)
     es_politico = False
+    error_clasificacion = False  # El último análisis falló: el veredicto no es definitivo
     ultimo_analisis = 0
     intervalo_analisis = 5  # Analizar cada 5 segundos
+    analisis_pendiente = None
+    # Una descripción política solo asegura la captura completa; el veredicto lo da
+    # la clasificación de subtítulos y descripción
+    captura_completa = decision_descripcion == SI
+    analisis_descripcion = None
+    if captura_completa:
+        print("La descripción menciona el proceso electoral 2026. Captura completa.")
+    elif DECISION_POR_DESCRIPCION and (descripcion_texto or hashtags):
+        # El modelo clasifica la descripción mientras empezamos a capturar
+        analisis_descripcion = obtener_etapa_clasificacion().enviar(("", " ".join([descripcion_texto] + hashtags)))
+    caracteres_analizados = None  # Longitud del texto en el último veredicto
+    subtitulos_enviados = None  # Últimos subtítulos enviados al clasificador
     
     # Control de subtítulos
     ultimo_subtitulo_encontrado = time.time()
@@ -123,61 +206,108 @@ def capturar_y_analizar_subtitulos(driver, tiempo_minimo_segundos=25):
         tiempo_actual = time.time()
         tiempo_transcurrido = tiempo_actual - tiempo_inicio
         
-        # Si pasó el tiempo mínimo y no es político, terminamos
-        if tiempo_actual > tiempo_final_minimo and not es_politico:
-            print(f"Tiempo mínimo cumplido ({tiempo_minimo_segundos}s) y no se detectó contenido político.")
+        # Si el modelo ve política en la descripción, capturamos el video completo
+        if analisis_descripcion is not None and analisis_descripcion.done():
+            try:
+                if analisis_descripcion.result() and not captura_completa:
+                    print(f"[{int(tiempo_transcurrido)}s] La descripción parece política. Captura completa.")
+                    captura_completa = True
+            except Exception as e:
+                print(f"Error en el análisis de la descripción: {e}")
+            analisis_descripcion = None
+        
+        # Recogemos el resultado del análisis en curso si ya terminó
+        if analisis_pendiente is not None and analisis_pendiente.done():
+            try:
+                es_politico = analisis_pendiente.result()
+                error_clasificacion = False
+            except Exception as e:
+                print(f"Error en el análisis de contenido: {e}")
+                es_politico = False
+                error_clasificacion = True
+                # El texto no llegó a clasificarse: se reintenta en el próximo análisis
+                caracteres_analizados = None
+            analisis_pendiente = None
+            
+            if error_clasificacion:
+                print(f"[{int(tiempo_transcurrido)}s] No se pudo clasificar el contenido. Se reintentará.")
+            elif es_politico:
+                print(f"[{int(tiempo_transcurrido)}s] ¡CONTENIDO POLÍTICO DETECTADO!")
+                
+                # Dar like inmediatamente al detectar contenido político
+                if not like_dado:
+                    print(f"[{int(tiempo_transcurrido)}s] Dando like al video...")
+                    dar_like(driver)
+                    like_dado = True
+                    
+                print(f"[{int(tiempo_transcurrido)}s] Continuando captura de subtítulos...")
+            else:
+                print(f"[{int(tiempo_transcurrido)}s] No se detectó contenido político en este análisis.")
+        
+        # Si pasó el tiempo mínimo y no es político (ni queda un análisis en curso), terminamos,
+        # salvo que la descripción pida la captura completa o que el último análisis haya fallado
+        if (tiempo_actual > tiempo_final_minimo and not es_politico and analisis_pendiente is None and
+                analisis_descripcion is None and
+                (not (captura_completa or error_clasificacion) or tiempo_transcurrido > MAX_CAPTURA_COMPLETA_SEGUNDOS)):
+            if error_clasificacion:
+                print(f"No se pudo clasificar el video en {int(tiempo_transcurrido)}s.")
+            else:
+                print(f"Tiempo mínimo cumplido ({tiempo_minimo_segundos}s) y no se detectó contenido político.")
             analisis_completo = True
             break
             
         try:
-            # Buscar subtítulos
-            elementos = driver.find_elements(
-                By.CSS_SELECTOR,
-                "div.css-xfcgts-DivVideoClosedCaption.e15oqmov0"
-            )
+            # Vaciar el buffer del colector de subtítulos (una sola llamada al navegador)
+            lote = drenar_subtitulos(driver)
+            if lote is None:
+                # La página se recargó y perdió el colector
+                instalar_colector_subtitulos(driver)
+                lote = {"items": [], "presente": False}
             
-            # Si encuentra elementos, procesar
-            if elementos:
+            # Si hay subtítulos visibles o nuevos, procesar
+            if lote["items"] or lote["presente"]:
                 ultimo_subtitulo_encontrado = tiempo_actual
                 
-                for elemento in elementos:
-                    texto = elemento.text.strip()
+                for item in lote["items"]:
+                    texto = item["texto"]
                     if texto and texto not in subtitulos_unicos:
                         subtitulos_unicos.add(texto)
                         texto_completo.append(texto)
+                        segmentos.append({"texto": texto, "segundo_video": item.get("t")})
                         print(f"[{int(tiempo_transcurrido)}s] Subtítulo: {texto}")
             
             # Si no ha encontrado subtítulos por tiempo_max_sin_subtitulos o más, consideramos que terminó el video
-            elif tiempo_actual - ultimo_subtitulo_encontrado >= max_tiempo_sin_subtitulos and not es_politico:
+            elif (tiempo_actual - ultimo_subtitulo_encontrado >= max_tiempo_sin_subtitulos and 
+                  not es_politico and analisis_pendiente is None and not error_clasificacion):
                 if tiempo_actual > tiempo_final_minimo:
                     print("Tiempo mínimo cumplido. Finalizando análisis.")
                     analisis_completo = True
                     break
             
-            # Realizar análisis periódico después de acumular suficientes subtítulos
+            # Lanzar un análisis periódico después de acumular suficientes subtítulos,
+            # sin esperar su resultado para no dejar de capturar
             if (tiempo_actual - ultimo_analisis >= intervalo_analisis and 
                 len(texto_completo) > 0 and 
-                not es_politico):
+                not es_politico and 
+                analisis_pendiente is None):
                 
                 ultimo_analisis = tiempo_actual
                 texto_subtitulos = " ".join(texto_completo)
                 
-                print(f"[{int(tiempo_transcurrido)}s] Analizando contenido político (subtítulos + descripción)...")
-                # Llamamos correctamente a la función con ambos parámetros
-                es_politico = analizar_contenido_politico(texto_subtitulos, descripcion_texto)
-                
-                if es_politico:
-                    print(f"[{int(tiempo_transcurrido)}s] ¡CONTENIDO POLÍTICO DETECTADO!")
+                # Solo se vuelve a clasificar si llegó suficiente texto nuevo desde el último veredicto
+                if (caracteres_analizados is None or
+                        len(texto_subtitulos) - caracteres_analizados >= MIN_CARACTERES_REANALISIS):
+                    caracteres_analizados = len(texto_subtitulos)
                     
-                    # Dar like inmediatamente al detectar contenido político
-                    if not like_dado:
-                        print(f"[{int(tiempo_transcurrido)}s] Dando like al video...")
-                        dar_like(driver)
-                        like_dado = True
-                        
-                    print(f"[{int(tiempo_transcurrido)}s] Continuando captura de subtítulos...")
-                else:
-                    print(f"[{int(tiempo_transcurrido)}s] No se detectó contenido político en este análisis.")
+                    # El prefiltro local resuelve los casos evidentes sin llamar a OpenAI
+                    decision = obtener_prefiltro().evaluar(texto_subtitulos + " " + descripcion_texto)
+                    if decision in (SI, NO):
+                        print(f"[{int(tiempo_transcurrido)}s] Prefiltro local: {decision}")
+                        analisis_pendiente = _resultado_inmediato(decision == SI)
+                    else:
+                        print(f"[{int(tiempo_transcurrido)}s] Analizando contenido político (subtítulos + descripción)...")
+                        analisis_pendiente = obtener_etapa_clasificacion().enviar((texto_subtitulos, descripcion_texto))
+                        subtitulos_enviados = texto_subtitulos
                     
             # Si es político y ya pasó el tiempo mínimo, verificar si hay que terminar
             if es_politico and tiempo_actual > tiempo_final_minimo:
@@ -190,17 +320,26 @@ def capturar_y_analizar_subtitulos(driver, tiempo_minimo_segundos=25):
         except Exception as e:
             print(f"Error durante captura: {e}")
             
-        time.sleep(0.5)  # Pequeña pausa para no sobrecargar el CPU
+        time.sleep(INTERVALO_DRENADO)  # El colector acumula los subtítulos mientras tanto
 
     # Resultado final
     subtitulos_texto = " ".join(texto_completo)
+    if not es_politico and subtitulos_enviados:
+        # Ejemplo negativo para el modelo local, solo si lo decidió OpenAI: la caché
+        # guarda únicamente sus respuestas (no las del prefiltro ni las del modelo local)
+        if obtener_cache_clasificacion().consultar(subtitulos_enviados, descripcion_texto) is False:
+            registrar_negativo(subtitulos_enviados)
     resultado = {
         "subtitulos": subtitulos_texto,
+        "segmentos": segmentos,
         "es_politico": es_politico,
         "fragmentos_capturados": len(texto_completo),
         "caracteres_totales": len(subtitulos_texto),
         "tiempo_captura": time.time() - tiempo_inicio,
-        "like_dado": like_dado  # Agregar bandera para saber si ya se dio like
+        "like_dado": like_dado,  # Agregar bandera para saber si ya se dio like
+        "descartado_por_descripcion": False,
+        "captura_completa_por_descripcion": captura_completa,
+        "error_clasificacion": error_clasificacion
     }
     
     print(f"Captura finalizada: {resultado['fragmentos_capturados']} fragmentos, {resultado['caracteres_totales']} caracteres")
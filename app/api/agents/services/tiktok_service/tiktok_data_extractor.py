@@ -2,12 +2,14 @@
 Servicio para extraer datos de canales, videos y comentarios de TikTok.
 """
 from selenium.webdriver.common.by import By
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import NoSuchElementException, TimeoutException
+from selenium.common.exceptions import NoSuchElementException
 from datetime import datetime, timedelta
+import os
 import re
 import time
+from app.api.agents.services.tiktok_service.tiktok_waits import esperar_condicion, nuevos_nodos
+from app.api.agents.services.tiktok_service.tiktok_network_comments import MODO_COMENTARIOS_RED, extraer_comentarios_red
 
 def extraer_datos_canal(driver):
     """
@@ -19,7 +21,9 @@ def extraer_datos_canal(driver):
     Returns:
         dict: Diccionario con URL y nombre del canal
     """
-    time.sleep(1)  
+    # Esperar a que el nombre del canal esté renderizado
+    esperar_condicion(driver, EC.presence_of_element_located((By.CLASS_NAME, "css-1xccqfx-SpanNickName")),
+                      2, "nombre_canal")
 
     try:
         # Obtener URL actual
@@ -183,180 +187,214 @@ def extraer_informacion_video(driver):
     return resultado
 
 
-def scrollear_comentarios(driver, max_intentos=20):
+# Presupuesto de tiempo por video para cargar comentarios (segundos)
+PRESUPUESTO_COMENTARIOS_SEGUNDOS = float(os.getenv("TIKTOK_PRESUPUESTO_COMENTARIOS", "30"))
+
+# Número de comentarios a partir del cual se deja de scrollear
+OBJETIVO_COMENTARIOS = int(os.getenv("TIKTOK_OBJETIVO_COMENTARIOS", "500"))
+
+# Límites de la espera adaptativa tras cada scroll (segundos)
+ESPERA_SCROLL_MINIMA = 0.5
+ESPERA_SCROLL_MAXIMA = 3.0
+
+# Función JS que serializa un comentario del DOM. Replica los selectores de
+# usuario, contenido, likes y los tres intentos de fecha.
+_JS_SERIALIZAR_COMENTARIO = """
+var texto = function(el) { return el ? (el.innerText || el.textContent || '').trim() : null; };
+var serializar = function(w) {
+    var fecha = texto(w.querySelector(
+        "span.TUXText.TUXText--tiktok-sans.TUXText--weight-normal[style*='color: var(--ui-text-3)']"));
+    if (fecha === null) {
+        fecha = texto(w.querySelector('.css-njhskk-DivCommentSubContentWrapper span'));
+    }
+    if (fecha === null) {
+        var spans = w.querySelectorAll('span');
+        for (var j = 0; j < spans.length; j++) {
+            var t = texto(spans[j]);
+            if (t.indexOf('Hace') === 0 || /\\d+-\\d+/.test(t)) { fecha = t; break; }
+        }
+    }
+    return {
+        usuario: texto(w.querySelector("div[data-e2e='comment-username-1'] p.TUXText--weight-medium")),
+        contenido: texto(w.querySelector("span[data-e2e='comment-level-1'] p")),
+        likes: texto(w.querySelector('.css-1nd5cw-DivLikeContainer span.TUXText--weight-normal')),
+        fecha: fecha
+    };
+};
+"""
+
+def procesar_comentario_crudo(crudo):
     """
-    Scrollea para cargar todos los comentarios del video.
+    Convierte un comentario serializado en el navegador al formato de la base de datos.
     
     Args:
-        driver: El driver de Selenium WebDriver
-        max_intentos: Número máximo de intentos de scrolleo
+        crudo: Diccionario con usuario, contenido, likes y fecha como texto
         
     Returns:
-        int: Número de comentarios cargados
+        dict: Comentario con likes numéricos y fecha_exacta calculada
     """
-    print("Scrolleando para cargar todos los comentarios...")
+    comentario = {
+        'usuario': crudo.get('usuario') or "Desconocido",
+        'contenido': crudo.get('contenido') or "",
+        'likes': 0,
+        'fecha': crudo.get('fecha') or "",
+        'fecha_exacta': None
+    }
     
-    # Encontrar el contenedor de comentarios
     try:
-        comentarios_container = driver.find_element(By.CSS_SELECTOR, ".css-7whb78-DivCommentListContainer")
-    except NoSuchElementException:
-        print("No se encontró el contenedor de comentarios.")
-        return 0
+        comentario['likes'] = convertir_numero(crudo.get('likes'))
+    except (ValueError, TypeError):
+        comentario['likes'] = 0
     
-    # Número inicial de comentarios
-    elementos_comentarios = driver.find_elements(By.CSS_SELECTOR, ".css-1gstnae-DivCommentItemWrapper")
-    comentarios_iniciales = len(elementos_comentarios)
-    comentarios_actuales = comentarios_iniciales
-    
-    print(f"Comentarios iniciales encontrados: {comentarios_iniciales}")
-    
-    intentos = 0
-    sin_cambios = 0
-    
-    # Scrollear hasta cargar todos los comentarios o llegar al límite de intentos
-    while intentos < max_intentos and sin_cambios < 3:
-        # Hacer scroll al último comentario
-        if elementos_comentarios:
-            ultimo_comentario = elementos_comentarios[-1]
-            driver.execute_script("arguments[0].scrollIntoView();", ultimo_comentario)
-            
-            # Esperar a que carguen más comentarios
-            time.sleep(2)
-            
-            # Contar comentarios después del scroll
-            elementos_comentarios = driver.find_elements(By.CSS_SELECTOR, ".css-1gstnae-DivCommentItemWrapper")
-            nuevos_comentarios = len(elementos_comentarios)
-            
-            
-            # Verificar si se cargaron más comentarios
-            if nuevos_comentarios > comentarios_actuales:
-                comentarios_actuales = nuevos_comentarios
-                sin_cambios = 0
-            else:
-                sin_cambios += 1
-        else:
-            print("No se encontraron comentarios para hacer scroll.")
-            break
-        
-        intentos += 1
-    
-    # Scrollear al inicio de los comentarios para procesarlos
-    elementos_comentarios = driver.find_elements(By.CSS_SELECTOR, ".css-1gstnae-DivCommentItemWrapper")
-    if elementos_comentarios:
-        primer_comentario = elementos_comentarios[0]
-        driver.execute_script("arguments[0].scrollIntoView();", primer_comentario)
+    if comentario['fecha']:
+        try:
+            comentario['fecha_exacta'] = procesar_fecha(comentario['fecha']).strftime('%Y-%m-%d %H:%M:%S')
+        except Exception as e:
+            print(f"Error al procesar la fecha '{comentario['fecha']}': {e}")
     
-    print(f"Total de comentarios cargados: {comentarios_actuales}")
-    return comentarios_actuales
+    return comentario
+
+
+# Tamaño de los lotes entregados a la persistencia durante la cosecha
+TAMANO_LOTE_COSECHA = int(os.getenv("TIKTOK_LOTE_COMENTARIOS", "100"))
+
+# Si se eliminan del DOM los comentarios ya cosechados para que la memoria de Chrome no crezca
+PODAR_COMENTARIOS_COSECHADOS = os.getenv("TIKTOK_PODAR_COMENTARIOS", "1") == "1"
+
+# Comentarios cosechados que se dejan en el DOM como ancla del scroll
+COMENTARIOS_ANCLA = 5
+
+SELECTOR_COMENTARIOS_PENDIENTES = ".css-1gstnae-DivCommentItemWrapper:not([data-tk-cosechado])"
+
+# Serializa los comentarios aún no cosechados, los marca y poda los ya cosechados
+_SCRIPT_COSECHAR_COMENTARIOS = _JS_SERIALIZAR_COMENTARIO + """
+var limite = arguments[0], ancla = arguments[1], podar = arguments[2];
+var pendientes = document.querySelectorAll(
+    '.css-1gstnae-DivCommentItemWrapper:not([data-tk-cosechado])');
+var resultado = [];
+for (var i = 0; i < Math.min(limite, pendientes.length); i++) {
+    resultado.push(serializar(pendientes[i]));
+    pendientes[i].setAttribute('data-tk-cosechado', '1');
+}
+if (podar) {
+    var cosechados = document.querySelectorAll('.css-1gstnae-DivCommentItemWrapper[data-tk-cosechado]');
+    for (var k = 0; k < cosechados.length - ancla; k++) {
+        try { cosechados[k].remove(); } catch (e) {}
+    }
+}
+var items = document.querySelectorAll('.css-1gstnae-DivCommentItemWrapper');
+if (items.length) { items[items.length - 1].scrollIntoView(); }
+return {comentarios: resultado, pendientes: pendientes.length - resultado.length};
+"""
 
-def extraer_comentarios(driver, limite=None):
+
+def cosechar_comentarios(driver, al_lote, tamano_lote=TAMANO_LOTE_COSECHA, presupuesto_segundos=None,
+                         objetivo=None, max_sin_crecimiento=3):
     """
-    Extrae la información de los comentarios de un video TikTok.
+    Extrae los comentarios por lotes mientras se scrollea, entregando cada lote en cuanto está listo.
+    
+    Los nodos ya procesados se marcan y se eliminan del DOM (salvo unos pocos que
+    sirven de ancla para el scroll), y ningún lote se acumula en Python, así que la
+    memoria del navegador y del proceso no crece con el número de comentarios.
     
     Args:
         driver: El driver de Selenium WebDriver
-        limite: Número máximo de comentarios a extraer (None para todos)
+        al_lote: Función que recibe cada lote (lista de comentarios) para persistirlo
+        tamano_lote: Número máximo de comentarios por lote
+        presupuesto_segundos: Tiempo máximo para cosechar (por defecto TIKTOK_PRESUPUESTO_COMENTARIOS)
+        objetivo: Número de comentarios suficiente (por defecto TIKTOK_OBJETIVO_COMENTARIOS)
+        max_sin_crecimiento: Esperas seguidas sin comentarios nuevos antes de parar
         
     Returns:
-        list: Lista de diccionarios con información de comentarios
+        dict: Estadísticas de la cosecha (total, lotes, segundos, tasa y motivo de parada;
+        en modo red el motivo es "red" y se agregan parada, el motivo real, y total_video,
+        el total de comentarios que reporta la API)
     """
-    comentarios = []
-    try:
-        # Primero scrollear para cargar todos los comentarios
-        total_comentarios = scrollear_comentarios(driver)
-        
-        # Encontrar todos los elementos de comentarios
-        elementos_comentarios = driver.find_elements(By.CSS_SELECTOR, ".css-1gstnae-DivCommentItemWrapper")
+    presupuesto_segundos = PRESUPUESTO_COMENTARIOS_SEGUNDOS if presupuesto_segundos is None else presupuesto_segundos
+    objetivo = OBJETIVO_COMENTARIOS if objetivo is None else objetivo
+    inicio = time.time()
+    total = 0
+    lotes = 0
+    
+    def entregar(comentarios):
+        nonlocal total, lotes
+        if comentarios:
+            total += len(comentarios)
+            lotes += 1
+            al_lote(comentarios)
+    
+    # En modo red los comentarios ya llegan completos desde la API: cada página se
+    # entrega en cuanto llega, partida en lotes, con el mismo presupuesto que el DOM
+    if MODO_COMENTARIOS_RED:
+        video_id = re.search(r'video/(\d+)', driver.current_url)
         
-        # Establecer límite (todos o un número específico)
-        if limite is None or limite > total_comentarios:
-            limite = total_comentarios
+        def entregar_pagina(comentarios):
+            for i in range(0, len(comentarios), tamano_lote):
+                entregar(comentarios[i:i + tamano_lote])
         
-        print(f"Extrayendo {limite} comentarios de {total_comentarios} disponibles...")
+        resultado_red = extraer_comentarios_red(
+            driver, video_id.group(1) if video_id else None, entregar_pagina,
+            limite=objetivo, presupuesto_segundos=presupuesto_segundos
+        )
+        if resultado_red is not None:
+            return {"total": total, "lotes": lotes, "segundos": round(time.time() - inicio, 2), "motivo": "red",
+                    "parada": resultado_red["motivo"], "total_video": resultado_red["total_video"]}
+        print("No se capturaron respuestas de comentarios por red. Cosechando desde el DOM...")
+    
+    try:
+        driver.find_element(By.CSS_SELECTOR, ".css-7whb78-DivCommentListContainer")
+    except NoSuchElementException:
+        print("No se encontró el contenedor de comentarios.")
+        return {"total": 0, "lotes": 0, "segundos": round(time.time() - inicio, 2), "motivo": "sin_contenedor"}
+    
+    espera = ESPERA_SCROLL_MAXIMA
+    sin_crecimiento = 0
+    motivo = None
+    
+    while motivo is None:
+        try:
+            lote = driver.execute_script(
+                _SCRIPT_COSECHAR_COMENTARIOS, min(tamano_lote, objetivo - total),
+                COMENTARIOS_ANCLA, PODAR_COMENTARIOS_COSECHADOS
+            )
+        except Exception as e:
+            print(f"Error al cosechar comentarios: {e}")
+            motivo = "error"
+            break
         
-        # Extraer la información de cada comentario
-        for i, elemento in enumerate(elementos_comentarios[:limite]):
-            comentario = {}
-            
-            # Extraer nombre de usuario
-            try:
-                usuario_element = elemento.find_element(By.CSS_SELECTOR, "div[data-e2e='comment-username-1'] p.TUXText--weight-medium")
-                comentario['usuario'] = usuario_element.text
-            except Exception as e:
-                print(f"Error al extraer usuario del comentario {i+1}: {e}")
-                comentario['usuario'] = "Desconocido"
-            
-            # Extraer contenido del comentario
-            try:
-                contenido_element = elemento.find_element(By.CSS_SELECTOR, "span[data-e2e='comment-level-1'] p")
-                comentario['contenido'] = contenido_element.text
-            except Exception as e:
-                print(f"Error al extraer contenido del comentario {i+1}: {e}")
-                comentario['contenido'] = ""
-            
-            # Extraer número de likes del comentario
-            try:
-                likes_element = elemento.find_element(By.CSS_SELECTOR, ".css-1nd5cw-DivLikeContainer span.TUXText--weight-normal")
-                likes_texto = likes_element.text.strip()
-                comentario['likes'] = convertir_numero(likes_texto) if likes_texto else 0
-            except Exception as e:
-                print(f"Error al extraer likes del comentario {i+1}: {e}")
-                comentario['likes'] = 0
-            
-            # Extraer fecha del comentario
-            try:
-                # Intenta con un selector más específico basado en las clases TUXText
-                fecha_elements = elemento.find_elements(By.CSS_SELECTOR, 
-                    "span.TUXText.TUXText--tiktok-sans.TUXText--weight-normal[style*='color: var(--ui-text-3)']")
-                
-                if fecha_elements:
-                    fecha_texto = fecha_elements[0].text.strip()
-                    comentario['fecha'] = fecha_texto
-                    fecha_exacta = procesar_fecha(fecha_texto)
-                    comentario['fecha_exacta'] = fecha_exacta.strftime('%Y-%m-%d %H:%M:%S')
-                else:
-                    # Intento alternativo con el selector original
-                    fecha_elements = elemento.find_elements(By.CSS_SELECTOR, ".css-njhskk-DivCommentSubContentWrapper span")
-                    if fecha_elements:
-                        fecha_texto = fecha_elements[0].text.strip()
-                        comentario['fecha'] = fecha_texto
-                        fecha_exacta = procesar_fecha(fecha_texto)
-                        comentario['fecha_exacta'] = fecha_exacta.strftime('%Y-%m-%d %H:%M:%S')
-                    else:
-                        # Último intento: buscar cualquier span con el formato de fecha
-                        all_spans = elemento.find_elements(By.TAG_NAME, "span")
-                        fecha_encontrada = False
-                        for span in all_spans:
-                            texto = span.text.strip()
-                            # Comprobar si el texto parece una fecha (como "Hace 5 h" o "4-27")
-                            if texto.startswith("Hace") or re.match(r'\d+-\d+', texto):
-                                fecha_texto = texto
-                                comentario['fecha'] = fecha_texto
-                                fecha_exacta = procesar_fecha(fecha_texto)
-                                comentario['fecha_exacta'] = fecha_exacta.strftime('%Y-%m-%d %H:%M:%S')
-                                fecha_encontrada = True
-                                break
-                        
-                        if not fecha_encontrada:
-                            raise Exception("No se encontró el elemento de fecha")
-            except Exception as e:
-                print(f"Error al extraer fecha del comentario {i+1}: {e}")
-                comentario['fecha'] = ""
-                comentario['fecha_exacta'] = None
-            
-            comentarios.append(comentario)
-            
-            # Mostrar progreso
-
+        entregar([procesar_comentario_crudo(crudo) for crudo in lote["comentarios"]])
         
-        # Subir al principio del scroll
-        driver.execute_script("window.scrollTo(0, 0);")
-        time.sleep(1)  # Opcional: para asegurar que la acción tenga efecto visual
-    
-    except Exception as e:
-        print(f"Error general al extraer comentarios: {e}")
+        restante = presupuesto_segundos - (time.time() - inicio)
+        if total >= objetivo:
+            motivo = "objetivo"
+        elif restante <= 0:
+            motivo = "presupuesto"
+        elif lote["pendientes"] > 0:
+            # Quedan comentarios cargados sin cosechar: seguimos sin esperar
+            continue
+        elif sin_crecimiento >= max_sin_crecimiento:
+            motivo = "estancado"
+        else:
+            inicio_espera = time.time()
+            hay_nuevos = esperar_condicion(
+                driver, nuevos_nodos(SELECTOR_COMENTARIOS_PENDIENTES, 0), min(espera, restante), "nuevos_comentarios"
+            )
+            if hay_nuevos:
+                sin_crecimiento = 0
+                espera = min(ESPERA_SCROLL_MAXIMA, max(ESPERA_SCROLL_MINIMA, 3 * (time.time() - inicio_espera)))
+            else:
+                sin_crecimiento += 1
     
-    return comentarios
+    segundos = time.time() - inicio
+    estadisticas = {
+        "total": total,
+        "lotes": lotes,
+        "segundos": round(segundos, 2),
+        "comentarios_por_segundo": round(total / segundos, 2) if segundos > 0 else 0.0,
+        "motivo": motivo
+    }
+    print(f"Cosecha de comentarios: {estadisticas}")
+    return estadisticas
 
 
 def extraer_descripcion_video(driver):
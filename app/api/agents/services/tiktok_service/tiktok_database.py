@@ -3,9 +3,16 @@ Servicio para guardar datos de TikTok en la base de datos.
 """
 import os
 import re
+import time
+import threading
+from collections import OrderedDict
 import psycopg2
+import psycopg2.extensions
+from contextlib import contextmanager
 from datetime import datetime
 from dotenv import load_dotenv
+from psycopg2.extras import execute_values
+from psycopg2.pool import ThreadedConnectionPool
 
 def extract_video_id(url):
     """
@@ -26,32 +33,385 @@ def extract_video_id(url):
     
     return match.group(1) if match else None
 
-def guardar_en_base_datos(info_channel, info_video, info_comments, subtitulos=None):
+# Conexiones que mantiene el pool (mínimo abiertas y máximo simultáneas)
+MIN_CONEXIONES_DB = int(os.getenv("TIKTOK_DB_POOL_MIN", "1"))
+MAX_CONEXIONES_DB = int(os.getenv("TIKTOK_DB_POOL_MAX", "10"))
+
+# Segundos máximos que un guardado espera a que se libere una conexión
+TIMEOUT_CONEXION_DB = float(os.getenv("TIKTOK_DB_POOL_TIMEOUT", "30"))
+
+# Segundos de inactividad tras los cuales se verifica la conexión antes de usarla
+VERIFICAR_CONEXION_INACTIVA = float(os.getenv("TIKTOK_DB_VERIFICAR_INACTIVA", "30"))
+
+# Entradas y segundos de vida de la caché de IDs de redes sociales y canales
+TAMANO_CACHE_IDS = int(os.getenv("TIKTOK_DB_CACHE_IDS", "2000"))
+TTL_CACHE_IDS = float(os.getenv("TIKTOK_DB_CACHE_TTL", "3600"))
+
+# Filas por sentencia en la inserción masiva de comentarios
+FILAS_POR_INSERT_COMENTARIOS = int(os.getenv("TIKTOK_DB_FILAS_POR_INSERT", "500"))
+
+# Errores que indican que la base de datos no está disponible: el lote se reintenta
+ERRORES_CONEXION = (psycopg2.OperationalError, psycopg2.InterfaceError, TimeoutError)
+
+_configuracion_db = None
+
+def obtener_configuracion_db():
+    """
+    Devuelve la configuración de conexión, leyendo el entorno solo la primera vez.
+    
+    Returns:
+        dict: Parámetros para psycopg2.connect
+    """
+    global _configuracion_db
+    if _configuracion_db is None:
+        # Cargar variables de entorno
+        load_dotenv()
+        
+        # Configuración de la conexión a la base de datos
+        _configuracion_db = {
+            'user': os.getenv('username'),
+            'password': os.getenv('password'),
+            'host': os.getenv('host'),
+            'port': os.getenv('port'),
+            'database': os.getenv('database'),
+            'sslmode': os.getenv('sslmode'),
+            # Keepalives TCP para detectar conexiones caídas mientras están libres en el pool
+            'keepalives': 1,
+            'keepalives_idle': 30,
+            'keepalives_interval': 10,
+            'keepalives_count': 3
+        }
+    return _configuracion_db
+
+class PoolConexionesDB:
+    """
+    Pool de conexiones a PostgreSQL compartido por todos los guardados, con verificación de salud.
+    """
+    
+    def __init__(self, minimo=MIN_CONEXIONES_DB, maximo=MAX_CONEXIONES_DB, configuracion=None):
+        """
+        Inicializa el pool y abre las conexiones mínimas.
+        
+        Args:
+            minimo: Conexiones que se mantienen abiertas
+            maximo: Conexiones simultáneas máximas
+            configuracion: Parámetros de conexión (por defecto los del entorno)
+        """
+        self.maximo = max(1, maximo)
+        self._pool = ThreadedConnectionPool(
+            max(0, min(minimo, self.maximo)), self.maximo, **(configuracion or obtener_configuracion_db())
+        )
+        # ThreadedConnectionPool falla al agotarse; el semáforo hace esperar en su lugar
+        self._disponibles = threading.BoundedSemaphore(self.maximo)
+        self._ultimo_uso = {}
+        self._lock = threading.Lock()
+        self.estadisticas = {
+            "checkouts": 0,
+            "reconexiones": 0,
+            "segundos_esperando": 0.0
+        }
+    
+    def _esta_sana(self, conn):
+        """
+        Comprueba que la conexión sigue viva, con una consulta si lleva tiempo inactiva.
+        
+        Args:
+            conn: Conexión de psycopg2
+            
+        Returns:
+            bool: True si la conexión se puede usar
+        """
+        if conn.closed:
+            return False
+        if time.time() - self._ultimo_uso.get(id(conn), 0) < VERIFICAR_CONEXION_INACTIVA:
+            return True
+        try:
+            with conn.cursor() as cur:
+                cur.execute("SELECT 1")
+            conn.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+    
+    def _descartar(self, conn):
+        """Cierra una conexión rota y la saca del pool."""
+        self._ultimo_uso.pop(id(conn), None)
+        try:
+            self._pool.putconn(conn, close=True)
+        except psycopg2.pool.PoolError:
+            pass
+    
+    def checkout(self):
+        """
+        Obtiene una conexión sana, reconectando si la del pool se cayó.
+        
+        Returns:
+            Conexión de psycopg2
+            
+        Raises:
+            TimeoutError: Si no se libera ninguna conexión a tiempo
+        """
+        inicio = time.time()
+        if not self._disponibles.acquire(timeout=TIMEOUT_CONEXION_DB):
+            raise TimeoutError(f"No hay conexiones libres tras {TIMEOUT_CONEXION_DB} segundos")
+        
+        try:
+            conn = self._pool.getconn()
+            if not self._esta_sana(conn):
+                print("Conexión a la base de datos caída. Reconectando...")
+                self._descartar(conn)
+                conn = self._pool.getconn()
+                with self._lock:
+                    self.estadisticas["reconexiones"] += 1
+        except Exception:
+            self._disponibles.release()
+            raise
+        
+        with self._lock:
+            self.estadisticas["checkouts"] += 1
+            self.estadisticas["segundos_esperando"] += time.time() - inicio
+        return conn
+    
+    def checkin(self, conn):
+        """
+        Devuelve una conexión al pool, deshaciendo cualquier transacción abierta.
+        
+        Args:
+            conn: Conexión obtenida con checkout()
+        """
+        try:
+            if conn.closed:
+                self._descartar(conn)
+                return
+            try:
+                if conn.get_transaction_status() != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except psycopg2.Error:
+                self._descartar(conn)
+                return
+            self._ultimo_uso[id(conn)] = time.time()
+            self._pool.putconn(conn)
+        finally:
+            self._disponibles.release()
+    
+    @contextmanager
+    def conexion(self):
+        """
+        Context manager que presta una conexión y la devuelve al terminar.
+        
+        Yields:
+            Conexión de psycopg2 (el llamador confirma con commit)
+        """
+        conn = self.checkout()
+        try:
+            yield conn
+        finally:
+            self.checkin(conn)
+    
+    def obtener_estadisticas(self):
+        """
+        Devuelve las estadísticas del pool.
+        
+        Returns:
+            dict: Conexiones prestadas, reconexiones y tiempo de espera
+        """
+        with self._lock:
+            datos = {clave: round(valor, 3) if isinstance(valor, float) else valor
+                     for clave, valor in self.estadisticas.items()}
+        datos["maximo"] = self.maximo
+        return datos
+    
+    def cerrar(self):
+        """Cierra todas las conexiones del pool."""
+        self._pool.closeall()
+
+_pool_conexiones = None
+_pool_conexiones_lock = threading.Lock()
+
+def obtener_pool_conexiones():
+    """
+    Devuelve el pool compartido de conexiones, creándolo si no existe.
+    
+    Returns:
+        PoolConexionesDB: Pool de conexiones
+    """
+    global _pool_conexiones
+    with _pool_conexiones_lock:
+        if _pool_conexiones is None:
+            _pool_conexiones = PoolConexionesDB()
+        return _pool_conexiones
+
+def cerrar_pool_conexiones():
+    """Cierra el pool compartido de conexiones si existe."""
+    global _pool_conexiones
+    with _pool_conexiones_lock:
+        if _pool_conexiones is not None:
+            _pool_conexiones.cerrar()
+            _pool_conexiones = None
+
+class CacheIds:
+    """
+    Caché LRU con expiración para IDs que casi nunca cambian (redes sociales, canales).
+    """
+    
+    def __init__(self, tamano=TAMANO_CACHE_IDS, ttl=TTL_CACHE_IDS):
+        """
+        Inicializa la caché vacía.
+        
+        Args:
+            tamano: Número máximo de entradas (se descarta la menos usada)
+            ttl: Segundos que una entrada es válida
+        """
+        self.tamano = max(1, tamano)
+        self.ttl = ttl
+        self._datos = OrderedDict()
+        self._lock = threading.Lock()
+        self.estadisticas = {"aciertos": 0, "fallos": 0, "invalidaciones": 0}
+    
+    def obtener(self, clave):
+        """
+        Devuelve el ID guardado para la clave.
+        
+        Args:
+            clave: Tupla (tabla, valor buscado)
+            
+        Returns:
+            El ID, o None si no está o expiró
+        """
+        with self._lock:
+            entrada = self._datos.get(clave)
+            if entrada is None or time.time() - entrada[1] > self.ttl:
+                if entrada is not None:
+                    del self._datos[clave]
+                self.estadisticas["fallos"] += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.estadisticas["aciertos"] += 1
+            return entrada[0]
+    
+    def guardar(self, clave, valor):
+        """
+        Guarda un ID, descartando la entrada menos usada si se supera el tamaño.
+        
+        Args:
+            clave: Tupla (tabla, valor buscado)
+            valor: ID de la fila
+        """
+        with self._lock:
+            self._datos[clave] = (valor, time.time())
+            self._datos.move_to_end(clave)
+            while len(self._datos) > self.tamano:
+                self._datos.popitem(last=False)
+    
+    def invalidar(self, claves):
+        """
+        Elimina las claves indicadas (por ejemplo, las usadas en una transacción fallida).
+        
+        Args:
+            claves: Claves a eliminar
+        """
+        with self._lock:
+            for clave in claves:
+                if self._datos.pop(clave, None) is not None:
+                    self.estadisticas["invalidaciones"] += 1
+
+# Caché compartida por todos los guardados del proceso
+cache_ids = CacheIds()
+
+# Columnas de comments en el orden de _filas_comentarios. comment_id y reply_count
+# solo llegan desde la captura por red; commented_at es aproximada en el DOM
+COLUMNAS_COMENTARIOS = (
+    "scrapper_result_id, username, content, like_count, comment_id, reply_count, commented_at"
+)
+
+def _filas_comentarios(scrapper_result_id, comentarios):
+    """
+    Convierte los comentarios en tuplas con el orden de columnas de la tabla comments.
+    
+    Args:
+        scrapper_result_id: ID del registro en scrapper_results
+        comentarios: Lista de diccionarios con información de comentarios
+        
+    Returns:
+        list: Tuplas con el orden de COLUMNAS_COMENTARIOS
+    """
+    return [
+        (
+            scrapper_result_id,
+            comentario.get('usuario', 'Desconocido'),
+            comentario.get('contenido', ''),
+            comentario.get('likes', 0),
+            comentario.get('id'),
+            comentario.get('respuestas'),
+            comentario.get('fecha_exacta')
+        )
+        for comentario in comentarios
+    ]
+
+def _insertar_comentarios(cur, scrapper_result_id, comentarios):
+    """
+    Inserta comentarios asociados a un resultado de scraping con INSERT de varias filas.
+    
+    Los comentarios que el video ya tiene guardados (mismo comment_id o, en los leídos
+    del DOM, mismo usuario y contenido) se omiten, así que volver a scrapear un video
+    solo agrega los comentarios nuevos.
+    
+    Args:
+        cur: Cursor abierto dentro de la transacción
+        scrapper_result_id: ID del registro en scrapper_results
+        comentarios: Lista de diccionarios con información de comentarios
+        
+    Returns:
+        list: IDs de los comentarios insertados, en orden; los repetidos no aparecen
+    """
+    if not comentarios:
+        return []
+    
+    # Con fetch=True execute_values junta los RETURNING de todas las páginas
+    filas = execute_values(
+        cur,
+        f"""
+        INSERT INTO comments 
+        ({COLUMNAS_COMENTARIOS}) 
+        VALUES %s 
+        ON CONFLICT DO NOTHING 
+        RETURNING id
+        """,
+        _filas_comentarios(scrapper_result_id, comentarios),
+        page_size=FILAS_POR_INSERT_COMENTARIOS,
+        fetch=True
+    )
+    return [fila[0] for fila in filas]
+
+def video_id_para_guardar(info_video):
     """
-    Guarda los datos extraídos en la base de datos.
+    Obtiene el video_id con el que se guarda un video.
     
     Args:
+        info_video: Diccionario con información del video
+        
+    Returns:
+        str: ID del video
+    """
+    # Extraer video_id de la URL si está disponible
+    video_url = info_video.get('video_url', '')
+    return extract_video_id(video_url) or '7501847835747388727'  # Usar ID predeterminado si no se encuentra
+
+def _guardar_video(cur, info_channel, info_video, info_comments, subtitulos, claves_usadas):
+    """
+    Guarda red social, canal, video y comentarios dentro de una transacción abierta.
+    
+    Args:
+        cur: Cursor abierto dentro de la transacción
         info_channel: Diccionario con información del canal
         info_video: Diccionario con información del video
         info_comments: Lista de diccionarios con información de comentarios
         subtitulos: Texto completo de los subtítulos capturados (opcional)
+        claves_usadas: Lista donde se agregan las claves de la caché usadas
         
     Returns:
         Diccionario con los IDs generados para cada inserción
     """
-    # Cargar variables de entorno
-    load_dotenv()
-    
-    # Configuración de la conexión a la base de datos
-    db_config = {
-        'user': os.getenv('username'),
-        'password': os.getenv('password'),
-        'host': os.getenv('host'),
-        'port': os.getenv('port'),
-        'database': os.getenv('database'),
-        'sslmode': os.getenv('sslmode')
-    }
-    
     # Inicializar diccionario para almacenar IDs generados
     ids_generados = {
         'social_network_id': None,
@@ -61,121 +421,163 @@ def guardar_en_base_datos(info_channel, info_video, info_comments, subtitulos=No
         'video_id': None
     }
     
-    # Extraer video_id de la URL si está disponible
-    video_url = info_video.get('video_url', '')
-    video_id = extract_video_id(video_url) or '7501847835747388727'  # Usar ID predeterminado si no se encuentra
+    video_id = video_id_para_guardar(info_video)
     ids_generados['video_id'] = video_id
     
-    try:
-        # Establecer conexión con la base de datos
-        conn = psycopg2.connect(**db_config)
-        cur = conn.cursor()
+    # 1. Insertar o obtener ID de la red social (TikTok)
+    clave_red = ('social_networks', 'TikTok')
+    claves_usadas.append(clave_red)
+    social_network_id = cache_ids.obtener(clave_red)
+    
+    if social_network_id is None:
+        # El DO UPDATE sin cambios hace que RETURNING devuelva también la fila existente
+        cur.execute(
+            """
+            INSERT INTO social_networks (name) VALUES (%s) 
+            ON CONFLICT (name) DO UPDATE SET name = EXCLUDED.name 
+            RETURNING id
+            """,
+            ('TikTok',)
+        )
+        social_network_id = cur.fetchone()[0]
+        cache_ids.guardar(clave_red, social_network_id)
+    
+    ids_generados['social_network_id'] = social_network_id
+    
+    # 2. Insertar o obtener ID del canal
+    if info_channel.get('url') and info_channel.get('name'):
+        clave_canal = ('channels', info_channel['url'])
+        claves_usadas.append(clave_canal)
+        channel_id = cache_ids.obtener(clave_canal)
+        
+        if channel_id is None:
+            # Si el canal ya existe se actualiza su nombre (puede haber cambiado)
+            cur.execute(
+                """
+                INSERT INTO channels (social_network_id, name, url) VALUES (%s, %s, %s) 
+                ON CONFLICT (url) DO UPDATE SET name = EXCLUDED.name 
+                RETURNING id
+                """,
+                (social_network_id, info_channel['name'], info_channel['url'])
+            )
+            channel_id = cur.fetchone()[0]
+            cache_ids.guardar(clave_canal, channel_id)
         
-        # 1. Insertar o obtener ID de la red social (TikTok)
-        cur.execute("SELECT id FROM social_networks WHERE name = %s", ('TikTok',))
-        resultado = cur.fetchone()
+        ids_generados['channel_id'] = channel_id
         
-        if resultado:
-            social_network_id = resultado[0]
+        # 3. Insertar resultado del scraping del video
+        scraped_at = datetime.now()
+        if info_video.get('fecha_exacta'):
+            try:
+                scraped_at = datetime.strptime(info_video['fecha_exacta'], '%Y-%m-%d %H:%M:%S')
+            except Exception as e:
+                print(f"Error al convertir fecha_exacta: {e}")
+        
+        # Preparar subtítulos (si se proporcionan)
+        transcript = subtitulos if subtitulos else None
+        
+        # Si el video ya existe se conserva el registro original; xmax = 0
+        # indica que la fila se acaba de insertar
+        cur.execute(
+            """
+            INSERT INTO scrapper_results 
+            (channel_id, comment_count, like_count, view_count, scraped_at, video_id, transcript) 
+            VALUES (%s, %s, %s, %s, %s, %s, %s) 
+            ON CONFLICT (video_id) DO UPDATE SET video_id = EXCLUDED.video_id 
+            RETURNING id, (xmax = 0) AS insertado
+            """,
+            (
+                channel_id, 
+                info_video.get('comentarios', 0), 
+                info_video.get('likes', 0),
+                0,  # view_count no está disponible en el código proporcionado
+                scraped_at,
+                video_id,
+                transcript
+            )
+        )
+        scrapper_result_id, insertado = cur.fetchone()
+        ids_generados['scrapper_result_id'] = scrapper_result_id
+        if insertado:
+            print(f"Nuevo video con ID {video_id} insertado en la base de datos.")
         else:
-            cur.execute("INSERT INTO social_networks (name) VALUES (%s) RETURNING id", ('TikTok',))
-            social_network_id = cur.fetchone()[0]
+            print(f"Video con ID {video_id} ya existe en la base de datos. No se insertará un nuevo registro.")
         
-        ids_generados['social_network_id'] = social_network_id
+        # 4. Insertar comentarios (los que el video ya tenía se omiten)
+        ids_generados['comments_ids'] = _insertar_comentarios(cur, scrapper_result_id, info_comments)
+    
+    return ids_generados
+
+def _guardar_comentarios_de_video(cur, video_id, comentarios):
+    """
+    Inserta comentarios de un video identificado por su video_id de TikTok.
+    
+    Args:
+        cur: Cursor abierto dentro de la transacción
+        video_id: ID del video en TikTok
+        comentarios: Lista de diccionarios con información de comentarios
         
-        # 2. Insertar o obtener ID del canal
-        if info_channel.get('url') and info_channel.get('name'):
-            cur.execute("SELECT id FROM channels WHERE url = %s", (info_channel['url'],))
-            resultado = cur.fetchone()
-            
-            if resultado:
-                channel_id = resultado[0]
-            else:
-                cur.execute(
-                    "INSERT INTO channels (social_network_id, name, url) VALUES (%s, %s, %s) RETURNING id",
-                    (social_network_id, info_channel['name'], info_channel['url'])
-                )
-                channel_id = cur.fetchone()[0]
-            
-            ids_generados['channel_id'] = channel_id
-            
-            # Verificar si ya existe un registro con este video_id
-            cur.execute("SELECT id FROM scrapper_results WHERE video_id = %s", (video_id,))
-            video_existente = cur.fetchone()
-            
-            if video_existente:
-                # El video ya existe, usar ese ID y no insertar un nuevo registro
-                scrapper_result_id = video_existente[0]
-                ids_generados['scrapper_result_id'] = scrapper_result_id
-                print(f"Video con ID {video_id} ya existe en la base de datos. No se insertará un nuevo registro.")
-            else:
-                # 3. Insertar resultado del scraping del video
-                scraped_at = datetime.now()
-                if info_video.get('fecha_exacta'):
+    Returns:
+        list: IDs de los comentarios insertados (vacía si el video no está guardado)
+    """
+    cur.execute("SELECT id FROM scrapper_results WHERE video_id = %s", (video_id,))
+    resultado = cur.fetchone()
+    if not resultado:
+        print(f"El video {video_id} no está guardado. Se descartan {len(comentarios)} comentarios.")
+        return []
+    return _insertar_comentarios(cur, resultado[0], comentarios)
+
+def guardar_registros(registros):
+    """
+    Guarda un lote de registros de videos y de comentarios en una sola transacción.
+    
+    Cada registro se aplica dentro de un SAVEPOINT: si sus datos son inválidos se
+    descarta solo ese registro y el resto del lote se confirma. Los errores de
+    conexión, en cambio, deshacen el lote completo y se propagan para reintentarlo.
+    
+    Args:
+        registros: Lista de diccionarios con 'tipo' igual a 'video' (info_channel,
+            info_video, subtitulos y opcionalmente info_comments) o 'comentarios'
+            (video_id y comentarios)
+        
+    Returns:
+        list: Por cada registro, el diccionario de IDs generados o la excepción que lo rechazó
+        
+    Raises:
+        psycopg2.OperationalError, psycopg2.InterfaceError, TimeoutError: Si la base
+            de datos no está disponible
+    """
+    resultados = []
+    claves_usadas = []
+    with obtener_pool_conexiones().conexion() as conn:
+        try:
+            with conn.cursor() as cur:
+                for registro in registros:
+                    claves_registro = []
+                    cur.execute("SAVEPOINT registro")
                     try:
-                        scraped_at = datetime.strptime(info_video['fecha_exacta'], '%Y-%m-%d %H:%M:%S')
+                        if registro["tipo"] == "video":
+                            resultado = _guardar_video(
+                                cur, registro["info_channel"], registro["info_video"],
+                                registro.get("info_comments") or [], registro.get("subtitulos"), claves_registro
+                            )
+                        else:
+                            resultado = {
+                                'video_id': registro["video_id"],
+                                'comments_ids': _guardar_comentarios_de_video(cur, registro["video_id"], registro["comentarios"])
+                            }
+                        cur.execute("RELEASE SAVEPOINT registro")
+                    except ERRORES_CONEXION:
+                        raise
                     except Exception as e:
-                        print(f"Error al convertir fecha_exacta: {e}")
-                
-                # Preparar subtítulos (si se proporcionan)
-                transcript = subtitulos if subtitulos else None
-                
-                cur.execute(
-                    """
-                    INSERT INTO scrapper_results 
-                    (channel_id, comment_count, like_count, view_count, scraped_at, video_id, transcript) 
-                    VALUES (%s, %s, %s, %s, %s, %s, %s) 
-                    RETURNING id
-                    """,
-                    (
-                        channel_id, 
-                        info_video.get('comentarios', 0), 
-                        info_video.get('likes', 0),
-                        0,  # view_count no está disponible en el código proporcionado
-                        scraped_at,
-                        video_id,
-                        transcript
-                    )
-                )
-                scrapper_result_id = cur.fetchone()[0]
-                ids_generados['scrapper_result_id'] = scrapper_result_id
-                print(f"Nuevo video con ID {video_id} insertado en la base de datos.")
-            
-            # 4. Insertar comentarios
-            for comentario in info_comments:
-                cur.execute(
-                    """
-                    INSERT INTO comments 
-                    (scrapper_result_id, username, content, like_count) 
-                    VALUES (%s, %s, %s, %s) 
-                    RETURNING id
-                    """,
-                    (
-                        scrapper_result_id,
-                        comentario.get('usuario', 'Desconocido'),
-                        comentario.get('contenido', ''),
-                        comentario.get('likes', 0)
-                    )
-                )
-                comment_id = cur.fetchone()[0]
-                ids_generados['comments_ids'].append(comment_id)
-        
-        # Confirmar cambios
-        conn.commit()
-        print(f"Datos guardados correctamente en la base de datos.")
-        print(f"Video ID: {video_id}")
-        print(f"Total de comentarios guardados: {len(ids_generados['comments_ids'])}")
-        
-    except Exception as e:
-        print(f"Error al guardar en la base de datos: {e}")
-        # Revertir cambios en caso de error
-        if 'conn' in locals() and conn:
-            conn.rollback()
-    finally:
-        # Cerrar cursor y conexión
-        if 'cur' in locals() and cur:
-            cur.close()
-        if 'conn' in locals() and conn:
-            conn.close()
-    
-    return ids_generados
\ No newline at end of file
+                        print(f"Registro de tipo '{registro.get('tipo')}' rechazado por la base de datos: {e}")
+                        cur.execute("ROLLBACK TO SAVEPOINT registro")
+                        cache_ids.invalidar(claves_registro)
+                        resultado = e
+                    claves_usadas.extend(claves_registro)
+                    resultados.append(resultado)
+            conn.commit()
+        except Exception:
+            cache_ids.invalidar(claves_usadas)
+            raise
+    return resultados
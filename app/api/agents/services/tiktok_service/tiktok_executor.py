@@ -0,0 +1,61 @@
+"""
+Ejecutor dedicado para el trabajo bloqueante del navegador (Selenium, esperas y base de datos).
+"""
+import asyncio
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+# Número máximo de sesiones de navegador que pueden ejecutarse a la vez.
+# Cada sesión ocupa un hilo del ejecutor durante todo su recorrido.
+MAX_SESIONES_NAVEGADOR = int(os.getenv("TIKTOK_MAX_SESIONES_NAVEGADOR", "4"))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def obtener_executor() -> ThreadPoolExecutor:
+    """
+    Devuelve el ejecutor de sesiones de navegador, creándolo si no existe.
+
+    Returns:
+        ThreadPoolExecutor: Ejecutor compartido para el trabajo del navegador
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=max(1, MAX_SESIONES_NAVEGADOR),
+                thread_name_prefix="tiktok-navegador"
+            )
+        return _executor
+
+
+async def ejecutar_en_navegador(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    Ejecuta una función bloqueante en el ejecutor del navegador sin bloquear el event loop.
+
+    Toda la sesión del navegador corre dentro de un único hilo, así el driver
+    nunca se comparte entre hilos.
+
+    Args:
+        func: Función bloqueante a ejecutar
+        *args: Argumentos posicionales para la función
+        **kwargs: Argumentos con nombre para la función
+
+    Returns:
+        El valor devuelto por la función
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(obtener_executor(), functools.partial(func, *args, **kwargs))
+
+
+def cerrar_executor():
+    """Detiene el ejecutor, descartando las sesiones que aún no hayan empezado."""
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
@@ -1,12 +1,18 @@
 """
 Servicio para interacciones con la interfaz de TikTok.
 """
-import time
 from selenium.webdriver.common.by import By
 from selenium.webdriver.common.action_chains import ActionChains
-from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
-from selenium.common.exceptions import TimeoutException, NoSuchElementException
+from app.api.agents.services.tiktok_service.tiktok_waits import (
+    esperar_condicion, menu_visible, firma_video_actual, video_cambiado,
+    instalar_observador, hubo_mutaciones
+)
+
+# Segundos máximos que se espera a que cambie el video tras pulsar "siguiente"
+# (los mismos que las pausas fijas que reemplazan)
+ESPERA_CAMBIO_VIDEO = 1
+ESPERA_CAMBIO_VIDEO_ACTIONS = 3
 
 def esperar_elemento(driver, by, selector, tiempo=10):
     """
@@ -21,14 +27,12 @@ def esperar_elemento(driver, by, selector, tiempo=10):
     Returns:
         El elemento encontrado o None si no se encuentra
     """
-    try:
-        elemento = WebDriverWait(driver, tiempo).until(
-            EC.presence_of_element_located((by, selector))
-        )
-        return elemento
-    except (TimeoutException, NoSuchElementException):
+    elemento = esperar_condicion(
+        driver, EC.presence_of_element_located((by, selector)), tiempo, "esperar_elemento"
+    )
+    if elemento is None:
         print(f"No se pudo encontrar el elemento {selector}")
-        return None
+    return elemento
 
 def activar_subtitulos(driver):
     """
@@ -55,37 +59,44 @@ def activar_subtitulos(driver):
         # Hacer clic derecho en el video
         actions = ActionChains(driver)
         actions.context_click(video_element).perform()
-        time.sleep(1)
 
-        # Clic en "Ver detalles del video"
-        detalles = esperar_elemento(driver, By.XPATH, 
-            "//div[@data-e2e='right-click-menu-popover_view-video-details' or contains(text(), 'Ver detalles del video')]", 3)
+        # Clic en "Ver detalles del video" en cuanto el menú contextual se renderice
+        detalles = esperar_condicion(driver, menu_visible(By.XPATH, 
+            "//div[@data-e2e='right-click-menu-popover_view-video-details' or contains(text(), 'Ver detalles del video')]"),
+            3, "menu_detalles_video")
+        if not detalles:
+            print("No apareció 'Ver detalles del video' en el menú contextual.")
+            return False
         detalles.click()
-        time.sleep(1)
 
         # Clic en "Más opciones"
-        mas_opciones = esperar_elemento(driver, By.XPATH, 
-            "//div[@data-e2e='more-menu' or contains(text(), 'Más opciones')]", 3)
+        mas_opciones = esperar_condicion(driver, menu_visible(By.XPATH, 
+            "//div[@data-e2e='more-menu' or contains(text(), 'Más opciones')]"), 3, "menu_mas_opciones")
+        if not mas_opciones:
+            print("No apareció el botón 'Más opciones'.")
+            return False
         mas_opciones.click()
-        time.sleep(1)
 
         # Clic en "Subtítulos"
-        subtitulos_option = esperar_elemento(driver, By.XPATH, 
-            "//div[@data-e2e='more-menu-popover_caption' or contains(text(), 'Subtítulos') or contains(text(), 'Captions')]", 3)
+        subtitulos_option = esperar_condicion(driver, menu_visible(By.XPATH, 
+            "//div[@data-e2e='more-menu-popover_caption' or contains(text(), 'Subtítulos') or contains(text(), 'Captions')]"),
+            3, "menu_subtitulos")
+        if not subtitulos_option:
+            print("No apareció la opción 'Subtítulos' en el menú.")
+            return False
         subtitulos_option.click()
-        time.sleep(1)
 
-        # Activar el switch de subtítulos
+        # Activar el switch de subtítulos y esperar a que quede marcado
         switch = esperar_elemento(driver, By.CSS_SELECTOR, "input.TUXSwitch-input", 3)
         if switch and not switch.is_selected():
             switch.click()
+            esperar_condicion(driver, EC.element_to_be_selected(switch), 2, "switch_subtitulos")
             print("Switch de subtítulos activado")
 
-        time.sleep(2)
-
         # Cerrar el menú
-        close_button = esperar_elemento(driver, By.CSS_SELECTOR, 
-            "button.TUXUnstyledButton.TUXNavBarIconButton[aria-label='close'], button[aria-label='cerrar']", 3)
+        close_button = esperar_condicion(driver, menu_visible(By.CSS_SELECTOR, 
+            "button.TUXUnstyledButton.TUXNavBarIconButton[aria-label='close'], button[aria-label='cerrar']"),
+            3, "boton_cerrar_menu")
         if close_button:
             close_button.click()
 
@@ -110,12 +121,15 @@ def dar_like(driver):
     print("Intentando dar like...")
 
     try:
-        # Esperar 1 segundo antes de intentar localizar el botón
-        time.sleep(1)
-        like_button = esperar_elemento(driver, By.XPATH, "//button[.//span[@data-e2e='like-icon']]", 2)
+        # Esperar a que el botón se pueda pulsar
+        like_button = esperar_condicion(driver, menu_visible(By.XPATH, 
+            "//button[.//span[@data-e2e='like-icon']]"), 3, "boton_like")
         if like_button:
+            # Observamos el botón para confirmar que la interfaz registró el like
+            total_mutaciones = instalar_observador(driver, "like", "button:has(span[data-e2e='like-icon'])")
             like_button.click()
-            time.sleep(1)
+            if total_mutaciones >= 0:
+                esperar_condicion(driver, hubo_mutaciones("like", total_mutaciones), 1, "like_registrado")
             print("Like dado correctamente (método XPath)")
             return True
 
@@ -137,6 +151,9 @@ def pasar_siguiente_video(driver):
     """
     print("Pasando al siguiente video...")
     
+    # Guardamos la firma del video actual para detectar cuándo cambia
+    firma_anterior = firma_video_actual(driver)
+    
     try:
         # 1. Primero buscar y desactivar el ícono de repetición si existe
         try:
@@ -162,8 +179,8 @@ def pasar_siguiente_video(driver):
                     return svg.parentNode; // Devolver el padre inmediato si no encontramos nada mejor
                 """, icono_repetir)
                 
+                # Desactivar la repetición no cambia el video: no hay nada que esperar
                 driver.execute_script("arguments[0].click();", elemento_clicable)
-                time.sleep(1.5)
                 print("Se hizo clic en el ícono de repetición exitosamente.")
         except Exception as e:
             print(f"No se encontró el ícono de repetición o no se pudo hacer clic: {e}")
@@ -181,7 +198,9 @@ def pasar_siguiente_video(driver):
                 return false;
             """)
             
-            time.sleep(1)
+            if esperar_condicion(driver, video_cambiado(firma_anterior), ESPERA_CAMBIO_VIDEO,
+                                 "video_cambiado") is None:
+                print("El video no cambió tras hacer clic en siguiente.")
             print("Se pasó al siguiente video exitosamente.")
             return True
         except Exception as e:
@@ -192,7 +211,8 @@ def pasar_siguiente_video(driver):
                 next_button = driver.find_element(By.CSS_SELECTOR, 'button[data-e2e="arrow-right"]')
                 actions = ActionChains(driver)
                 actions.move_to_element(next_button).click().perform()
-                time.sleep(3)
+                esperar_condicion(driver, video_cambiado(firma_anterior), ESPERA_CAMBIO_VIDEO_ACTIONS,
+                                  "video_cambiado")
                 print("Se pasó al siguiente video usando ActionChains.")
                 return True
             except Exception as e2:
@@ -0,0 +1,259 @@
+"""
+Servicio para ejecutar trabajos de scraping de TikTok en segundo plano.
+"""
+import asyncio
+import os
+import threading
+import uuid
+from datetime import datetime
+from typing import Dict, Any, List, Optional
+
+from app.api.agents.services.tiktok_service.tiktok_scraper import TikTokScraperService
+from app.api.agents.services.tiktok_service.tiktok_browser_pool import obtener_pool_navegadores
+from app.api.agents.services.tiktok_service.tiktok_executor import ejecutar_en_navegador
+from app.api.agents.services.tiktok_service.tiktok_sharded import procesar_videos_multiproceso
+
+# Número máximo de trabajos que se ejecutan a la vez (cada uno abre su propio navegador)
+MAX_TRABAJOS_CONCURRENTES = int(os.getenv("TIKTOK_MAX_TRABAJOS", "2"))
+
+# Número máximo de trabajos finalizados que se conservan para consulta
+MAX_TRABAJOS_HISTORIAL = int(os.getenv("TIKTOK_MAX_HISTORIAL_TRABAJOS", "200"))
+
+ESTADO_EN_COLA = "en_cola"
+ESTADO_EJECUTANDO = "ejecutando"
+ESTADO_COMPLETADO = "completado"
+ESTADO_FALLIDO = "fallido"
+ESTADO_CANCELADO = "cancelado"
+
+ESTADOS_FINALES = (ESTADO_COMPLETADO, ESTADO_FALLIDO, ESTADO_CANCELADO)
+
+
+class TrabajoTikTok:
+    """
+    Trabajo de scraping con su estado, progreso por video y resultado final.
+    """
+
+    def __init__(self, num_videos: int, num_procesos: int = 1):
+        """
+        Inicializa el trabajo.
+
+        Args:
+            num_videos: Número de videos a procesar
+            num_procesos: Número de procesos con navegador propio (1 = un solo navegador)
+        """
+        self.id = uuid.uuid4().hex
+        self.num_videos = num_videos
+        self.num_procesos = num_procesos
+        self.estado = ESTADO_EN_COLA
+        self.creado_en = datetime.now()
+        self.iniciado_en = None
+        self.finalizado_en = None
+        self.videos: List[Dict[str, Any]] = []
+        self.resultado = None
+        self.error = None
+        self.cancelacion = threading.Event()
+        self.tarea: Optional[asyncio.Task] = None
+
+    def registrar_video(self, video_result: Dict[str, Any]):
+        """
+        Registra el resultado de un video procesado.
+
+        Args:
+            video_result: Diccionario con el resultado del video
+        """
+        self.videos.append(video_result)
+
+    def a_dict(self, incluir_resultados: bool = True) -> Dict[str, Any]:
+        """
+        Serializa el trabajo para devolverlo en la API.
+
+        Args:
+            incluir_resultados: Si se incluyen los resultados por video
+
+        Returns:
+            Diccionario con el estado del trabajo
+        """
+        videos_con_error = sum(1 for video in self.videos if "error" in video)
+        datos = {
+            "job_id": self.id,
+            "estado": self.estado,
+            "num_videos": self.num_videos,
+            "num_procesos": self.num_procesos,
+            "progreso": {
+                "videos_procesados": len(self.videos) - videos_con_error,
+                "videos_con_error": videos_con_error,
+                "videos_solicitados": self.num_videos
+            },
+            "creado_en": self.creado_en.isoformat(),
+            "iniciado_en": self.iniciado_en.isoformat() if self.iniciado_en else None,
+            "finalizado_en": self.finalizado_en.isoformat() if self.finalizado_en else None,
+            "error": self.error
+        }
+        if incluir_resultados:
+            datos["videos"] = list(self.videos)
+            datos["resultado"] = self.resultado
+        return datos
+
+
+class GestorTrabajosTikTok:
+    """
+    Gestiona la cola de trabajos de scraping con concurrencia limitada.
+    """
+
+    def __init__(self, max_concurrentes: int = MAX_TRABAJOS_CONCURRENTES,
+                 max_historial: int = MAX_TRABAJOS_HISTORIAL):
+        """
+        Inicializa el gestor de trabajos.
+
+        Args:
+            max_concurrentes: Número máximo de trabajos ejecutándose a la vez
+            max_historial: Número máximo de trabajos finalizados que se conservan
+        """
+        self.max_concurrentes = max(1, max_concurrentes)
+        self.max_historial = max_historial
+        self.trabajos: Dict[str, TrabajoTikTok] = {}
+        self._semaforo = None
+
+    def crear_trabajo(self, num_videos: int, num_procesos: int = 1) -> TrabajoTikTok:
+        """
+        Crea un trabajo y lo encola para su ejecución en segundo plano.
+
+        Args:
+            num_videos: Número de videos a procesar
+            num_procesos: Número de procesos con navegador propio
+
+        Returns:
+            El trabajo creado
+        """
+        self._purgar_historial()
+        trabajo = TrabajoTikTok(num_videos, num_procesos)
+        self.trabajos[trabajo.id] = trabajo
+        trabajo.tarea = asyncio.create_task(self._ejecutar(trabajo))
+        print(f"Trabajo {trabajo.id} encolado ({num_videos} videos)")
+        return trabajo
+
+    @property
+    def semaforo(self) -> asyncio.Semaphore:
+        """
+        Semáforo que limita los crawls simultáneos.
+
+        Lo comparten los trabajos en cola y los endpoints que procesan videos
+        directamente, para que ninguno supere MAX_TRABAJOS_CONCURRENTES.
+        """
+        if self._semaforo is None:
+            self._semaforo = asyncio.Semaphore(self.max_concurrentes)
+        return self._semaforo
+
+    async def _ejecutar(self, trabajo: TrabajoTikTok):
+        """
+        Ejecuta un trabajo respetando el límite de concurrencia.
+
+        Args:
+            trabajo: El trabajo a ejecutar
+        """
+        try:
+            async with self.semaforo:
+                if trabajo.cancelacion.is_set():
+                    trabajo.estado = ESTADO_CANCELADO
+                    return
+
+                trabajo.estado = ESTADO_EJECUTANDO
+                trabajo.iniciado_en = datetime.now()
+                print(f"Iniciando trabajo {trabajo.id}...")
+
+                if trabajo.num_procesos > 1:
+                    resultado = await ejecutar_en_navegador(
+                        procesar_videos_multiproceso,
+                        trabajo.num_videos,
+                        trabajo.num_procesos,
+                        al_procesar_video=trabajo.registrar_video,
+                        cancelacion=trabajo.cancelacion
+                    )
+                else:
+                    scraper_service = TikTokScraperService(pool=obtener_pool_navegadores())
+                    resultado = await scraper_service.procesar_videos(
+                        trabajo.num_videos,
+                        al_procesar_video=trabajo.registrar_video,
+                        cancelacion=trabajo.cancelacion
+                    )
+
+                trabajo.resultado = resultado
+                if "error" in resultado:
+                    trabajo.estado = ESTADO_FALLIDO
+                    trabajo.error = resultado["error"]
+                elif resultado.get("cancelado"):
+                    trabajo.estado = ESTADO_CANCELADO
+                else:
+                    trabajo.estado = ESTADO_COMPLETADO
+
+        except asyncio.CancelledError:
+            trabajo.estado = ESTADO_CANCELADO
+        except Exception as e:
+            trabajo.estado = ESTADO_FALLIDO
+            trabajo.error = f"Error inesperado en el trabajo: {str(e)}"
+            print(f"Error en el trabajo {trabajo.id}: {str(e)}")
+        finally:
+            trabajo.finalizado_en = datetime.now()
+            print(f"Trabajo {trabajo.id} finalizado con estado '{trabajo.estado}'")
+
+    def obtener(self, job_id: str) -> Optional[TrabajoTikTok]:
+        """
+        Busca un trabajo por su ID.
+
+        Args:
+            job_id: ID del trabajo
+
+        Returns:
+            El trabajo o None si no existe
+        """
+        return self.trabajos.get(job_id)
+
+    def listar(self, estado: Optional[str] = None) -> List[TrabajoTikTok]:
+        """
+        Lista los trabajos conocidos, del más reciente al más antiguo.
+
+        Args:
+            estado: Filtra por estado si se indica
+
+        Returns:
+            Lista de trabajos
+        """
+        trabajos = [t for t in self.trabajos.values() if estado is None or t.estado == estado]
+        return sorted(trabajos, key=lambda t: t.creado_en, reverse=True)
+
+    def cancelar(self, job_id: str) -> Optional[TrabajoTikTok]:
+        """
+        Solicita la cancelación de un trabajo.
+
+        Un trabajo en cola se cancela de inmediato; uno en ejecución se detiene
+        antes de empezar el siguiente video.
+
+        Args:
+            job_id: ID del trabajo
+
+        Returns:
+            El trabajo o None si no existe
+        """
+        trabajo = self.trabajos.get(job_id)
+        if not trabajo or trabajo.estado in ESTADOS_FINALES:
+            return trabajo
+
+        trabajo.cancelacion.set()
+        if trabajo.estado == ESTADO_EN_COLA and trabajo.tarea:
+            trabajo.tarea.cancel()
+        print(f"Cancelación solicitada para el trabajo {job_id}")
+        return trabajo
+
+    def _purgar_historial(self):
+        """Elimina los trabajos finalizados más antiguos si se supera el historial."""
+        finalizados = [t for t in self.trabajos.values() if t.estado in ESTADOS_FINALES]
+        exceso = len(finalizados) - self.max_historial
+        if exceso <= 0:
+            return
+        finalizados.sort(key=lambda t: t.finalizado_en or t.creado_en)
+        for trabajo in finalizados[:exceso]:
+            del self.trabajos[trabajo.id]
+
+
+# Gestor compartido por todos los endpoints
+gestor_trabajos = GestorTrabajosTikTok()
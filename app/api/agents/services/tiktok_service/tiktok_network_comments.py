@@ -0,0 +1,270 @@
+"""
+Servicio para capturar comentarios de TikTok desde las respuestas de red (Chrome DevTools Protocol).
+"""
+import base64
+import json
+import os
+import re
+import time
+from datetime import datetime
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.api.agents.services.tiktok_service.tiktok_waits import esperar_condicion
+
+# Activa la captura de comentarios por red en lugar de leerlos del DOM
+MODO_COMENTARIOS_RED = os.getenv("TIKTOK_COMENTARIOS_RED", "0") == "1"
+
+# Endpoint de TikTok que devuelve las páginas de comentarios en JSON
+PATRON_API_COMENTARIOS = "/api/comment/list/"
+
+_SCRIPT_SCROLL_COMENTARIOS = """
+var items = document.querySelectorAll('.css-1gstnae-DivCommentItemWrapper');
+if (!items.length) { return false; }
+items[items.length - 1].scrollIntoView();
+return true;
+"""
+
+
+def parsear_respuesta_comentarios(cuerpo: Dict[str, Any]) -> Tuple[List[Dict[str, Any]], Optional[int], bool]:
+    """
+    Convierte una respuesta de /api/comment/list/ en registros de comentarios.
+
+    Args:
+        cuerpo: JSON de la respuesta ya decodificado
+
+    Returns:
+        tuple: (comentarios, total de comentarios del video o None, si hay más páginas)
+    """
+    comentarios = []
+    for item in cuerpo.get("comments") or []:
+        usuario = item.get("user") or {}
+        create_time = item.get("create_time")
+        fecha_exacta = None
+        if create_time:
+            try:
+                fecha_exacta = datetime.fromtimestamp(int(create_time)).strftime('%Y-%m-%d %H:%M:%S')
+            except (ValueError, OverflowError, OSError):
+                pass
+
+        comentarios.append({
+            'id': str(item.get("cid")) if item.get("cid") is not None else None,
+            'usuario': usuario.get("unique_id") or usuario.get("nickname") or "Desconocido",
+            'contenido': item.get("text") or "",
+            'likes': int(item.get("digg_count") or 0),
+            'respuestas': int(item.get("reply_comment_total") or 0),
+            'fecha': fecha_exacta or "",
+            'fecha_exacta': fecha_exacta
+        })
+
+    total = cuerpo.get("total")
+    return comentarios, int(total) if total is not None else None, bool(cuerpo.get("has_more"))
+
+
+def activar_captura_red(driver):
+    """
+    Activa el dominio Network de CDP en el driver.
+
+    Requiere que el navegador se haya creado con el log de rendimiento activado
+    (goog:loggingPrefs = {'performance': 'ALL'}).
+
+    Args:
+        driver: El driver de Selenium WebDriver (uc.Chrome)
+    """
+    driver.execute_cdp_cmd("Network.enable", {})
+
+
+def vaciar_log_red(driver):
+    """
+    Descarta el log de rendimiento acumulado.
+
+    Se llama al empezar cada video para que las respuestas de comentarios de los
+    videos anteriores no se mezclen con las del actual.
+
+    Args:
+        driver: El driver de Selenium WebDriver
+    """
+    try:
+        driver.get_log("performance")
+    except Exception as e:
+        print(f"No se pudo vaciar el log de rendimiento: {e}")
+
+
+class ColectorComentariosRed:
+    """
+    Recolecta las respuestas de comentarios de un video a partir del log de rendimiento de Chrome.
+
+    Con al_comentarios, cada página se entrega en cuanto se lee y no se acumula;
+    solo se conservan los IDs para descartar duplicados.
+    """
+
+    def __init__(self, video_id: Optional[str],
+                 al_comentarios: Optional[Callable[[List[Dict[str, Any]]], None]] = None,
+                 limite: Optional[int] = None):
+        """
+        Inicializa el colector.
+
+        Args:
+            video_id: ID del video cuyos comentarios se recolectan (aweme_id)
+            al_comentarios: Función que recibe los comentarios nuevos de cada página
+                (sin ella se acumulan en self.comentarios)
+            limite: Número máximo de comentarios a recolectar (None para todos)
+        """
+        self.video_id = video_id
+        self.al_comentarios = al_comentarios
+        self.limite = limite
+        self.comentarios: List[Dict[str, Any]] = []
+        self.recolectados = 0
+        self.total: Optional[int] = None
+        self.hay_mas = True
+        self.respuestas_procesadas = 0
+        self._ids_vistos = set()
+        self._pendientes: Dict[str, str] = {}
+
+    @property
+    def completo(self) -> bool:
+        """Indica si ya se recolectó el límite de comentarios."""
+        return self.limite is not None and self.recolectados >= self.limite
+
+    def _es_de_este_video(self, url: str) -> bool:
+        """Comprueba que la petición de comentarios corresponde al video actual."""
+        if PATRON_API_COMENTARIOS not in url:
+            return False
+        if not self.video_id:
+            return True
+        match = re.search(r'[?&]aweme_id=(\d+)', url)
+        return bool(match) and match.group(1) == self.video_id
+
+    def procesar_cuerpo(self, cuerpo: Dict[str, Any]) -> int:
+        """
+        Agrega los comentarios de una respuesta, descartando duplicados y lo que pase del límite.
+
+        Args:
+            cuerpo: JSON de la respuesta
+
+        Returns:
+            int: Número de comentarios nuevos
+        """
+        comentarios, total, hay_mas = parsear_respuesta_comentarios(cuerpo)
+        nuevos = []
+        for comentario in comentarios:
+            if self.limite is not None and self.recolectados + len(nuevos) >= self.limite:
+                break
+            clave = comentario['id'] or (comentario['usuario'], comentario['contenido'])
+            if clave in self._ids_vistos:
+                continue
+            self._ids_vistos.add(clave)
+            nuevos.append(comentario)
+
+        if total is not None:
+            self.total = total
+        self.hay_mas = hay_mas
+        self.respuestas_procesadas += 1
+        self.recolectados += len(nuevos)
+        if nuevos:
+            if self.al_comentarios is not None:
+                self.al_comentarios(nuevos)
+            else:
+                self.comentarios.extend(nuevos)
+        return len(nuevos)
+
+    def recolectar(self, driver) -> int:
+        """
+        Lee el log de rendimiento y procesa las respuestas de comentarios terminadas.
+
+        Args:
+            driver: El driver de Selenium WebDriver
+
+        Returns:
+            int: Número de comentarios nuevos
+        """
+        terminadas = set()
+        for entrada in driver.get_log("performance"):
+            try:
+                mensaje = json.loads(entrada["message"])["message"]
+            except (KeyError, ValueError):
+                continue
+
+            metodo = mensaje.get("method")
+            params = mensaje.get("params", {})
+            if metodo == "Network.responseReceived":
+                url = params.get("response", {}).get("url", "")
+                if self._es_de_este_video(url):
+                    self._pendientes[params["requestId"]] = url
+            elif metodo == "Network.loadingFinished":
+                terminadas.add(params.get("requestId"))
+
+        nuevos = 0
+        for request_id in [r for r in self._pendientes if r in terminadas]:
+            self._pendientes.pop(request_id)
+            try:
+                respuesta = driver.execute_cdp_cmd("Network.getResponseBody", {"requestId": request_id})
+                cuerpo = respuesta.get("body", "")
+                if respuesta.get("base64Encoded"):
+                    cuerpo = base64.b64decode(cuerpo).decode("utf-8")
+                nuevos += self.procesar_cuerpo(json.loads(cuerpo))
+            except Exception as e:
+                print(f"No se pudo leer la respuesta de comentarios {request_id}: {e}")
+        return nuevos
+
+
+def extraer_comentarios_red(driver, video_id: Optional[str],
+                            al_comentarios: Callable[[List[Dict[str, Any]]], None],
+                            limite: Optional[int] = None, presupuesto_segundos: Optional[float] = None,
+                            max_intentos: int = 20) -> Optional[Dict[str, Any]]:
+    """
+    Extrae los comentarios de un video desde las respuestas de la API, scrolleando para pedir más páginas.
+
+    Cada página se entrega a al_comentarios en cuanto se lee, así que la memoria no
+    crece con el número de comentarios.
+
+    Args:
+        driver: El driver de Selenium WebDriver
+        video_id: ID del video actual
+        al_comentarios: Función que recibe los comentarios nuevos de cada página (con id,
+            usuario, contenido, likes, respuestas y fecha exacta)
+        limite: Número máximo de comentarios (None para todos)
+        presupuesto_segundos: Tiempo máximo para pedir páginas (None sin límite)
+        max_intentos: Número máximo de scrolls
+
+    Returns:
+        dict: Comentarios entregados ('total'), total que reporta la API ('total_video')
+        y motivo de parada, o None si no se capturó ninguna respuesta (para recurrir al DOM)
+    """
+    limite_tiempo = time.time() + presupuesto_segundos if presupuesto_segundos is not None else None
+    colector = ColectorComentariosRed(video_id, al_comentarios, limite)
+    motivo = None
+    try:
+        colector.recolectar(driver)
+
+        intentos = 0
+        sin_cambios = 0
+        while motivo is None:
+            restante = None if limite_tiempo is None else limite_tiempo - time.time()
+            if colector.completo:
+                motivo = "objetivo"
+            elif not colector.hay_mas:
+                motivo = "fin"
+            elif restante is not None and restante <= 0:
+                motivo = "presupuesto"
+            elif intentos >= max_intentos:
+                motivo = "intentos"
+            elif sin_cambios >= 3:
+                motivo = "estancado"
+            elif not driver.execute_script(_SCRIPT_SCROLL_COMENTARIOS):
+                motivo = "sin_contenedor"
+            else:
+                # Esperamos a que llegue la siguiente página de comentarios
+                espera = 2 if restante is None else min(2, restante)
+                nuevos = esperar_condicion(driver, lambda d: colector.recolectar(d), espera, "respuesta_comentarios")
+                sin_cambios = 0 if nuevos else sin_cambios + 1
+                intentos += 1
+
+    except Exception as e:
+        print(f"Error al capturar comentarios desde la red: {e}")
+        motivo = "error"
+
+    if not colector.respuestas_procesadas:
+        return None
+
+    print(f"Comentarios capturados desde la red: {colector.recolectados} (total del video: {colector.total})")
+    return {"total": colector.recolectados, "total_video": colector.total, "motivo": motivo}
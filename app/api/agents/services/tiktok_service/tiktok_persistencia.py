@@ -0,0 +1,527 @@
+"""
+Persistencia diferida (write-behind) de videos y comentarios con lotes, reintentos y derrame a disco.
+"""
+import json
+import os
+import queue
+import random
+import re
+import shutil
+import threading
+import time
+import uuid
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, Tuple, Type
+
+from app.api.agents.services.tiktok_service.tiktok_almacen import obtener_almacen
+
+# Registros que caben en memoria antes de derramar a disco (o de bloquear al crawler)
+CAPACIDAD_PERSISTIDOR = int(os.getenv("TIKTOK_PERSISTIDOR_CAPACIDAD", "256"))
+
+# Registros por transacción y segundos que se espera a completar un lote
+TAMANO_LOTE_PERSISTIDOR = int(os.getenv("TIKTOK_PERSISTIDOR_LOTE", "20"))
+ESPERA_LOTE_PERSISTIDOR = float(os.getenv("TIKTOK_PERSISTIDOR_ESPERA_LOTE", "0.5"))
+
+# Archivo JSONL donde se derraman los registros cuando la cola está llena (vacío lo desactiva);
+# cada proceso escribe en su propia copia con el PID como sufijo
+ARCHIVO_DERRAME = os.getenv("TIKTOK_PERSISTIDOR_DERRAME", "")
+
+# Espera inicial y máxima entre reintentos cuando la base de datos no responde
+REINTENTO_BASE_SEGUNDOS = float(os.getenv("TIKTOK_PERSISTIDOR_REINTENTO_BASE", "1"))
+REINTENTO_MAX_SEGUNDOS = float(os.getenv("TIKTOK_PERSISTIDOR_REINTENTO_MAX", "60"))
+
+# Segundos máximos para vaciar la cola al apagar el servicio
+TIMEOUT_DRENADO = float(os.getenv("TIKTOK_PERSISTIDOR_TIMEOUT_DRENADO", "30"))
+
+
+def _proceso_vivo(pid: int) -> bool:
+    """Indica si existe un proceso con ese PID."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def _leer_posicion(ruta: str) -> int:
+    """Devuelve el byte hasta el que ya se guardó un archivo de derrame (0 si no hay registro)."""
+    try:
+        with open(ruta + ".pos", "r", encoding="utf-8") as f:
+            return int(f.read().strip() or 0)
+    except (FileNotFoundError, ValueError):
+        return 0
+
+
+def _copiar_desde(origen: str, posicion: int, destino: str):
+    """Agrega a destino el contenido de origen a partir del byte indicado, sin cargarlo en memoria."""
+    try:
+        with open(origen, "rb") as entrada, open(destino, "ab") as salida:
+            entrada.seek(posicion)
+            shutil.copyfileobj(entrada, salida)
+    except FileNotFoundError:
+        pass
+
+
+class RegistroPendienteError(RuntimeError):
+    """El registro no se guardó antes de apagar el servicio pero quedó en el archivo de derrame."""
+
+
+class PersistidorDiferido:
+    """
+    Acepta registros de videos y comentarios sin bloquear al crawler y los guarda
+    por lotes desde un hilo en segundo plano.
+
+    El orden de llegada se conserva (los comentarios de un video se guardan después
+    del video). Si la cola se llena, los registros se derraman a un archivo JSONL y
+    se recuperan de a un lote cuando la cola se vacía; si la base de datos no está
+    disponible, el lote se reintenta con espera exponencial en lugar de perderse.
+    """
+
+    def __init__(self, guardar: Optional[Callable[[List[Dict[str, Any]]], List[Any]]] = None,
+                 capacidad: int = CAPACIDAD_PERSISTIDOR, tamano_lote: int = TAMANO_LOTE_PERSISTIDOR,
+                 archivo_derrame: str = ARCHIVO_DERRAME,
+                 errores_transitorios: Optional[Tuple[Type[BaseException], ...]] = None):
+        """
+        Inicializa el persistidor, recupera el derrame previo y arranca su hilo.
+
+        Args:
+            guardar: Función que guarda una lista de registros en una transacción
+                (por defecto la del almacén configurado con TIKTOK_ALMACEN)
+            capacidad: Registros máximos en memoria
+            tamano_lote: Registros por transacción
+            archivo_derrame: Archivo JSONL base para el derrame a disco (vacío lo desactiva);
+                el proceso usa '<archivo_derrame>.<pid>'
+            errores_transitorios: Excepciones de guardar que se reintentan (por defecto
+                los errores de conexión del almacén, u OSError con una función propia);
+                cualquier otra rechaza los registros
+        """
+        if guardar is None:
+            almacen = obtener_almacen()
+            guardar = almacen.guardar_registros
+            errores_transitorios = errores_transitorios or almacen.errores_conexion
+        self.guardar = guardar
+        self.errores_transitorios = errores_transitorios or (OSError,)
+        self.tamano_lote = max(1, tamano_lote)
+        # Un archivo por proceso: con varios procesos (modo multiproceso o trabajos
+        # simultáneos) un archivo compartido perdería lo que agregan los demás al vaciarse
+        self.archivo_derrame = f"{archivo_derrame}.{os.getpid()}" if archivo_derrame else ""
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max(1, capacidad))
+        self._lock = threading.Lock()
+        self._cerrado = False
+        # Interrumpe la espera entre reintentos al apagar
+        self._despertar = threading.Event()
+        self._limite_drenado: Optional[float] = None
+        # Las claves del derrame llevan un prefijo por instancia para no confundirlas
+        # con las que dejó una ejecución anterior en el mismo archivo
+        self._instancia = uuid.uuid4().hex[:12]
+        self._secuencia = 0
+        self._futuros_derramados: Dict[str, Future] = {}
+        # Byte del derrame propio hasta el que los registros ya se guardaron
+        self._posicion_derrame = 0
+        self.estadisticas = {
+            "enviados": 0,
+            "guardados": 0,
+            "rechazados": 0,
+            "lotes": 0,
+            "reintentos": 0,
+            "derramados": 0,
+            "segundos_guardando": 0.0
+        }
+        # Si quedó un derrame de una ejecución anterior, los nuevos registros van detrás
+        if archivo_derrame:
+            self._posicion_derrame = _leer_posicion(self.archivo_derrame)
+            self._adoptar_derrames(archivo_derrame)
+        self._derramando = bool(self.archivo_derrame) and os.path.exists(self.archivo_derrame) \
+            and os.path.getsize(self.archivo_derrame) > self._posicion_derrame
+        if self._derramando:
+            print(f"Recuperando registros pendientes de {self.archivo_derrame}...")
+        elif self.archivo_derrame:
+            # Un derrame ya guardado por completo: se borra para que la posición no salte registros nuevos
+            self._borrar_derrame()
+
+        self._hilo = threading.Thread(target=self._trabajar, name="tiktok-persistidor", daemon=True)
+        self._hilo.start()
+
+    def _adoptar_derrames(self, archivo_base: str):
+        """
+        Pasa al archivo de derrame propio los que dejaron procesos que ya terminaron
+        (y el archivo base sin sufijo), para guardarlos en esta ejecución.
+
+        Args:
+            archivo_base: Archivo de derrame configurado, sin el sufijo del PID
+        """
+        directorio = os.path.dirname(archivo_base) or "."
+        patron = re.compile(re.escape(os.path.basename(archivo_base)) + r"\.(\d+)")
+        huerfanos = [archivo_base]
+        try:
+            nombres = os.listdir(directorio)
+        except FileNotFoundError:
+            nombres = []
+        for nombre in sorted(nombres):
+            coincidencia = patron.fullmatch(nombre)
+            if coincidencia and int(coincidencia.group(1)) != os.getpid() \
+                    and not _proceso_vivo(int(coincidencia.group(1))):
+                huerfanos.append(os.path.join(directorio, nombre))
+
+        for huerfano in huerfanos:
+            # El renombrado es atómico: si otro proceso lo adopta a la vez, solo uno lo consigue
+            temporal = f"{self.archivo_derrame}.adoptando"
+            try:
+                os.replace(huerfano, temporal)
+            except FileNotFoundError:
+                continue
+            # Lo que el otro proceso ya había guardado no se vuelve a guardar
+            posicion = _leer_posicion(huerfano)
+            with open(temporal, "rb") as origen, open(self.archivo_derrame, "ab") as destino:
+                origen.seek(posicion)
+                for linea in origen:
+                    destino.write(linea if linea.endswith(b"\n") else linea + b"\n")
+            os.remove(temporal)
+            if os.path.exists(huerfano + ".pos"):
+                os.remove(huerfano + ".pos")
+            print(f"Registros pendientes de {huerfano} pasados a {self.archivo_derrame}")
+
+    def enviar(self, registro: Dict[str, Any]) -> Future:
+        """
+        Encola un registro para guardarlo en segundo plano.
+
+        Args:
+            registro: Diccionario con 'tipo' 'video' o 'comentarios' (ver AlmacenTikTok.guardar_registros)
+
+        Returns:
+            Future: Se resuelve con los IDs generados, o con una excepción si la
+            base de datos rechazó el registro
+        """
+        if self._cerrado:
+            raise RuntimeError("El persistidor está cerrado")
+
+        futuro = Future()
+        with self._lock:
+            self.estadisticas["enviados"] += 1
+            if self._derramando:
+                self._derramar([(registro, futuro)])
+                return futuro
+            try:
+                self._cola.put_nowait((registro, futuro))
+                return futuro
+            except queue.Full:
+                if self.archivo_derrame:
+                    print("Cola de persistencia llena. Derramando registros a disco...")
+                    self._derramando = True
+                    self._derramar([(registro, futuro)])
+                    return futuro
+
+        # Sin derrame a disco, el crawler espera a que haya espacio (contrapresión)
+        self._cola.put((registro, futuro))
+        return futuro
+
+    def _derramar(self, entradas: List[Tuple[Dict[str, Any], Optional[Future]]], archivo: Optional[str] = None):
+        """
+        Agrega registros al final del archivo de derrame (requiere tener self._lock).
+
+        Args:
+            entradas: Tuplas (registro, futuro)
+            archivo: Archivo donde escribir (por defecto el derrame propio)
+        """
+        with open(archivo or self.archivo_derrame, "a", encoding="utf-8") as f:
+            for registro, futuro in entradas:
+                self._secuencia += 1
+                clave = f"{self._instancia}-{self._secuencia}"
+                if futuro is not None:
+                    self._futuros_derramados[clave] = futuro
+                f.write(json.dumps({"clave": clave, "registro": registro},
+                                   ensure_ascii=False, default=str) + "\n")
+        self.estadisticas["derramados"] += len(entradas)
+
+    def _recuperar_derrame(self) -> Tuple[List[Tuple[Dict[str, Any], Optional[Future]]], Optional[int]]:
+        """
+        Lee el siguiente lote del archivo de derrame sin cargar el resto en memoria.
+        Solo se llama con la cola en memoria vacía, así que los registros recuperados
+        son los siguientes en orden. El lote no se descarta del archivo hasta que
+        _confirmar_derrame registra que se guardó.
+
+        Returns:
+            tuple: Tuplas (registro, futuro o None si viene de una ejecución anterior)
+            y el byte donde termina el lote, o None si el derrame se terminó de vaciar
+        """
+        entradas = []
+        with self._lock:
+            try:
+                with open(self.archivo_derrame, "rb") as f:
+                    f.seek(self._posicion_derrame)
+                    for _ in range(self.tamano_lote):
+                        linea = f.readline()
+                        if not linea:
+                            break
+                        if not linea.strip():
+                            continue
+                        try:
+                            dato = json.loads(linea)
+                        except ValueError:
+                            print("Se ignora una línea corrupta del archivo de derrame")
+                            continue
+                        entradas.append((dato["registro"], self._futuros_derramados.pop(dato.get("clave"), None)))
+                    fin = f.tell()
+            except FileNotFoundError:
+                fin = self._posicion_derrame
+
+            if fin == self._posicion_derrame:
+                # El archivo es solo de este proceso y se agrega con el lock tomado:
+                # si no quedan líneas, nadie más está derramando
+                self._borrar_derrame()
+                self._derramando = False
+                return [], None
+        return entradas, fin
+
+    def _confirmar_derrame(self, fin: int):
+        """
+        Descarta del archivo de derrame los registros ya guardados: avanza la posición
+        guardada en '<archivo>.pos' y compacta el archivo cuando lo guardado supera a
+        lo pendiente, para no copiar el resto del archivo en cada lote.
+
+        Args:
+            fin: Byte donde termina el último lote guardado
+        """
+        with self._lock:
+            tamano = os.path.getsize(self.archivo_derrame) if os.path.exists(self.archivo_derrame) else 0
+            if fin >= tamano:
+                self._borrar_derrame()
+                self._derramando = False
+            elif fin >= tamano - fin:
+                temporal = f"{self.archivo_derrame}.compactando"
+                if os.path.exists(temporal):
+                    os.remove(temporal)
+                _copiar_desde(self.archivo_derrame, fin, temporal)
+                os.replace(temporal, self.archivo_derrame)
+                self._guardar_posicion(0)
+            else:
+                self._guardar_posicion(fin)
+
+    def _guardar_posicion(self, posicion: int):
+        """Registra en '<archivo>.pos' el byte hasta el que se guardó el derrame (requiere tener self._lock)."""
+        self._posicion_derrame = posicion
+        ruta = self.archivo_derrame + ".pos"
+        if posicion == 0:
+            if os.path.exists(ruta):
+                os.remove(ruta)
+            return
+        with open(ruta + ".tmp", "w", encoding="utf-8") as f:
+            f.write(str(posicion))
+        os.replace(ruta + ".tmp", ruta)
+
+    def _borrar_derrame(self):
+        """Borra el archivo de derrame propio ya vaciado (requiere tener self._lock)."""
+        if os.path.exists(self.archivo_derrame):
+            os.remove(self.archivo_derrame)
+        self._guardar_posicion(0)
+
+    def _trabajar(self):
+        """Bucle del hilo: agrupa registros en lotes y los guarda."""
+        pendientes: List[Tuple[Dict[str, Any], Optional[Future]]] = []
+        # Byte del derrame donde termina el lote en curso, si salió del derrame
+        fin_derrame: Optional[int] = None
+        while True:
+            if not pendientes:
+                try:
+                    pendientes.append(self._cola.get(timeout=ESPERA_LOTE_PERSISTIDOR))
+                except queue.Empty:
+                    if self._derramando:
+                        pendientes, fin_derrame = self._recuperar_derrame()
+                        if fin_derrame is not None and not pendientes:
+                            # Solo había líneas corruptas
+                            self._confirmar_derrame(fin_derrame)
+                            fin_derrame = None
+                    elif self._cerrado:
+                        # Cola y derrame vacíos: terminó el drenado
+                        return
+                    continue
+
+                # Completamos el lote con lo que llegue durante la espera
+                limite = time.time() + ESPERA_LOTE_PERSISTIDOR
+                while len(pendientes) < self.tamano_lote:
+                    try:
+                        pendientes.append(self._cola.get(timeout=max(0, limite - time.time())))
+                    except queue.Empty:
+                        break
+
+            lote, pendientes = pendientes[:self.tamano_lote], pendientes[self.tamano_lote:]
+            no_guardados = self._guardar_con_reintentos(lote)
+            if no_guardados:
+                # Se agotó el tiempo de drenado: lo que queda va al derrame
+                self._abandonar(no_guardados + pendientes, desde_derrame=fin_derrame is not None)
+                return
+            if fin_derrame is not None and not pendientes:
+                self._confirmar_derrame(fin_derrame)
+                fin_derrame = None
+
+    def _guardar_con_reintentos(self, lote: List[Tuple[Dict[str, Any], Optional[Future]]]
+                                ) -> List[Tuple[Dict[str, Any], Optional[Future]]]:
+        """
+        Guarda un lote, reintentando con espera exponencial mientras la base de datos
+        no esté disponible. Si guardar falla por otro motivo, los registros se guardan
+        de a uno y el que vuelve a fallar se rechaza sin reintentarlo.
+
+        Args:
+            lote: Tuplas (registro, futuro)
+
+        Returns:
+            list: Los registros que no se pudieron guardar antes del límite de drenado
+        """
+        intento = 0
+        while True:
+            inicio = time.time()
+            try:
+                resultados = self.guardar([registro for registro, _ in lote])
+                break
+            except self.errores_transitorios as e:
+                intento += 1
+                espera = min(REINTENTO_MAX_SEGUNDOS, REINTENTO_BASE_SEGUNDOS * 2 ** (intento - 1))
+                espera *= random.uniform(0.5, 1.0)
+                with self._lock:
+                    self.estadisticas["reintentos"] += 1
+                if self._limite_drenado is not None and time.time() + espera > self._limite_drenado:
+                    print(f"No se pudo guardar el lote antes de apagar: {str(e)}")
+                    return lote
+                print(f"Error al guardar el lote ({str(e)}). Reintentando en {espera:.1f} segundos...")
+                self._despertar.wait(espera)
+            except Exception as e:
+                if len(lote) == 1:
+                    resultados = [e]
+                    break
+                print(f"Error al guardar el lote ({str(e)}). Guardando sus registros por separado...")
+                for posicion, entrada in enumerate(lote):
+                    no_guardados = self._guardar_con_reintentos([entrada])
+                    if no_guardados:
+                        return no_guardados + lote[posicion + 1:]
+                return []
+
+        rechazados = 0
+        for (registro, futuro), resultado in zip(lote, resultados):
+            if isinstance(resultado, Exception):
+                rechazados += 1
+                self._registrar_rechazo(registro, resultado)
+                if futuro is not None:
+                    futuro.set_exception(resultado)
+            elif futuro is not None:
+                futuro.set_result(resultado)
+
+        with self._lock:
+            self.estadisticas["lotes"] += 1
+            self.estadisticas["guardados"] += len(lote) - rechazados
+            self.estadisticas["rechazados"] += rechazados
+            self.estadisticas["segundos_guardando"] += time.time() - inicio
+        return []
+
+    def _registrar_rechazo(self, registro: Dict[str, Any], error: Exception):
+        """Conserva en disco los registros que la base de datos rechazó, si hay derrame configurado."""
+        if not self.archivo_derrame:
+            return
+        with open(self.archivo_derrame + ".rechazados", "a", encoding="utf-8") as f:
+            f.write(json.dumps({"error": str(error), "registro": registro}, ensure_ascii=False, default=str) + "\n")
+
+    def _abandonar(self, entradas: List[Tuple[Dict[str, Any], Optional[Future]]], desde_derrame: bool = False):
+        """
+        Deja en el derrame los registros que no se guardaron al apagar, por delante de
+        los que ya estaban derramados, y resuelve sus futuros con RegistroPendienteError.
+
+        Args:
+            entradas: Registros que quedaban por guardar
+            desde_derrame: Si salieron del derrame, donde siguen hasta que se confirmen
+        """
+        while True:
+            try:
+                entrada = self._cola.get_nowait()
+            except queue.Empty:
+                break
+            entradas.append(entrada)
+
+        error = RegistroPendienteError("El registro no se guardó antes de apagar el servicio")
+        if self.archivo_derrame:
+            nuevas = [] if desde_derrame else entradas
+            with self._lock:
+                if nuevas:
+                    temporal = f"{self.archivo_derrame}.reescribiendo"
+                    if os.path.exists(temporal):
+                        os.remove(temporal)
+                    self._derramar([(registro, None) for registro, _ in nuevas], temporal)
+                    _copiar_desde(self.archivo_derrame, self._posicion_derrame, temporal)
+                    os.replace(temporal, self.archivo_derrame)
+                    self._guardar_posicion(0)
+            print(f"{len(entradas)} registros (y los que ya estaban derramados) quedaron en "
+                  f"{self.archivo_derrame} para la próxima ejecución")
+        else:
+            print(f"Se perdieron {len(entradas)} registros que no se pudieron guardar")
+            error = RuntimeError("El registro no se guardó antes de apagar el servicio")
+
+        for _, futuro in entradas:
+            if futuro is not None and not futuro.done():
+                futuro.set_exception(error)
+        # Los futuros de los registros derramados que no se llegaron a leer también quedan pendientes
+        with self._lock:
+            futuros_derramados = list(self._futuros_derramados.values())
+            self._futuros_derramados.clear()
+        for futuro in futuros_derramados:
+            if not futuro.done():
+                futuro.set_exception(error)
+
+    def cerrar(self, timeout: float = TIMEOUT_DRENADO):
+        """
+        Deja de aceptar registros y espera a que se guarde lo pendiente.
+
+        Args:
+            timeout: Segundos máximos de espera; lo que no se guarde queda en el derrame
+        """
+        if self._cerrado:
+            return
+        self._cerrado = True
+        self._limite_drenado = time.time() + timeout
+        self._despertar.set()
+        self._hilo.join(timeout + 5)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve las estadísticas del persistidor.
+
+        Returns:
+            Diccionario con registros enviados, guardados, rechazados, reintentos y derrame
+        """
+        with self._lock:
+            datos = {clave: round(valor, 3) if isinstance(valor, float) else valor
+                     for clave, valor in self.estadisticas.items()}
+            datos["en_derrame"] = self._derramando
+        datos["pendientes"] = self._cola.qsize()
+        return datos
+
+
+_persistidor: Optional[PersistidorDiferido] = None
+_persistidor_lock = threading.Lock()
+
+
+def obtener_persistidor() -> PersistidorDiferido:
+    """
+    Devuelve el persistidor compartido, creándolo si no existe.
+
+    Returns:
+        PersistidorDiferido: Persistidor del proceso
+    """
+    global _persistidor
+    with _persistidor_lock:
+        if _persistidor is None:
+            _persistidor = PersistidorDiferido()
+        return _persistidor
+
+
+def cerrar_persistidor(timeout: float = TIMEOUT_DRENADO):
+    """
+    Vacía y cierra el persistidor compartido si existe.
+
+    Args:
+        timeout: Segundos máximos para guardar lo pendiente
+    """
+    global _persistidor
+    with _persistidor_lock:
+        if _persistidor is not None:
+            _persistidor.cerrar(timeout)
+            _persistidor = None
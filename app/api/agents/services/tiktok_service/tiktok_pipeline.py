@@ -0,0 +1,155 @@
+"""
+Etapas de pipeline con colas acotadas para solapar captura, clasificación y persistencia.
+"""
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Optional
+
+# Hilos compartidos para clasificar textos mientras el navegador sigue capturando.
+# Solo esperan al clasificador LLM, que agrupa en lotes lo que llega a la vez.
+HILOS_CLASIFICACION = int(os.getenv("TIKTOK_HILOS_CLASIFICACION", "16"))
+
+# Capacidad de la cola de clasificación (al llenarse, la etapa anterior espera)
+CAPACIDAD_COLA_CLASIFICACION = int(os.getenv("TIKTOK_COLA_CLASIFICACION", "16"))
+
+_FIN = object()
+
+
+class EtapaPipeline:
+    """
+    Etapa del pipeline: una cola acotada atendida por uno o más hilos trabajadores.
+
+    Cada elemento enviado devuelve un Future con el resultado de procesarlo, de modo
+    que la etapa anterior puede seguir trabajando y consultar el resultado después.
+    """
+
+    def __init__(self, nombre: str, procesar: Callable[[Any], Any], capacidad: int = 8, num_hilos: int = 1):
+        """
+        Inicializa la etapa y arranca sus hilos.
+
+        Args:
+            nombre: Nombre de la etapa (para logs y estadísticas)
+            procesar: Función que procesa cada elemento
+            capacidad: Tamaño máximo de la cola de entrada
+            num_hilos: Número de hilos trabajadores (1 conserva el orden de llegada)
+        """
+        self.nombre = nombre
+        self.procesar = procesar
+        self._cola: "queue.Queue" = queue.Queue(maxsize=max(1, capacidad))
+        self._lock = threading.Lock()
+        self._cerrada = False
+        self.estadisticas = {
+            "procesados": 0,
+            "errores": 0,
+            "segundos_procesando": 0.0,
+            "segundos_esperando_cola": 0.0
+        }
+        self._hilos = []
+        for i in range(max(1, num_hilos)):
+            hilo = threading.Thread(target=self._trabajar, name=f"tiktok-{nombre}-{i}", daemon=True)
+            hilo.start()
+            self._hilos.append(hilo)
+
+    def enviar(self, item: Any) -> Future:
+        """
+        Encola un elemento; se bloquea si la cola está llena (contrapresión).
+
+        Args:
+            item: Elemento a procesar
+
+        Returns:
+            Future: Resultado del procesamiento cuando esté disponible
+        """
+        if self._cerrada:
+            raise RuntimeError(f"La etapa '{self.nombre}' está cerrada")
+
+        futuro = Future()
+        inicio = time.time()
+        self._cola.put((item, futuro))
+        with self._lock:
+            self.estadisticas["segundos_esperando_cola"] += time.time() - inicio
+        return futuro
+
+    def _trabajar(self):
+        """Bucle de cada hilo trabajador."""
+        while True:
+            entrada = self._cola.get()
+            if entrada is _FIN:
+                break
+
+            item, futuro = entrada
+            if not futuro.set_running_or_notify_cancel():
+                continue
+
+            inicio = time.time()
+            try:
+                futuro.set_result(self.procesar(item))
+                error = False
+            except Exception as e:
+                print(f"Error en la etapa '{self.nombre}': {str(e)}")
+                futuro.set_exception(e)
+                error = True
+
+            with self._lock:
+                self.estadisticas["procesados"] += 1
+                self.estadisticas["errores"] += int(error)
+                self.estadisticas["segundos_procesando"] += time.time() - inicio
+
+    def cerrar(self, esperar: bool = True):
+        """
+        Cierra la etapa después de procesar lo que ya está en cola.
+
+        Args:
+            esperar: Si se espera a que los hilos terminen
+        """
+        if self._cerrada:
+            return
+        self._cerrada = True
+        for _ in self._hilos:
+            self._cola.put(_FIN)
+        if esperar:
+            for hilo in self._hilos:
+                hilo.join()
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve las estadísticas de la etapa.
+
+        Returns:
+            Diccionario con elementos procesados, errores y tiempos
+        """
+        with self._lock:
+            datos = {clave: round(valor, 3) if isinstance(valor, float) else valor
+                     for clave, valor in self.estadisticas.items()}
+        datos["pendientes"] = self._cola.qsize()
+        return datos
+
+
+_etapa_clasificacion: Optional[EtapaPipeline] = None
+_etapa_clasificacion_lock = threading.Lock()
+
+
+def obtener_etapa_clasificacion() -> EtapaPipeline:
+    """
+    Devuelve la etapa compartida de clasificación, creándola si no existe.
+
+    Cada elemento es una tupla (texto_subtitulos, texto_descripcion) y el
+    resultado es el booleano de analizar_contenido_politico (o su excepción).
+
+    Returns:
+        EtapaPipeline: Etapa de clasificación
+    """
+    global _etapa_clasificacion
+    with _etapa_clasificacion_lock:
+        if _etapa_clasificacion is None:
+            from app.api.agents.services.tiktok_service.tiktok_content_analyzer import analizar_contenido_politico
+            _etapa_clasificacion = EtapaPipeline(
+                "clasificacion",
+                lambda textos: analizar_contenido_politico(*textos),
+                capacidad=CAPACIDAD_COLA_CLASIFICACION,
+                num_hilos=HILOS_CLASIFICACION
+            )
+        return _etapa_clasificacion
@@ -0,0 +1,250 @@
+"""
+Prefiltro local de contenido político (Perú 2026) que decide sin OpenAI los casos evidentes.
+"""
+import re
+import threading
+import unicodedata
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+# Precandidatos presidenciales declarados para 2026 y sus partidos (también se usan en el prompt)
+PRECANDIDATOS_2026: List[Tuple[str, str]] = [
+    ("Keiko Fujimori", "Fuerza Popular"),
+    ("Rafael López Aliaga", "Renovación Popular"),
+    ("Carlos Álvarez", "País para Todos"),
+    ("Hernando de Soto", "Avanza País"),
+    ("César Acuña", "Alianza para el Progreso"),
+    ("Verónika Mendoza", "Nuevo Perú"),
+    ("Alfonso López Chau", "Ahora Nación"),
+    ("Susel Paredes", "Partido Morado"),
+    ("Rafael Belaunde", "Acción Popular"),
+    ("Alfredo Barnechea", "Acción Popular"),
+    ("Phillip Butters", "Avanza País"),
+    ("Fernando Olivera", "Frente de la Esperanza"),
+    ("Guillermo Bermejo", "Perú Libre"),
+]
+
+# Nombres completos que también son de otras personas conocidas (Carlos Álvarez, el humorista)
+_NOMBRES_AMBIGUOS = {"Carlos Álvarez"}
+
+# Apellidos, apodos y partidos: sugieren política pero no bastan (Alberto Fujimori, "un nuevo Perú")
+_ALIAS_PRECANDIDATOS = [
+    "fujimori", "keiko", "lopez aliaga", "porky", "barnechea", "butters",
+    "lopez chau", "veronika", "hernando de soto", "susel"
+]
+
+# Vocabulario que nombra explícitamente el proceso electoral peruano de 2026
+# ("elecciones 2026" a secas no basta: Colombia y Brasil también votan en 2026)
+_TERMINOS_ELECTORALES_2026 = [
+    "elecciones generales 2026", "peru 2026", "elecciones peru 2026", "elecciones peruanas 2026",
+    "elecciones en el peru 2026", "presidente del peru 2026"
+]
+
+# Vocabulario político o electoral genérico: hay que consultar al modelo
+_TERMINOS_POLITICOS = [
+    "eleccion", "elecciones", "electoral", "candidato", "candidata", "candidatos", "candidatura",
+    "precandidato", "precandidata", "presidencial", "presidente", "presidenta", "campana", "encuesta",
+    "encuestas", "voto", "votos", "votar", "votacion", "segunda vuelta", "primera vuelta", "debate",
+    "partido", "partidos", "congreso", "congresista", "congresistas", "gobierno", "ministro", "ministra",
+    "boluarte", "dina", "palacio de gobierno", "politica", "politico", "politicos", "mitin", "vacancia",
+    "jne", "onpe", "jurado nacional de elecciones", "plancha presidencial",
+    "alvarez", "belaunde", "olivera", "mendoza", "paredes", "de soto", "acuna", "bermejo",
+    "peru", "peruano", "peruanos", "lima"
+]
+
+SI = "si"
+NO = "no"
+CONSULTAR = "consultar"
+
+
+def normalizar_texto(texto: str) -> str:
+    """
+    Normaliza un texto para comparar: sin tildes, en minúsculas y con un espacio
+    entre palabras (los signos, # y @ se convierten en espacios).
+
+    Args:
+        texto: Texto original
+
+    Returns:
+        str: Texto normalizado
+    """
+    descompuesto = unicodedata.normalize("NFKD", texto or "")
+    sin_tildes = "".join(c for c in descompuesto if not unicodedata.combining(c))
+    return re.sub(r"[^a-z0-9]+", " ", sin_tildes.casefold()).strip()
+
+
+class AutomataPatrones:
+    """
+    Autómata de Aho-Corasick: encuentra todos los patrones en una sola pasada por el texto.
+    """
+
+    def __init__(self, patrones: Dict[str, Any]):
+        """
+        Construye el autómata.
+
+        Args:
+            patrones: Patrón normalizado -> etiqueta que se devuelve al encontrarlo
+        """
+        self._transiciones: List[Dict[str, int]] = [{}]
+        self._fallo: List[int] = [0]
+        self._salidas: List[List[Tuple[str, Any]]] = [[]]
+
+        for patron, etiqueta in patrones.items():
+            nodo = 0
+            for caracter in patron:
+                siguiente = self._transiciones[nodo].get(caracter)
+                if siguiente is None:
+                    siguiente = len(self._transiciones)
+                    self._transiciones[nodo][caracter] = siguiente
+                    self._transiciones.append({})
+                    self._fallo.append(0)
+                    self._salidas.append([])
+                nodo = siguiente
+            self._salidas[nodo].append((patron, etiqueta))
+
+        # Enlaces de fallo por anchura
+        cola = deque(self._transiciones[0].values())
+        while cola:
+            nodo = cola.popleft()
+            for caracter, hijo in self._transiciones[nodo].items():
+                cola.append(hijo)
+                fallo = self._fallo[nodo]
+                while fallo and caracter not in self._transiciones[fallo]:
+                    fallo = self._fallo[fallo]
+                destino = self._transiciones[fallo].get(caracter, 0)
+                self._fallo[hijo] = destino if destino != hijo else 0
+                self._salidas[hijo] = self._salidas[hijo] + self._salidas[self._fallo[hijo]]
+
+    def buscar(self, texto: str) -> List[Tuple[int, str, Any]]:
+        """
+        Busca todas las apariciones de los patrones.
+
+        Args:
+            texto: Texto normalizado
+
+        Returns:
+            list: Tuplas (posición final, patrón, etiqueta)
+        """
+        encontrados = []
+        nodo = 0
+        for posicion, caracter in enumerate(texto):
+            while nodo and caracter not in self._transiciones[nodo]:
+                nodo = self._fallo[nodo]
+            nodo = self._transiciones[nodo].get(caracter, 0)
+            for patron, etiqueta in self._salidas[nodo]:
+                encontrados.append((posicion, patron, etiqueta))
+        return encontrados
+
+
+class PrefiltroPolitico:
+    """
+    Decide "si", "no" o "consultar" con coincidencias de precandidatos, partidos y
+    vocabulario electoral, y registra cuántas decisiones evitó enviar a OpenAI.
+
+    Solo decide "si" sin el modelo cuando el texto nombra a un precandidato con su
+    nombre completo o al proceso peruano de 2026; partidos y apellidos sueltos se consultan.
+    """
+
+    def __init__(self):
+        """Construye el autómata con los patrones fuertes y débiles."""
+        # Solo los nombres completos y el proceso 2026 explícito deciden "si"; el resto se consulta
+        patrones: Dict[str, str] = {}
+        for nombre, _ in PRECANDIDATOS_2026:
+            patrones[normalizar_texto(nombre)] = CONSULTAR if nombre in _NOMBRES_AMBIGUOS else SI
+        for termino in _TERMINOS_ELECTORALES_2026:
+            patrones[normalizar_texto(termino)] = SI
+        for termino in [partido for _, partido in PRECANDIDATOS_2026] + _ALIAS_PRECANDIDATOS + _TERMINOS_POLITICOS:
+            patrones.setdefault(normalizar_texto(termino), CONSULTAR)
+
+        # Los hashtags pegan las palabras (#keikofujimori): agregamos la variante sin espacios
+        for patron, etiqueta in list(patrones.items()):
+            if etiqueta == SI and " " in patron:
+                patrones.setdefault(patron.replace(" ", ""), SI)
+
+        self._automata = AutomataPatrones(patrones)
+        self._lock = threading.Lock()
+        self.estadisticas = {"evaluaciones": 0, SI: 0, NO: 0, CONSULTAR: 0}
+
+    @staticmethod
+    def _es_palabra_completa(texto: str, fin: int, patron: str) -> bool:
+        """Comprueba que la coincidencia no esté dentro de otra palabra."""
+        inicio = fin - len(patron) + 1
+        antes = inicio == 0 or texto[inicio - 1] == " "
+        despues = fin + 1 == len(texto) or texto[fin + 1] == " "
+        return antes and despues
+
+    def coincidencias(self, texto: str) -> Dict[str, List[str]]:
+        """
+        Devuelve los patrones encontrados en el texto agrupados por tipo.
+
+        Args:
+            texto: Texto original (se normaliza)
+
+        Returns:
+            dict: {"si": [...], "consultar": [...]}
+        """
+        normalizado = normalizar_texto(texto)
+        encontrados: Dict[str, List[str]] = {SI: [], CONSULTAR: []}
+        for fin, patron, etiqueta in self._automata.buscar(normalizado):
+            # Los patrones largos sin espacios pueden ir pegados (hashtags); el resto debe ser una palabra
+            if etiqueta == SI and " " not in patron and len(patron) >= 8:
+                encontrados[etiqueta].append(patron)
+            elif self._es_palabra_completa(normalizado, fin, patron):
+                encontrados[etiqueta].append(patron)
+        return encontrados
+
+    def evaluar(self, texto: str) -> str:
+        """
+        Clasifica un texto sin llamar al modelo cuando el caso es evidente.
+
+        Args:
+            texto: Subtítulos y/o descripción
+
+        Returns:
+            str: "si" (nombre completo de un precandidato o el proceso 2026 explícito),
+            "no" (sin vocabulario político) o "consultar" (partidos, apellidos o
+            vocabulario político genérico)
+        """
+        encontrados = self.coincidencias(texto)
+        if encontrados[SI]:
+            decision = SI
+        elif encontrados[CONSULTAR]:
+            decision = CONSULTAR
+        else:
+            decision = NO
+
+        with self._lock:
+            self.estadisticas["evaluaciones"] += 1
+            self.estadisticas[decision] += 1
+        return decision
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve cuántas evaluaciones se resolvieron localmente.
+
+        Returns:
+            Diccionario con evaluaciones por decisión y la tasa resuelta sin OpenAI
+        """
+        with self._lock:
+            datos = dict(self.estadisticas)
+        datos["tasa_resuelta_local"] = round((datos[SI] + datos[NO]) / datos["evaluaciones"], 3) \
+            if datos["evaluaciones"] else None
+        return datos
+
+
+_prefiltro: Optional[PrefiltroPolitico] = None
+_prefiltro_lock = threading.Lock()
+
+
+def obtener_prefiltro() -> PrefiltroPolitico:
+    """
+    Devuelve el prefiltro compartido, construyéndolo la primera vez.
+
+    Returns:
+        PrefiltroPolitico: Prefiltro del proceso
+    """
+    global _prefiltro
+    with _prefiltro_lock:
+        if _prefiltro is None:
+            _prefiltro = PrefiltroPolitico()
+        return _prefiltro
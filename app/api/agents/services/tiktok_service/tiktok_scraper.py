@@ -4,15 +4,26 @@ Servicio principal para la extracción de datos de TikTok.
 import time
 import traceback
 import os
-import openai
-from typing import List, Dict, Any
+import threading
+from concurrent.futures import wait
+from typing import Dict, Any, Callable, Optional
 
 from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
 from app.api.agents.services.tiktok_service.browser_tiktok import TikTokBrowser
+from app.api.agents.services.tiktok_service.tiktok_browser_pool import TikTokBrowserPool
 from app.api.agents.services.tiktok_service.tiktok_interaction import esperar_elemento, activar_subtitulos, dar_like, pasar_siguiente_video
-from app.api.agents.services.tiktok_service.tiktok_data_extractor import extraer_datos_canal, extraer_informacion_video, extraer_comentarios
-from app.api.agents.services.tiktok_service.tiktok_database import guardar_en_base_datos
+from app.api.agents.services.tiktok_service.tiktok_data_extractor import extraer_datos_canal, extraer_informacion_video, cosechar_comentarios
+from app.api.agents.services.tiktok_service.tiktok_database import video_id_para_guardar, extract_video_id
 from app.api.agents.services.tiktok_service.tiktok_content_analyzer import capturar_y_analizar_subtitulos
+from app.api.agents.services.tiktok_service.tiktok_executor import ejecutar_en_navegador
+from app.api.agents.services.tiktok_service.tiktok_waits import esperar_condicion
+from app.api.agents.services.tiktok_service.tiktok_persistencia import obtener_persistidor
+from app.api.agents.services.tiktok_service.tiktok_vistos import obtener_filtro_vistos
+from app.api.agents.services.tiktok_service.tiktok_network_comments import MODO_COMENTARIOS_RED, vaciar_log_red
+
+# Segundos que se espera al final a que se guarden los videos antes de responder
+ESPERA_PERSISTENCIA_SEGUNDOS = float(os.getenv("TIKTOK_ESPERA_PERSISTENCIA", "60"))
 
 
 class TikTokScraperService:
@@ -20,32 +31,171 @@ class TikTokScraperService:
     Servicio para orquestar la extracción de datos de TikTok.
     """
     
-    def __init__(self):
-        """Inicializa el servicio de extracción de datos."""
+    def __init__(self, pool: Optional[TikTokBrowserPool] = None, cookies_path: str = "cookies.json"):
+        """
+        Inicializa el servicio de extracción de datos.
+        
+        Args:
+            pool: Pool de navegadores reutilizables (opcional). Sin pool se abre
+                un navegador nuevo para cada procesamiento.
+            cookies_path: Archivo de cookies para los navegadores que no vienen del pool
+        """
         self.browser = None
+        self.pool = pool
+        self.cookies_path = cookies_path
+        
+    async def procesar_videos(
+        self,
+        num_videos: int,
+        al_procesar_video: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancelacion: Optional[threading.Event] = None,
+        reclamar_video: Optional[Callable[[str], bool]] = None,
+        conservar_resultados: bool = True
+    ) -> Dict[str, Any]:
+        """
+        Procesa videos de TikTok en el ejecutor del navegador sin bloquear el event loop.
         
-    async def procesar_videos(self, num_videos: int) -> Dict[str, Any]:
+        Args:
+            num_videos: Número de videos a procesar
+            al_procesar_video: Función opcional que recibe el resultado de cada video
+                (se invoca desde el hilo del navegador)
+            cancelacion: Evento opcional para detener el procesamiento
+            reclamar_video: Función opcional que reserva un video_id y devuelve
+                False si otro proceso ya lo reclamó
+            conservar_resultados: Si es False, los resultados por video solo se
+                entregan a al_procesar_video y no se acumulan en memoria
+            
+        Returns:
+            Diccionario con resultados del procesamiento
+        """
+        return await ejecutar_en_navegador(
+            self.procesar_videos_sync,
+            num_videos,
+            al_procesar_video=al_procesar_video,
+            cancelacion=cancelacion,
+            reclamar_video=reclamar_video,
+            conservar_resultados=conservar_resultados
+        )
+
+    def procesar_videos_sync(
+        self,
+        num_videos: int,
+        al_procesar_video: Optional[Callable[[Dict[str, Any]], None]] = None,
+        cancelacion: Optional[threading.Event] = None,
+        reclamar_video: Optional[Callable[[str], bool]] = None,
+        conservar_resultados: bool = True
+    ) -> Dict[str, Any]:
         """
         Procesa videos de TikTok para buscar contenido político de Perú.
         
+        Es bloqueante: debe ejecutarse en un hilo propio (ver procesar_videos).
+        
         Args:
             num_videos: Número de videos a procesar
+            al_procesar_video: Función opcional que recibe el resultado de cada video
+                en cuanto termina de procesarse (se usa para reportar progreso)
+            cancelacion: Evento opcional; si se activa, el procesamiento se detiene
+                antes del siguiente video
+            reclamar_video: Función opcional que recibe el video_id del video actual
+                y devuelve False si ya fue reclamado (deduplicación entre procesos)
+            conservar_resultados: Si es False, los resultados no se acumulan en la
+                respuesta (útil cuando se transmiten con al_procesar_video)
             
         Returns:
             Diccionario con resultados del procesamiento
         """
         self.browser = None
         results = []
-        
+        cancelado = False
+
+        resultados_lock = threading.Lock()
+
+        def registrar_resultado(video_result):
+            # Se invoca desde el hilo del navegador y desde la etapa de persistencia
+            with resultados_lock:
+                if conservar_resultados:
+                    results.append(video_result)
+                if al_procesar_video:
+                    try:
+                        al_procesar_video(video_result)
+                    except Exception as e:
+                        print(f"Error al notificar el progreso del video: {str(e)}")
+
+        # Los registros se guardan en segundo plano; el resultado de cada video se
+        # entrega cuando terminan de guardarse todos sus registros
+        persistidor = obtener_persistidor()
+        filtro_vistos = obtener_filtro_vistos()
+        videos_en_persistencia = []
+        persistencia_lock = threading.Lock()
+
+        def entregar_al_guardar(video_result, futuro_video, futuros_comentarios):
+            estado = {
+                "video_result": video_result,
+                "futuros": [futuro_video] + futuros_comentarios,
+                "restantes": 1 + len(futuros_comentarios),
+                "entregado": False,
+                "inicio": time.time()
+            }
+            with persistencia_lock:
+                videos_en_persistencia.append(estado)
+
+            def al_terminar(_):
+                with persistencia_lock:
+                    estado["restantes"] -= 1
+                    if estado["restantes"] or estado["entregado"]:
+                        return
+                    estado["entregado"] = True
+                entregar_resultado(estado)
+
+            for futuro in estado["futuros"]:
+                futuro.add_done_callback(al_terminar)
+
+        def entregar_resultado(estado, pendiente=False):
+            futuro_video, futuros_comentarios = estado["futuros"][0], estado["futuros"][1:]
+            ids = {}
+            if futuro_video.done() and not futuro_video.exception():
+                ids = futuro_video.result()
+            comentarios_guardados = sum(
+                len(futuro.result()["comments_ids"]) for futuro in futuros_comentarios
+                if futuro.done() and not futuro.exception()
+            )
+
+            video_result = dict(estado["video_result"])
+            video_result["guardado"] = None if pendiente else ids.get("scrapper_result_id") is not None
+            video_result["comentarios_guardados"] = comentarios_guardados
+            video_result["tiempos"]["persistencia"] = round(time.time() - estado["inicio"], 2)
+            if pendiente:
+                video_result["persistencia_pendiente"] = True
+            registrar_resultado(video_result)
+
+        def esperar_persistencia():
+            # Damos un margen para que se guarde lo pendiente; lo que no termine se
+            # reporta como pendiente y el persistidor lo seguirá guardando
+            with persistencia_lock:
+                futuros = [futuro for estado in videos_en_persistencia for futuro in estado["futuros"]]
+            wait(futuros, timeout=ESPERA_PERSISTENCIA_SEGUNDOS)
+            with persistencia_lock:
+                sin_entregar = [estado for estado in videos_en_persistencia if not estado["entregado"]]
+                for estado in sin_entregar:
+                    estado["entregado"] = True
+            for estado in sin_entregar:
+                entregar_resultado(estado, pendiente=True)
+
         try:
-            self.browser = TikTokBrowser()
-            driver = self.browser.navigate_to_tiktok()
-            print(f"Comenzando a procesar {num_videos} videos...")
-            
-            # Esperamos a que la página termine de cargar
-            tiempo_espera = 5
-            print(f"Esperando {tiempo_espera} segundos para que la página cargue completamente...")
-            time.sleep(tiempo_espera)
+            if self.pool:
+                # El navegador del pool ya está autenticado y en el feed
+                self.browser = self.pool.checkout()
+                driver = self.browser.driver
+                print(f"Comenzando a procesar {num_videos} videos con un navegador del pool...")
+            else:
+                self.browser = TikTokBrowser(self.cookies_path)
+                driver = self.browser.navigate_to_tiktok()
+                print(f"Comenzando a procesar {num_videos} videos...")
+                
+                # Esperamos a que la página cargue el primer video
+                print("Esperando a que la página cargue el primer video...")
+                esperar_condicion(driver, EC.presence_of_element_located((By.TAG_NAME, "video")),
+                                  10, "carga_inicial")
             
             # Verificamos que estamos en la página correcta
             try:
@@ -67,39 +217,74 @@ class TikTokScraperService:
             
             # Procesamos videos hasta alcanzar el número solicitado
             while videos_procesados < num_videos:
+                if cancelacion is not None and cancelacion.is_set():
+                    print("Procesamiento cancelado. Deteniendo antes del siguiente video...")
+                    cancelado = True
+                    break
+
                 try:
                     print(f"\n=== Procesando video {videos_procesados+1}/{num_videos} ===")
+                    inicio_video = time.time()
                     
                     # Esperamos a que el video cargue
                     video_element = esperar_elemento(driver, By.TAG_NAME, "video", 5)
                     if not video_element:
                         print(f"No se encontró el elemento de video. Intentando pasar al siguiente...")
                         pasar_siguiente_video(driver)
-                        time.sleep(1)
                         continue
                     
+                    # Las respuestas de comentarios de los videos anteriores no son de este
+                    if MODO_COMENTARIOS_RED:
+                        vaciar_log_red(driver)
+                    
+                    # Los videos que ya vimos (guardados o descartados) se saltan sin capturarlos
+                    video_id = extract_video_id(driver.current_url)
+                    if filtro_vistos is not None and video_id and filtro_vistos.contiene(video_id):
+                        print(f"El video {video_id} ya fue visto. Pasando al siguiente...")
+                        pasar_siguiente_video(driver)
+                        continue
+                    
+                    # Si otro proceso ya reclamó este video, no lo procesamos de nuevo
+                    if reclamar_video:
+                        if video_id and not reclamar_video(video_id):
+                            print(f"El video {video_id} ya fue reclamado por otro proceso. Pasando al siguiente...")
+                            pasar_siguiente_video(driver)
+                            continue
+                    
                     # Capturamos y analizamos los subtítulos con la nueva función
                     print("Iniciando captura y análisis de subtítulos en tiempo real...")
                     resultado_subtitulos = capturar_y_analizar_subtitulos(driver, 25)
+                    fin_captura = time.time()
                     
                     subtitulos = resultado_subtitulos["subtitulos"]
                     es_politico = resultado_subtitulos["es_politico"]
                     like_ya_dado = resultado_subtitulos.get("like_dado", False)
                     
+                    # Descartado solo con la descripción: no hace falta volver a evaluarlo
+                    if resultado_subtitulos.get("descartado_por_descripcion"):
+                        if filtro_vistos is not None and video_id:
+                            filtro_vistos.agregar(video_id)
+                        pasar_siguiente_video(driver)
+                        continue
+                    
                     # Si no se capturaron suficientes subtítulos, pasamos al siguiente
                     if not subtitulos or len(subtitulos.strip()) < 5:
                         print("No se capturaron subtítulos suficientes. Pasando al siguiente video...")
                         pasar_siguiente_video(driver)
-                        time.sleep(1)
                         continue
                     
                     print(f"Subtítulos capturados: {subtitulos[:100]}...")
                               
                     # Si no es político, pasamos al siguiente video
                     if not es_politico:
-                        print("El contenido no es político peruano. Pasando al siguiente video...")
+                        if resultado_subtitulos.get("error_clasificacion"):
+                            # Sin veredicto no se marca como visto: se vuelve a evaluar si reaparece
+                            print("No se pudo clasificar el contenido. Pasando al siguiente video...")
+                        else:
+                            print("El contenido no es político peruano. Pasando al siguiente video...")
+                            if filtro_vistos is not None and video_id:
+                                filtro_vistos.agregar(video_id)
                         pasar_siguiente_video(driver)
-                        time.sleep(2)
                         continue
                     
                     # Si es político, damos like al video (si no se dio ya), 
@@ -117,17 +302,51 @@ class TikTokScraperService:
                     info_channel = extraer_datos_canal(driver)
                     info_video = extraer_informacion_video(driver)
                     
-                    print("Extrayendo comentarios...")
-                    info_comments = extraer_comentarios(driver)
+                    # El video se guarda primero y los comentarios se envían por lotes
+                    # mientras se cosechan, sin acumularlos en memoria
+                    video_id_guardado = video_id_para_guardar(info_video)
+                    print("Enviando información al persistidor...")
+                    futuro_video = persistidor.enviar({
+                        "tipo": "video",
+                        "info_channel": info_channel,
+                        "info_video": info_video,
+                        "subtitulos": subtitulos
+                    })
+                    # Se marca como visto solo cuando quedó guardado (y nunca con el ID predeterminado)
+                    if filtro_vistos is not None and extract_video_id(info_video.get('video_url', '')):
+                        filtro_vistos.agregar_al_guardar(video_id_guardado, futuro_video)
                     
-                    print("Guardando información en la base de datos...")
-                    guardar_en_base_datos(info_channel, info_video, info_comments, subtitulos)
-    
-                    # Guardamos resultados para devolver
-                    video_result = {
-                        "video_number": videos_procesados+1,              
-                    }
-                    results.append(video_result)
+                    print("Cosechando comentarios...")
+                    futuros_comentarios = []
+                    carga_comentarios = cosechar_comentarios(
+                        driver,
+                        lambda lote: futuros_comentarios.append(persistidor.enviar({
+                            "tipo": "comentarios", "video_id": video_id_guardado, "comentarios": lote
+                        }))
+                    )
+                    
+                    fin_extraccion = time.time()
+                    
+                    entregar_al_guardar(
+                        {
+                            "video_number": videos_procesados+1,
+                            "video_id": video_id_guardado,
+                            "video_url": info_video.get("video_url"),
+                            "canal": info_channel.get("name"),
+                            "canal_url": info_channel.get("url"),
+                            "likes": info_video.get("likes", 0),
+                            "comentarios": info_video.get("comentarios", 0),
+                            "comentarios_extraidos": carga_comentarios["total"],
+                            "longitud_transcripcion": len(subtitulos),
+                            "carga_comentarios": carga_comentarios,
+                            "tiempos": {
+                                "captura": round(fin_captura - inicio_video, 2),
+                                "extraccion": round(fin_extraccion - fin_captura, 2)
+                            }
+                        },
+                        futuro_video,
+                        futuros_comentarios
+                    )
                     
                     # Incrementamos el contador de videos procesados
                     videos_procesados += 1
@@ -136,8 +355,6 @@ class TikTokScraperService:
                     if videos_procesados < num_videos:
                         print("Pasando al siguiente video...")
                         pasar_siguiente_video(driver)
-                        # Esperamos un poco más para asegurar que el siguiente video cargue
-                        time.sleep(2)
     
                 except Exception as e:
                     error_message = f"Error procesando el video {videos_procesados+1}: {str(e)}"
@@ -145,7 +362,7 @@ class TikTokScraperService:
                     print(f"Error: {error_message}")
                     print(f"Error detallado: {traceback_str}")
     
-                    results.append({
+                    registrar_resultado({
                         "video_number": videos_procesados+1,
                         "error": error_message
                     })
@@ -153,12 +370,14 @@ class TikTokScraperService:
                     try:
                         print("Intentando pasar al siguiente video después de error...")
                         pasar_siguiente_video(driver)
-                        time.sleep(2)
                     except Exception as e2:
                         print(f"No se pudo pasar al siguiente video después de error: {str(e2)}")
     
-            print("Cerrando el navegador...")
-            self.browser.close()
+            self._liberar_navegador()
+            print("Esperando a que termine la persistencia pendiente...")
+            esperar_persistencia()
+            if cancelado:
+                return {"message": "Procesamiento cancelado", "cancelado": True, "results": results}
             return {"message": "Procesamiento completado", "results": results}
     
         except Exception as e:
@@ -169,17 +388,37 @@ class TikTokScraperService:
     
             if self.browser:
                 try:
-                    self.browser.close()
-                    print("Navegador cerrado después de error")
+                    self._liberar_navegador(saludable=False)
+                    print("Navegador liberado después de error")
                 except:
                     pass
+            
+            # Esperamos los videos que ya estaban en cola antes de devolver el error
+            esperar_persistencia()
     
             return {"error": error_message, "results": results}
         
+    def _liberar_navegador(self, saludable: bool = True):
+        """
+        Devuelve el navegador al pool o lo cierra si no se usa pool.
+        
+        Args:
+            saludable: False si la sesión terminó por un error general
+        """
+        browser, self.browser = self.browser, None
+        if not browser:
+            return
+        if self.pool:
+            print("Devolviendo el navegador al pool...")
+            self.pool.checkin(browser, saludable)
+        else:
+            print("Cerrando el navegador...")
+            browser.close()
+
     def cleanup(self):
         """Limpia los recursos utilizados."""
         if self.browser:
             try:
-                self.browser.close()
+                self._liberar_navegador(saludable=False)
             except:
                 pass
\ No newline at end of file
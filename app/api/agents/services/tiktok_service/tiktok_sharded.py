@@ -0,0 +1,197 @@
+"""
+Servicio para procesar videos de TikTok con varios procesos en paralelo en el mismo equipo.
+"""
+import multiprocessing
+import os
+import queue
+import threading
+import time
+import traceback
+from typing import List, Dict, Any, Callable, Optional
+
+from app.api.agents.services.tiktok_service.tiktok_scraper import TikTokScraperService
+from app.api.agents.services.tiktok_service.tiktok_persistencia import cerrar_persistidor
+
+# Número de procesos por defecto (cada uno abre su propio Chrome)
+NUM_PROCESOS_DEFECTO = int(os.getenv("TIKTOK_PROCESOS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+# Archivos de cookies separados por comas; cada proceso usa uno distinto (rotando si hay menos)
+COOKIES_PERFILES = [
+    ruta.strip() for ruta in os.getenv("TIKTOK_COOKIES_PERFILES", "cookies.json").split(",") if ruta.strip()
+]
+
+
+def repartir_videos(num_videos: int, num_procesos: int) -> List[int]:
+    """
+    Reparte el número de videos entre los procesos lo más equitativamente posible.
+
+    Args:
+        num_videos: Número total de videos a procesar
+        num_procesos: Número de procesos
+
+    Returns:
+        list: Número de videos asignado a cada proceso (sin ceros)
+    """
+    num_procesos = max(1, min(num_procesos, num_videos))
+    base, resto = divmod(num_videos, num_procesos)
+    return [base + (1 if i < resto else 0) for i in range(num_procesos)]
+
+
+def _trabajador(indice: int, num_videos: int, cookies_path: str, vistos, cola_mensajes, cancelacion):
+    """
+    Punto de entrada de cada proceso: abre su navegador y procesa su parte de videos.
+
+    Args:
+        indice: Número del proceso
+        num_videos: Videos asignados a este proceso
+        cookies_path: Archivo de cookies del perfil de este proceso
+        vistos: Diccionario compartido video_id -> índice del proceso que lo reclamó
+        cola_mensajes: Cola para enviar el progreso y el resumen al proceso principal
+        cancelacion: Evento compartido para detener el procesamiento
+    """
+    def reclamar_video(video_id: str) -> bool:
+        # setdefault se ejecuta de forma atómica en el servidor del Manager
+        return vistos.setdefault(video_id, indice) == indice
+
+    def al_procesar_video(video_result: Dict[str, Any]):
+        cola_mensajes.put(("video", indice, video_result))
+
+    inicio = time.time()
+    try:
+        scraper_service = TikTokScraperService(cookies_path=cookies_path)
+        resultado = scraper_service.procesar_videos_sync(
+            num_videos,
+            al_procesar_video=al_procesar_video,
+            cancelacion=cancelacion,
+            reclamar_video=reclamar_video
+        )
+        resumen = {"error": resultado.get("error"), "cancelado": resultado.get("cancelado", False)}
+    except Exception as e:
+        print(f"Error en el proceso {indice}: {str(e)}")
+        print(f"Error detallado: {traceback.format_exc()}")
+        resumen = {"error": f"Error en el proceso {indice}: {str(e)}", "cancelado": False}
+    finally:
+        # Cada proceso tiene su propio persistidor: lo vaciamos antes de terminar
+        cerrar_persistidor()
+
+    resumen["duracion_segundos"] = round(time.time() - inicio, 2)
+    cola_mensajes.put(("fin", indice, resumen))
+
+
+def procesar_videos_multiproceso(
+    num_videos: int,
+    num_procesos: int = NUM_PROCESOS_DEFECTO,
+    cookies_perfiles: Optional[List[str]] = None,
+    al_procesar_video: Optional[Callable[[Dict[str, Any]], None]] = None,
+    cancelacion: Optional[threading.Event] = None
+) -> Dict[str, Any]:
+    """
+    Procesa videos repartiéndolos entre varios procesos, cada uno con su navegador y perfil de cookies.
+
+    Los procesos comparten una única vista de los video_id ya reclamados, de modo
+    que ningún video se procesa dos veces, y los resultados se combinan en un solo reporte.
+    Es bloqueante: debe ejecutarse en el ejecutor del navegador.
+
+    Args:
+        num_videos: Número total de videos a procesar
+        num_procesos: Número de procesos a lanzar
+        cookies_perfiles: Archivos de cookies a repartir entre los procesos
+        al_procesar_video: Función opcional que recibe el resultado de cada video
+        cancelacion: Evento opcional para detener todos los procesos
+
+    Returns:
+        Diccionario con los resultados combinados de todos los procesos
+    """
+    cookies_perfiles = cookies_perfiles or COOKIES_PERFILES
+    reparto = repartir_videos(num_videos, num_procesos)
+    print(f"Procesando {num_videos} videos con {len(reparto)} procesos: {reparto}")
+
+    contexto = multiprocessing.get_context("spawn")
+    results = []
+    procesos_resumen = {}
+    inicio = time.time()
+
+    with contexto.Manager() as manager:
+        vistos = manager.dict()
+        cancelacion_compartida = manager.Event()
+        cola_mensajes = manager.Queue()
+
+        procesos = []
+        for indice, videos_asignados in enumerate(reparto):
+            cookies_path = cookies_perfiles[indice % len(cookies_perfiles)]
+            proceso = contexto.Process(
+                target=_trabajador,
+                args=(indice, videos_asignados, cookies_path, vistos, cola_mensajes, cancelacion_compartida),
+                name=f"tiktok-proceso-{indice}",
+                daemon=True
+            )
+            proceso.start()
+            procesos.append(proceso)
+
+        pendientes = set(range(len(procesos)))
+        sin_resumen = set()
+        while pendientes:
+            if cancelacion is not None and cancelacion.is_set() and not cancelacion_compartida.is_set():
+                print("Cancelación solicitada. Avisando a todos los procesos...")
+                cancelacion_compartida.set()
+
+            try:
+                tipo, indice, datos = cola_mensajes.get(timeout=0.5)
+            except queue.Empty:
+                # Si un proceso murió sin enviar su resumen, lo damos por terminado
+                # (tras una espera adicional por si el resumen aún estaba en camino)
+                for indice in list(pendientes):
+                    proceso = procesos[indice]
+                    if proceso.is_alive():
+                        continue
+                    if indice not in sin_resumen:
+                        sin_resumen.add(indice)
+                    else:
+                        pendientes.discard(indice)
+                        procesos_resumen[indice] = {
+                            "error": f"El proceso {indice} terminó inesperadamente (código {proceso.exitcode})",
+                            "cancelado": False
+                        }
+                continue
+
+            if tipo == "video":
+                video_result = dict(datos, proceso=indice)
+                results.append(video_result)
+                if al_procesar_video:
+                    try:
+                        al_procesar_video(video_result)
+                    except Exception as e:
+                        print(f"Error al notificar el progreso del video: {str(e)}")
+            elif tipo == "fin":
+                pendientes.discard(indice)
+                procesos_resumen[indice] = datos
+
+        for proceso in procesos:
+            proceso.join(timeout=10)
+
+        videos_unicos = len(vistos)
+
+    procesos_info = []
+    for indice, videos_asignados in enumerate(reparto):
+        resumen = procesos_resumen.get(indice, {})
+        procesos_info.append({
+            "proceso": indice,
+            "videos_asignados": videos_asignados,
+            "videos_procesados": sum(1 for r in results if r["proceso"] == indice and "error" not in r),
+            **resumen
+        })
+
+    cancelado = any(info.get("cancelado") for info in procesos_info)
+    errores = [info["error"] for info in procesos_info if info.get("error")]
+    reporte = {
+        "message": "Procesamiento cancelado" if cancelado else "Procesamiento completado",
+        "results": results,
+        "procesos": procesos_info,
+        "videos_unicos_vistos": videos_unicos,
+        "duracion_segundos": round(time.time() - inicio, 2)
+    }
+    if cancelado:
+        reporte["cancelado"] = True
+    if errores and len(errores) == len(procesos_info):
+        reporte["error"] = "; ".join(errores)
+    return reporte
@@ -1,61 +1,91 @@
 """
 Servicio para capturar y procesar subtítulos de videos TikTok.
 """
-import time
-from selenium.webdriver.common.by import By
-from app.api.agents.services.tiktok_service.tiktok_interaction import pasar_siguiente_video
+from typing import Any, Dict, Optional
 
-def capturar_subtitulos(driver, duracion_segundos):
+SELECTOR_SUBTITULOS = "div.css-xfcgts-DivVideoClosedCaption.e15oqmov0"
+
+# Cada cuánto se vacía el buffer del colector (una sola llamada a execute_script)
+INTERVALO_DRENADO = 1.0
+
+# Colector inyectado en la página: un MutationObserver registra cada cambio de
+# subtítulo con el currentTime del video en un buffer que Python vacía por lotes
+_SCRIPT_INSTALAR_COLECTOR = """
+var selector = arguments[0];
+var estado = window.__tiktokSubtitulos;
+if (!estado) {
+    estado = {buffer: [], visibles: [], presente: false, ultimaPresencia: 0, observador: null};
+    window.__tiktokSubtitulos = estado;
+
+    var registrar = function() {
+        var elementos = document.querySelectorAll(selector);
+        var video = document.querySelector('video');
+        var tiempo = video ? video.currentTime : null;
+        var textos = [];
+        for (var i = 0; i < elementos.length; i++) {
+            var texto = (elementos[i].innerText || elementos[i].textContent || '').trim();
+            if (texto) {
+                textos.push(texto);
+                if (estado.visibles.indexOf(texto) === -1) {
+                    estado.buffer.push({texto: texto, t: tiempo, ts: Date.now()});
+                }
+            }
+        }
+        estado.visibles = textos;
+        estado.presente = textos.length > 0;
+        if (estado.presente) {
+            estado.ultimaPresencia = Date.now();
+        }
+    };
+
+    estado.observador = new MutationObserver(registrar);
+    estado.observador.observe(document.body, {childList: true, subtree: true, characterData: true});
+    estado.registrar = registrar;
+}
+// Empezamos con el buffer vacío para no mezclar subtítulos del video anterior
+estado.buffer = [];
+estado.visibles = [];
+estado.registrar();
+return true;
+"""
+
+_SCRIPT_DRENAR_COLECTOR = """
+var estado = window.__tiktokSubtitulos;
+if (!estado) { return null; }
+return {
+    items: estado.buffer.splice(0, estado.buffer.length),
+    presente: estado.presente,
+    ms_desde_presencia: estado.ultimaPresencia ? Date.now() - estado.ultimaPresencia : null
+};
+"""
+
+
+def instalar_colector_subtitulos(driver) -> bool:
+    """
+    Inyecta en la página el colector de subtítulos y vacía su buffer.
+
+    Args:
+        driver: El driver de Selenium WebDriver
+
+    Returns:
+        bool: True si el colector quedó instalado
     """
-    Captura los subtítulos que aparecen durante la reproducción de un video de TikTok.
-    
+    try:
+        return bool(driver.execute_script(_SCRIPT_INSTALAR_COLECTOR, SELECTOR_SUBTITULOS))
+    except Exception as e:
+        print(f"No se pudo instalar el colector de subtítulos: {e}")
+        return False
+
+
+def drenar_subtitulos(driver) -> Optional[Dict[str, Any]]:
+    """
+    Obtiene y vacía el buffer del colector con una sola llamada al navegador.
+
     Args:
         driver: El driver de Selenium WebDriver
-        duracion_segundos: Tiempo en segundos durante el cual se capturarán subtítulos
-        
+
     Returns:
-        String con todos los subtítulos capturados concatenados
+        dict con 'items' (lista de {texto, t, ts}), 'presente' y 'ms_desde_presencia',
+        o None si el colector no está instalado (por ejemplo, tras recargar la página)
     """
-    print(f"Capturando subtítulos durante {duracion_segundos} segundos...")
-    subtitulos_unicos = set()
-    texto_completo = []
-    tiempo_final = time.time() + duracion_segundos
-    
-    # Variable para controlar cuándo fue la última vez que se encontró un subtítulo
-    ultimo_subtitulo_encontrado = time.time()
-
-    while time.time() < tiempo_final:
-        try:
-            # Selector principal para los subtítulos
-            elementos = driver.find_elements(
-                By.CSS_SELECTOR,
-                "div.css-xfcgts-DivVideoClosedCaption.e15oqmov0"
-            )
-            
-            # Si encuentra elementos, actualiza el tiempo del último subtítulo encontrado
-            if elementos:
-                ultimo_subtitulo_encontrado = time.time()
-                
-                for elemento in elementos:
-                    texto = elemento.text.strip()
-                    if texto and texto not in subtitulos_unicos:
-                        subtitulos_unicos.add(texto)
-                        texto_completo.append(texto)
-                        print(f"Subtítulo capturado: {texto}")
-            # Si no ha encontrado subtítulos por 6 segundos o más, pasa al siguiente video
-            elif time.time() - ultimo_subtitulo_encontrado >= 4:
-                print("No se han encontrado subtítulos por 6 segundos. Pasando al siguiente video...")
-                pasar_siguiente_video(driver)
-                # Reinicia el contador después de pasar al siguiente video
-                ultimo_subtitulo_encontrado = time.time()
-                
-        except Exception as e:
-            # Ignorar errores transitorios de búsqueda
-            print(f"Error al capturar subtítulos: {e}")
-            pass
-            
-        time.sleep(0.5)
-
-    resultado = " ".join(texto_completo)
-    print(f"Captura de subtítulos finalizada. Total: {len(texto_completo)} fragmentos, {len(resultado)} caracteres")
-    return resultado
\ No newline at end of file
+    return driver.execute_script(_SCRIPT_DRENAR_COLECTOR)
@@ -0,0 +1,182 @@
+"""
+Filtro de videos ya vistos para descartar repeticiones del feed antes de capturarlas.
+"""
+import os
+import threading
+import time
+from array import array
+from bisect import bisect_left
+from concurrent.futures import Future
+from typing import Any, Dict, Iterable, Optional
+
+from app.api.agents.services.tiktok_service.tiktok_almacen import obtener_almacen
+
+# Activa el filtro de videos vistos (0 lo desactiva)
+FILTRO_VISTOS_ACTIVO = os.getenv("TIKTOK_FILTRO_VISTOS", "1") == "1"
+
+# IDs nuevos que se acumulan antes de fusionarlos con el arreglo ordenado
+MAX_IDS_RECIENTES = int(os.getenv("TIKTOK_FILTRO_VISTOS_RECIENTES", "4096"))
+
+
+class FiltroVideosVistos:
+    """
+    Conjunto compacto de video_id: los ID numéricos se guardan ordenados en un
+    arreglo de enteros de 8 bytes (búsqueda binaria) y los nuevos en un set pequeño
+    que se fusiona con el arreglo al crecer.
+    """
+
+    def __init__(self):
+        """Inicializa el filtro vacío."""
+        self._ordenados = array("Q")
+        self._recientes = set()
+        # IDs no numéricos (no deberían existir, pero no se descartan)
+        self._otros = set()
+        self._lock = threading.Lock()
+        self.estadisticas = {"consultas": 0, "aciertos": 0, "segundos_carga": 0.0}
+
+    @staticmethod
+    def _como_entero(video_id: str) -> Optional[int]:
+        """Convierte un video_id a entero si cabe en 64 bits sin signo."""
+        if video_id.isdigit():
+            numero = int(video_id)
+            if numero < 2 ** 64:
+                return numero
+        return None
+
+    def cargar(self, video_ids: Iterable[str]):
+        """
+        Reemplaza el contenido del filtro por los ID indicados.
+
+        Args:
+            video_ids: ID de los videos ya guardados
+        """
+        inicio = time.time()
+        numeros = []
+        otros = set()
+        for video_id in video_ids:
+            numero = self._como_entero(str(video_id))
+            if numero is None:
+                otros.add(str(video_id))
+            else:
+                numeros.append(numero)
+        ordenados = array("Q", sorted(set(numeros)))
+
+        with self._lock:
+            # Conservamos lo agregado mientras se cargaba
+            self._ordenados = ordenados
+            self._otros |= otros
+            self._fusionar()
+            self.estadisticas["segundos_carga"] = time.time() - inicio
+
+    def _fusionar(self):
+        """Mueve los ID recientes al arreglo ordenado (requiere tener self._lock)."""
+        if not self._recientes:
+            return
+        nuevos = [n for n in self._recientes if not self._en_ordenados(n)]
+        if nuevos:
+            self._ordenados = array("Q", sorted(list(self._ordenados) + nuevos))
+        self._recientes.clear()
+
+    def _en_ordenados(self, numero: int) -> bool:
+        """Búsqueda binaria en el arreglo ordenado."""
+        posicion = bisect_left(self._ordenados, numero)
+        return posicion < len(self._ordenados) and self._ordenados[posicion] == numero
+
+    def contiene(self, video_id: str) -> bool:
+        """
+        Comprueba si el video ya fue visto.
+
+        Args:
+            video_id: ID del video en TikTok
+
+        Returns:
+            bool: True si el video está en el filtro
+        """
+        numero = self._como_entero(video_id)
+        with self._lock:
+            if numero is None:
+                visto = video_id in self._otros
+            else:
+                visto = numero in self._recientes or self._en_ordenados(numero)
+            self.estadisticas["consultas"] += 1
+            self.estadisticas["aciertos"] += int(visto)
+        return visto
+
+    def agregar(self, video_id: str):
+        """
+        Marca un video como visto.
+
+        Args:
+            video_id: ID del video en TikTok
+        """
+        numero = self._como_entero(video_id)
+        with self._lock:
+            if numero is None:
+                self._otros.add(video_id)
+                return
+            self._recientes.add(numero)
+            if len(self._recientes) >= MAX_IDS_RECIENTES:
+                self._fusionar()
+
+    def agregar_al_guardar(self, video_id: str, futuro: Future):
+        """
+        Marca un video como visto cuando el persistidor confirme que quedó guardado.
+
+        Un guardado sin scrapper_result_id (por ejemplo, sin URL o nombre del canal)
+        no guarda el video, así que no lo marca.
+
+        Args:
+            video_id: ID del video en TikTok
+            futuro: Futuro del registro 'video' devuelto por el persistidor
+        """
+        def al_terminar(futuro_terminado: Future):
+            if futuro_terminado.exception() is None \
+                    and futuro_terminado.result().get("scrapper_result_id") is not None:
+                self.agregar(video_id)
+
+        futuro.add_done_callback(al_terminar)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return len(self._ordenados) + len(self._recientes) + len(self._otros)
+
+    def obtener_estadisticas(self) -> Dict[str, Any]:
+        """
+        Devuelve el tamaño del filtro y cuántas consultas encontraron un video visto.
+
+        Returns:
+            Diccionario con ids, bytes aproximados, consultas y aciertos
+        """
+        with self._lock:
+            datos = {clave: round(valor, 3) if isinstance(valor, float) else valor
+                     for clave, valor in self.estadisticas.items()}
+            datos["ids"] = len(self._ordenados) + len(self._recientes) + len(self._otros)
+            datos["bytes_arreglo"] = self._ordenados.itemsize * len(self._ordenados)
+        return datos
+
+
+_filtro: Optional[FiltroVideosVistos] = None
+_filtro_lock = threading.Lock()
+
+
+def obtener_filtro_vistos() -> Optional[FiltroVideosVistos]:
+    """
+    Devuelve el filtro compartido, cargándolo desde el almacén la primera vez.
+
+    Returns:
+        FiltroVideosVistos o None si TIKTOK_FILTRO_VISTOS es 0
+    """
+    global _filtro
+    if not FILTRO_VISTOS_ACTIVO:
+        return None
+    with _filtro_lock:
+        if _filtro is None:
+            filtro = FiltroVideosVistos()
+            try:
+                filtro.cargar(obtener_almacen().listar_video_ids())
+                print(f"Filtro de videos vistos cargado con {len(filtro)} videos")
+            except Exception as e:
+                # Sin la carga inicial el filtro sigue sirviendo para los videos de esta ejecución
+                print(f"No se pudieron cargar los videos vistos: {str(e)}")
+            _filtro = filtro
+        return _filtro
@@ -0,0 +1,255 @@
+"""
+Motor de esperas basado en eventos para reemplazar las pausas fijas en la interacción con TikTok.
+"""
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+from selenium.webdriver.support.ui import WebDriverWait
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.common.exceptions import (
+    TimeoutException, WebDriverException, NoSuchElementException,
+    StaleElementReferenceException, JavascriptException
+)
+
+# Intervalo de sondeo de las esperas (segundos)
+INTERVALO_SONDEO = float(os.getenv("TIKTOK_INTERVALO_SONDEO", "0.1"))
+
+# Observador instalado en la página: cuenta las mutaciones por clave y guarda la hora de la última
+_SCRIPT_INSTALAR_OBSERVADOR = """
+var clave = arguments[0];
+var raiz = arguments[1] ? document.querySelector(arguments[1]) : document.body;
+window.__tiktokMutaciones = window.__tiktokMutaciones || {};
+var registro = window.__tiktokMutaciones[clave];
+if (registro && registro.raiz === raiz && raiz) {
+    return registro.total;
+}
+if (registro && registro.observador) {
+    registro.observador.disconnect();
+}
+registro = {total: 0, ultima: Date.now(), raiz: raiz, observador: null};
+window.__tiktokMutaciones[clave] = registro;
+if (!raiz) {
+    return -1;
+}
+registro.observador = new MutationObserver(function(mutaciones) {
+    registro.total += mutaciones.length;
+    registro.ultima = Date.now();
+});
+registro.observador.observe(raiz, {childList: true, subtree: true, attributes: true, characterData: true});
+return 0;
+"""
+
+_SCRIPT_LEER_MUTACIONES = """
+var registro = (window.__tiktokMutaciones || {})[arguments[0]];
+if (!registro) { return null; }
+return [registro.total, Date.now() - registro.ultima];
+"""
+
+_SCRIPT_FIRMA_VIDEO = """
+var video = document.querySelector('video');
+return location.href + '|' + (video ? (video.currentSrc || video.src || '') : '');
+"""
+
+
+class EstadisticasEsperas:
+    """
+    Registra cuántas veces se usó cada espera y cuánto tiempo real tomó.
+    """
+
+    def __init__(self):
+        """Inicializa el registro vacío."""
+        self._lock = threading.Lock()
+        self._datos: Dict[str, Dict[str, Any]] = {}
+
+    def registrar(self, nombre: str, segundos: float, cumplida: bool):
+        """
+        Registra el resultado de una espera.
+
+        Args:
+            nombre: Nombre de la espera
+            segundos: Tiempo real que duró
+            cumplida: True si la condición se cumplió antes del timeout
+        """
+        with self._lock:
+            datos = self._datos.setdefault(nombre, {
+                "llamadas": 0, "cumplidas": 0, "timeouts": 0,
+                "segundos_totales": 0.0, "segundos_max": 0.0
+            })
+            datos["llamadas"] += 1
+            datos["cumplidas" if cumplida else "timeouts"] += 1
+            datos["segundos_totales"] += segundos
+            datos["segundos_max"] = max(datos["segundos_max"], segundos)
+
+    def obtener(self) -> Dict[str, Dict[str, Any]]:
+        """
+        Devuelve una copia de las estadísticas con el promedio por espera.
+
+        Returns:
+            Diccionario nombre -> estadísticas
+        """
+        with self._lock:
+            resultado = {}
+            for nombre, datos in self._datos.items():
+                copia = dict(datos)
+                copia["segundos_promedio"] = round(datos["segundos_totales"] / datos["llamadas"], 3)
+                copia["segundos_totales"] = round(datos["segundos_totales"], 3)
+                copia["segundos_max"] = round(datos["segundos_max"], 3)
+                resultado[nombre] = copia
+            return resultado
+
+    def reiniciar(self):
+        """Borra todas las estadísticas."""
+        with self._lock:
+            self._datos.clear()
+
+
+# Registro compartido por todas las sesiones del proceso
+estadisticas_esperas = EstadisticasEsperas()
+
+
+def esperar_condicion(driver, condicion: Callable[[Any], Any], timeout: float, nombre: str,
+                      intervalo: float = INTERVALO_SONDEO) -> Any:
+    """
+    Espera hasta que la condición devuelva un valor verdadero o se agote el tiempo.
+
+    Args:
+        driver: El driver de Selenium WebDriver
+        condicion: Función que recibe el driver y devuelve un valor verdadero al cumplirse
+        timeout: Tiempo máximo de espera en segundos
+        nombre: Nombre de la espera para las estadísticas
+        intervalo: Intervalo de sondeo en segundos
+
+    Returns:
+        El valor devuelto por la condición, o None si se agotó el tiempo
+    """
+    inicio = time.time()
+    try:
+        resultado = WebDriverWait(
+            driver, timeout, poll_frequency=intervalo,
+            ignored_exceptions=(NoSuchElementException, StaleElementReferenceException, JavascriptException)
+        ).until(condicion)
+        estadisticas_esperas.registrar(nombre, time.time() - inicio, True)
+        return resultado
+    except TimeoutException:
+        estadisticas_esperas.registrar(nombre, time.time() - inicio, False)
+        return None
+
+
+def firma_video_actual(driver) -> str:
+    """
+    Devuelve una firma del video en reproducción (URL de la página y fuente del video).
+
+    Args:
+        driver: El driver de Selenium WebDriver
+
+    Returns:
+        str: Firma del video actual
+    """
+    try:
+        return driver.execute_script(_SCRIPT_FIRMA_VIDEO) or ""
+    except WebDriverException:
+        return ""
+
+
+def video_cambiado(firma_anterior: str) -> Callable[[Any], Any]:
+    """
+    Condición: el video en reproducción es distinto del indicado.
+
+    Args:
+        firma_anterior: Firma obtenida con firma_video_actual antes de cambiar de video
+
+    Returns:
+        Condición para esperar_condicion (devuelve la nueva firma)
+    """
+    def condicion(driver):
+        firma = firma_video_actual(driver)
+        return firma if firma and firma != firma_anterior else False
+    return condicion
+
+
+def nuevos_nodos(selector: str, cantidad_anterior: int) -> Callable[[Any], Any]:
+    """
+    Condición: hay más nodos que coinciden con el selector que antes.
+
+    Args:
+        selector: Selector CSS de los nodos
+        cantidad_anterior: Número de nodos antes de la acción
+
+    Returns:
+        Condición para esperar_condicion (devuelve la nueva cantidad)
+    """
+    def condicion(driver):
+        cantidad = driver.execute_script(
+            "return document.querySelectorAll(arguments[0]).length;", selector
+        )
+        return cantidad if cantidad > cantidad_anterior else False
+    return condicion
+
+
+def menu_visible(by, selector: str) -> Callable[[Any], Any]:
+    """
+    Condición: el elemento de menú está renderizado y se puede hacer clic.
+
+    Args:
+        by: El método de localización (By.ID, By.XPATH, etc.)
+        selector: El selector del elemento
+
+    Returns:
+        Condición para esperar_condicion (devuelve el elemento)
+    """
+    return EC.element_to_be_clickable((by, selector))
+
+
+def instalar_observador(driver, clave: str, selector_raiz: Optional[str] = None) -> int:
+    """
+    Instala (o reutiliza) un MutationObserver en la página que cuenta las mutaciones.
+
+    Args:
+        driver: El driver de Selenium WebDriver
+        clave: Identificador del observador
+        selector_raiz: Selector CSS del nodo a observar (por defecto todo el body)
+
+    Returns:
+        int: Mutaciones registradas hasta ahora (-1 si no se encontró la raíz)
+    """
+    try:
+        return driver.execute_script(_SCRIPT_INSTALAR_OBSERVADOR, clave, selector_raiz)
+    except WebDriverException as e:
+        print(f"No se pudo instalar el observador '{clave}': {e}")
+        return -1
+
+
+def hubo_mutaciones(clave: str, total_anterior: int) -> Callable[[Any], Any]:
+    """
+    Condición: el observador registró mutaciones desde el total indicado.
+
+    Args:
+        clave: Identificador del observador
+        total_anterior: Total devuelto por instalar_observador antes de la acción
+
+    Returns:
+        Condición para esperar_condicion (devuelve el nuevo total)
+    """
+    def condicion(driver):
+        datos = driver.execute_script(_SCRIPT_LEER_MUTACIONES, clave)
+        return datos[0] if datos and datos[0] > total_anterior else False
+    return condicion
+
+
+def dom_quieto(clave: str, milisegundos: int) -> Callable[[Any], Any]:
+    """
+    Condición: el observador no registró mutaciones durante el tiempo indicado.
+
+    Args:
+        clave: Identificador del observador
+        milisegundos: Tiempo sin mutaciones requerido
+
+    Returns:
+        Condición para esperar_condicion
+    """
+    def condicion(driver):
+        datos = driver.execute_script(_SCRIPT_LEER_MUTACIONES, clave)
+        return bool(datos) and datos[1] >= milisegundos
+    return condicion
@@ -0,0 +1,49 @@
+-- Índices únicos que respaldan los upserts (INSERT ... ON CONFLICT) de tiktok_database.
+-- Antes de crearlos se fusionan los duplicados que dejó el antiguo SELECT + INSERT,
+-- conservando la fila más antigua y reasignando sus dependientes.
+
+-- Redes sociales duplicadas por nombre
+UPDATE channels c
+SET social_network_id = d.id_conservado
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY name) AS id_conservado
+    FROM social_networks
+) d
+WHERE c.social_network_id = d.id AND d.id <> d.id_conservado;
+
+DELETE FROM social_networks s
+USING social_networks s2
+WHERE s.name = s2.name AND s.id > s2.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS social_networks_name_key ON social_networks (name);
+
+-- Canales duplicados por URL
+UPDATE scrapper_results r
+SET channel_id = d.id_conservado
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY url) AS id_conservado
+    FROM channels
+) d
+WHERE r.channel_id = d.id AND d.id <> d.id_conservado;
+
+DELETE FROM channels c
+USING channels c2
+WHERE c.url = c2.url AND c.id > c2.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS channels_url_key ON channels (url);
+
+-- Videos duplicados por video_id
+UPDATE comments c
+SET scrapper_result_id = d.id_conservado
+FROM (
+    SELECT id, MIN(id) OVER (PARTITION BY video_id) AS id_conservado
+    FROM scrapper_results
+    WHERE video_id IS NOT NULL
+) d
+WHERE c.scrapper_result_id = d.id AND d.id <> d.id_conservado;
+
+DELETE FROM scrapper_results r
+USING scrapper_results r2
+WHERE r.video_id = r2.video_id AND r.id > r2.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS scrapper_results_video_id_key ON scrapper_results (video_id);
@@ -0,0 +1,6 @@
+-- Datos exactos de los comentarios capturados desde /api/comment/list/ (TIKTOK_COMENTARIOS_RED=1).
+-- Los comentarios leídos del DOM no tienen ID ni número de respuestas, y su fecha es aproximada.
+
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS comment_id TEXT;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS reply_count INTEGER;
+ALTER TABLE comments ADD COLUMN IF NOT EXISTS commented_at TIMESTAMP;
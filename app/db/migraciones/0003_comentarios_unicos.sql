@@ -0,0 +1,29 @@
+-- Índices únicos que evitan guardar dos veces el mismo comentario de un video al
+-- volver a scrapearlo (los inserts usan ON CONFLICT DO NOTHING).
+-- Los comentarios capturados por red se identifican por su comment_id (0002); los
+-- leídos del DOM no lo tienen y se identifican por usuario y contenido.
+-- Antes se eliminan los duplicados, incluidos los que dejó 0001 al fusionar
+-- los comentarios de videos duplicados, conservando la fila más antigua.
+
+DELETE FROM comments c
+USING comments c2
+WHERE c.scrapper_result_id = c2.scrapper_result_id
+  AND c.comment_id = c2.comment_id
+  AND c.id > c2.id;
+
+DELETE FROM comments c
+USING comments c2
+WHERE c.comment_id IS NULL AND c2.comment_id IS NULL
+  AND c.scrapper_result_id = c2.scrapper_result_id
+  AND c.username = c2.username
+  AND md5(c.content) = md5(c2.content)
+  AND c.id > c2.id;
+
+CREATE UNIQUE INDEX IF NOT EXISTS comments_video_comment_id_key
+    ON comments (scrapper_result_id, comment_id)
+    WHERE comment_id IS NOT NULL;
+
+-- md5 del contenido: el texto completo podría superar el tamaño máximo de una entrada del índice
+CREATE UNIQUE INDEX IF NOT EXISTS comments_video_usuario_contenido_dom_key
+    ON comments (scrapper_result_id, username, md5(content))
+    WHERE comment_id IS NULL;
@@ -0,0 +1,122 @@
+"""
+Aplica en orden las migraciones SQL de app/db/migraciones que aún no se aplicaron.
+
+Uso (desde la raíz del repositorio):
+    python -m app.db.migrar
+"""
+import os
+
+from app.api.agents.services.tiktok_service.tiktok_database import obtener_pool_conexiones, cerrar_pool_conexiones
+
+DIRECTORIO_MIGRACIONES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "migraciones")
+
+# Aplica las migraciones pendientes al arrancar la API; si no, la API no arranca mientras haya pendientes
+MIGRAR_AL_ARRANCAR = os.getenv("TIKTOK_MIGRAR_AL_ARRANCAR", "0") == "1"
+
+
+def listar_migraciones(directorio=DIRECTORIO_MIGRACIONES):
+    """
+    Lista los archivos de migración ordenados por nombre.
+
+    Args:
+        directorio: Directorio con los archivos .sql
+
+    Returns:
+        list: Tuplas (versión, ruta), donde la versión es el nombre sin extensión
+    """
+    return [
+        (os.path.splitext(nombre)[0], os.path.join(directorio, nombre))
+        for nombre in sorted(os.listdir(directorio))
+        if nombre.endswith(".sql")
+    ]
+
+
+def aplicar_migraciones(directorio=DIRECTORIO_MIGRACIONES):
+    """
+    Aplica las migraciones pendientes, cada una en su propia transacción.
+
+    Args:
+        directorio: Directorio con los archivos .sql
+
+    Returns:
+        list: Versiones aplicadas en esta ejecución
+    """
+    aplicadas = []
+    with obtener_pool_conexiones().conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute(
+                """
+                CREATE TABLE IF NOT EXISTS schema_migrations (
+                    version TEXT PRIMARY KEY,
+                    applied_at TIMESTAMP NOT NULL DEFAULT now()
+                )
+                """
+            )
+            conn.commit()
+
+            for version, ruta in listar_migraciones(directorio):
+                # El bloqueo evita que dos instancias apliquen la misma migración a la vez
+                cur.execute("LOCK TABLE schema_migrations IN EXCLUSIVE MODE")
+                cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+                if cur.fetchone():
+                    conn.rollback()
+                    continue
+
+                print(f"Aplicando migración {version}...")
+                with open(ruta, "r", encoding="utf-8") as f:
+                    cur.execute(f.read())
+                cur.execute("INSERT INTO schema_migrations (version) VALUES (%s)", (version,))
+                conn.commit()
+                aplicadas.append(version)
+
+    print(f"Migraciones aplicadas: {len(aplicadas)}")
+    return aplicadas
+
+
+def migraciones_pendientes(directorio=DIRECTORIO_MIGRACIONES):
+    """
+    Lista las migraciones que aún no se aplicaron, sin modificar la base de datos.
+
+    Args:
+        directorio: Directorio con los archivos .sql
+
+    Returns:
+        list: Versiones pendientes, en el orden en que se aplicarían
+    """
+    with obtener_pool_conexiones().conexion() as conn:
+        with conn.cursor() as cur:
+            cur.execute("SELECT to_regclass('schema_migrations')")
+            if cur.fetchone()[0] is None:
+                aplicadas = set()
+            else:
+                cur.execute("SELECT version FROM schema_migrations")
+                aplicadas = {fila[0] for fila in cur.fetchall()}
+    return [version for version, _ in listar_migraciones(directorio) if version not in aplicadas]
+
+
+def preparar_esquema(aplicar=MIGRAR_AL_ARRANCAR):
+    """
+    Comprueba al arrancar que el esquema tiene los índices que necesitan los upserts.
+
+    Args:
+        aplicar: Si es True, aplica las migraciones pendientes en lugar de solo comprobarlas
+
+    Raises:
+        RuntimeError: Si quedan migraciones pendientes y no se pidió aplicarlas
+    """
+    if aplicar:
+        aplicar_migraciones()
+        return
+    pendientes = migraciones_pendientes()
+    if pendientes:
+        raise RuntimeError(
+            f"La base de datos tiene migraciones pendientes ({', '.join(pendientes)}): sin ellas fallan "
+            "todos los guardados. Ejecute 'python -m app.db.migrar' o arranque con TIKTOK_MIGRAR_AL_ARRANCAR=1."
+        )
+
+
+if __name__ == "__main__":
+    try:
+        aplicar_migraciones()
+    finally:
+        cerrar_pool_conexiones()
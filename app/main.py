@@ -1,10 +1,49 @@
+import asyncio
+from contextlib import asynccontextmanager
+
 from fastapi import FastAPI
 from app.api.agents.api import api_router
+from app.api.agents.services.tiktok_service.tiktok_executor import cerrar_executor
+from app.api.agents.services.tiktok_service.tiktok_browser_pool import obtener_pool_navegadores, cerrar_pool_navegadores
+from app.api.agents.services.tiktok_service.tiktok_almacen import obtener_almacen, cerrar_almacen, AlmacenPostgres
+from app.api.agents.services.tiktok_service.tiktok_persistencia import cerrar_persistidor
+from app.api.agents.services.tiktok_service.tiktok_vistos import obtener_filtro_vistos
+from app.api.agents.services.tiktok_service.tiktok_clasificador_llm import cerrar_clasificador_llm
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # El almacén (y la configuración de la base de datos) se prepara una sola vez al arrancar
+    almacen = obtener_almacen()
+    # Los upserts de Postgres necesitan los índices únicos de las migraciones
+    if isinstance(almacen, AlmacenPostgres):
+        # Importación diferida: el backend SQLite no necesita psycopg2
+        from app.db.migrar import preparar_esquema
+        try:
+            preparar_esquema()
+        except Exception:
+            cerrar_almacen()
+            raise
+    # Cargamos los videos ya guardados en segundo plano (el primer crawler espera si no terminó)
+    asyncio.get_running_loop().run_in_executor(None, obtener_filtro_vistos)
+    # Precalentamos el pool de navegadores en segundo plano para no retrasar el arranque.
+    # Usa el ejecutor por defecto para no ocupar los hilos reservados a las sesiones.
+    pool = obtener_pool_navegadores()
+    if pool:
+        asyncio.get_running_loop().run_in_executor(None, pool.precalentar)
+    yield
+    cerrar_pool_navegadores()
+    cerrar_executor()
+    cerrar_clasificador_llm()
+    # Vaciamos la persistencia diferida antes de cerrar las conexiones
+    cerrar_persistidor()
+    cerrar_almacen()
+
 
-app = FastAPI(title="TikTok Scraper API")
+app = FastAPI(title="TikTok Scraper API", lifespan=lifespan)
 
 app.include_router(api_router)
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000)
\ No newline at end of file
+    uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,127 @@
+"""
+Benchmark de inserción de comentarios: bucle fila a fila vs. execute_values vs. COPY.
+
+Inserta comentarios sintéticos en la tabla comments de la base configurada en el
+entorno y deshace la transacción al terminar, por lo que no deja datos.
+
+COPY solo se mide aquí: el servicio necesita los IDs generados (los usa para contar
+los comentarios guardados de cada video) y COPY no los devuelve.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_insercion_comentarios --filas 2000 --repeticiones 3
+"""
+import argparse
+import io
+import time
+
+from app.api.agents.services.tiktok_service.tiktok_database import (
+    obtener_pool_conexiones, cerrar_pool_conexiones, _insertar_comentarios, _filas_comentarios,
+    COLUMNAS_COMENTARIOS
+)
+
+
+def insertar_fila_a_fila(cur, scrapper_result_id, comentarios):
+    """Implementación anterior: un INSERT ... RETURNING id por comentario."""
+    comments_ids = []
+    for comentario in comentarios:
+        cur.execute(
+            """
+            INSERT INTO comments
+            (scrapper_result_id, username, content, like_count)
+            VALUES (%s, %s, %s, %s)
+            RETURNING id
+            """,
+            (
+                scrapper_result_id,
+                comentario.get('usuario', 'Desconocido'),
+                comentario.get('contenido', ''),
+                comentario.get('likes', 0)
+            )
+        )
+        comments_ids.append(cur.fetchone()[0])
+    return comments_ids
+
+
+def _escapar_copy(valor):
+    """Escapa un valor para el formato de texto de COPY (None es NULL)."""
+    if valor is None:
+        return '\\N'
+    return (str(valor).replace('\\', '\\\\').replace('\t', '\\t')
+            .replace('\n', '\\n').replace('\r', '\\r'))
+
+
+def copiar_comentarios(cur, scrapper_result_id, comentarios):
+    """Inserta comentarios con COPY FROM STDIN, sin devolver los IDs generados."""
+    buffer = io.StringIO()
+    for fila in _filas_comentarios(scrapper_result_id, comentarios):
+        buffer.write('\t'.join(_escapar_copy(valor) for valor in fila) + '\n')
+    buffer.seek(0)
+    cur.copy_expert(f"COPY comments ({COLUMNAS_COMENTARIOS}) FROM STDIN", buffer)
+    return len(comentarios)
+
+
+METODOS = {
+    "fila_a_fila": insertar_fila_a_fila,
+    "execute_values": _insertar_comentarios,
+    "copy": copiar_comentarios,
+}
+
+
+def generar_comentarios(cantidad, ronda=0):
+    """
+    Genera comentarios sintéticos con caracteres que COPY debe escapar.
+
+    Cada ronda genera textos distintos: el índice único de comments descarta
+    (o, con COPY, rechaza) los comentarios repetidos de un mismo video.
+    """
+    return [
+        {
+            'usuario': f"usuario_{i}",
+            'contenido': f"Comentario {i} de la ronda {ronda}\tcon tabulación, salto\nde línea y barra \\ final",
+            'likes': i % 100
+        }
+        for i in range(cantidad)
+    ]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--filas", type=int, default=2000, help="Comentarios por repetición")
+    parser.add_argument("--repeticiones", type=int, default=3, help="Repeticiones por método")
+    parser.add_argument("--scrapper-result-id", type=int, default=None,
+                        help="scrapper_results.id al que se asocian (por defecto el primero)")
+    args = parser.parse_args()
+
+    pool = obtener_pool_conexiones()
+    try:
+        with pool.conexion() as conn:
+            with conn.cursor() as cur:
+                scrapper_result_id = args.scrapper_result_id
+                if scrapper_result_id is None:
+                    cur.execute("SELECT id FROM scrapper_results ORDER BY id LIMIT 1")
+                    fila = cur.fetchone()
+                    if not fila:
+                        raise SystemExit("No hay registros en scrapper_results; indique --scrapper-result-id")
+                    scrapper_result_id = fila[0]
+
+                print(f"{'método':<16}{'filas/s':>12}{'segundos':>12}")
+                ronda = 0
+                for nombre, metodo in METODOS.items():
+                    mejor = None
+                    for _ in range(args.repeticiones):
+                        ronda += 1
+                        comentarios = generar_comentarios(args.filas, ronda)
+                        inicio = time.perf_counter()
+                        metodo(cur, scrapper_result_id, comentarios)
+                        segundos = time.perf_counter() - inicio
+                        mejor = segundos if mejor is None else min(mejor, segundos)
+                    print(f"{nombre:<16}{args.filas / mejor:>12.0f}{mejor:>12.3f}")
+
+            # No dejamos los comentarios sintéticos en la base
+            conn.rollback()
+    finally:
+        cerrar_pool_conexiones()
+
+
+if __name__ == "__main__":
+    main()
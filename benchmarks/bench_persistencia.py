@@ -0,0 +1,85 @@
+"""
+Benchmark de persistencia: videos y comentarios sintéticos a través del persistidor diferido.
+
+Mide registros y comentarios por segundo con el backend indicado. Con SQLite se usa
+un archivo temporal, por lo que no hace falta ninguna base de datos externa.
+
+Uso (desde la raíz del repositorio):
+    python -m benchmarks.bench_persistencia --backend sqlite --videos 500 --comentarios 200
+"""
+import argparse
+import os
+import shutil
+import tempfile
+import time
+
+from app.api.agents.services.tiktok_service import tiktok_almacen
+from app.api.agents.services.tiktok_service.tiktok_persistencia import PersistidorDiferido
+
+
+def generar_video(numero, comentarios_por_video):
+    """Genera un registro de video y sus comentarios sintéticos."""
+    video_id = str(7000000000000000000 + numero)
+    video = {
+        "tipo": "video",
+        "info_channel": {"name": f"canal_{numero % 50}", "url": f"https://www.tiktok.com/@canal_{numero % 50}"},
+        "info_video": {
+            "video_url": f"https://www.tiktok.com/@canal_{numero % 50}/video/{video_id}",
+            "likes": numero,
+            "comentarios": comentarios_por_video
+        },
+        "subtitulos": "texto de prueba " * 20
+    }
+    comentarios = {
+        "tipo": "comentarios",
+        "video_id": video_id,
+        "comentarios": [
+            {"usuario": f"usuario_{i}", "contenido": f"comentario {i} del video {numero}", "likes": i}
+            for i in range(comentarios_por_video)
+        ]
+    }
+    return video, comentarios
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--backend", choices=["sqlite", "postgres"], default="sqlite")
+    parser.add_argument("--videos", type=int, default=500)
+    parser.add_argument("--comentarios", type=int, default=200, help="Comentarios por video")
+    parser.add_argument("--lote", type=int, default=20, help="Registros por transacción")
+    args = parser.parse_args()
+
+    directorio = None
+    if args.backend == "sqlite":
+        directorio = tempfile.mkdtemp(prefix="bench_tiktok_")
+        tiktok_almacen.RUTA_SQLITE = os.path.join(directorio, "tiktok.db")
+
+    almacen = tiktok_almacen.crear_almacen(args.backend)
+    persistidor = PersistidorDiferido(almacen.guardar_registros, tamano_lote=args.lote, archivo_derrame="",
+                                      errores_transitorios=almacen.errores_conexion)
+    try:
+        inicio = time.perf_counter()
+        futuros = []
+        for numero in range(args.videos):
+            for registro in generar_video(numero, args.comentarios):
+                futuros.append(persistidor.enviar(registro))
+        segundos_envio = time.perf_counter() - inicio
+
+        persistidor.cerrar(timeout=3600)
+        segundos = time.perf_counter() - inicio
+        rechazados = sum(1 for futuro in futuros if futuro.exception())
+
+        total_comentarios = args.videos * args.comentarios
+        print(f"backend: {args.backend}  lote: {args.lote}")
+        print(f"registros: {len(futuros)}  rechazados: {rechazados}")
+        print(f"segundos enviando: {segundos_envio:.3f}  segundos totales: {segundos:.3f}")
+        print(f"videos/s: {args.videos / segundos:.0f}  comentarios/s: {total_comentarios / segundos:.0f}")
+        print(persistidor.obtener_estadisticas())
+    finally:
+        almacen.cerrar()
+        if directorio:
+            shutil.rmtree(directorio, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+"""
+Pruebas del almacén SQLite (base en memoria).
+"""
+import sqlite3
+
+from app.api.agents.services.tiktok_service.tiktok_almacen_sqlite import AlmacenSQLite
+
+VIDEO_ID = "7501847835747388727"
+INFO_CANAL = {"url": "https://www.tiktok.com/@canal.peru", "name": "Canal Perú"}
+INFO_VIDEO = {"video_url": f"https://www.tiktok.com/@canal.peru/video/{VIDEO_ID}", "likes": 10, "comentarios": 2}
+
+
+def test_guarda_id_respuestas_y_fecha_de_los_comentarios_de_red():
+    almacen = AlmacenSQLite(":memory:")
+    almacen.guardar_video(INFO_CANAL, INFO_VIDEO)
+    almacen.guardar_comentarios(VIDEO_ID, [
+        {'id': "7501900112233445566", 'usuario': "rosa.quispe", 'contenido': "Por fin", 'likes': 1520,
+         'respuestas': 14, 'fecha_exacta': "2025-05-08 16:00:00"},
+        # Los comentarios del DOM no traen ID ni respuestas
+        {'usuario': "mili", 'contenido': "Ya era hora", 'likes': 3, 'fecha_exacta': None},
+    ])
+
+    filas = almacen._conn.execute(
+        "SELECT username, comment_id, reply_count, commented_at FROM comments ORDER BY id"
+    ).fetchall()
+    assert filas == [
+        ("rosa.quispe", "7501900112233445566", 14, "2025-05-08 16:00:00"),
+        ("mili", None, None, None),
+    ]
+
+
+def test_agrega_las_columnas_nuevas_a_una_base_anterior(tmp_path):
+    ruta = str(tmp_path / "anterior.db")
+    conn = sqlite3.connect(ruta)
+    conn.execute(
+        "CREATE TABLE comments (id INTEGER PRIMARY KEY, scrapper_result_id INTEGER, "
+        "username TEXT, content TEXT, like_count INTEGER)"
+    )
+    conn.close()
+
+    almacen = AlmacenSQLite(ruta)
+    columnas = {fila[1] for fila in almacen._conn.execute("PRAGMA table_info(comments)")}
+    almacen.cerrar()
+
+    assert {"comment_id", "reply_count", "commented_at"} <= columnas
+
+
+def test_volver_a_guardar_un_video_solo_agrega_los_comentarios_nuevos():
+    almacen = AlmacenSQLite(":memory:")
+    comentarios = [
+        {'usuario': "rosa.quispe", 'contenido': "Por fin", 'likes': 1},
+        {'usuario': "mili", 'contenido': "Ya era hora", 'likes': 3},
+    ]
+    primero = almacen.guardar_video(INFO_CANAL, INFO_VIDEO, comentarios)
+    # Al volver a scrapear el video aparecen los mismos comentarios y uno nuevo
+    segundo = almacen.guardar_video(INFO_CANAL, INFO_VIDEO, comentarios[1:])
+    nuevos = almacen.guardar_comentarios(VIDEO_ID, comentarios + [
+        {'usuario': "jorge", 'contenido': "No estoy de acuerdo", 'likes': 0},
+    ])
+
+    assert len(primero['comments_ids']) == 2
+    assert segundo['scrapper_result_id'] == primero['scrapper_result_id']
+    assert segundo['comments_ids'] == []
+    assert len(nuevos) == 1
+    assert almacen._conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0] == 3
+
+
+def test_los_comentarios_de_red_se_distinguen_por_su_id():
+    almacen = AlmacenSQLite(":memory:")
+    almacen.guardar_video(INFO_CANAL, INFO_VIDEO)
+    repetidos = [
+        {'id': "7501900112233445566", 'usuario': "mili", 'contenido': "jaja", 'likes': 1},
+        {'id': "7501900112233445567", 'usuario': "mili", 'contenido': "jaja", 'likes': 0},
+    ]
+
+    assert len(almacen.guardar_comentarios(VIDEO_ID, repetidos)) == 2
+    # Al volver a capturarlos por red no se duplican
+    assert almacen.guardar_comentarios(VIDEO_ID, repetidos) == []
+    assert almacen._conn.execute("SELECT COUNT(*) FROM comments").fetchone()[0] == 2
+
+
+def test_elimina_los_comentarios_duplicados_de_una_base_anterior(tmp_path):
+    ruta = str(tmp_path / "anterior.db")
+    conn = sqlite3.connect(ruta)
+    conn.execute(
+        "CREATE TABLE comments (id INTEGER PRIMARY KEY, scrapper_result_id INTEGER, "
+        "username TEXT, content TEXT, like_count INTEGER)"
+    )
+    conn.executemany(
+        "INSERT INTO comments (scrapper_result_id, username, content, like_count) VALUES (?, ?, ?, ?)",
+        [(1, "mili", "Ya era hora", 3), (1, "mili", "Ya era hora", 3), (2, "mili", "Ya era hora", 3)]
+    )
+    conn.commit()
+    conn.close()
+
+    almacen = AlmacenSQLite(ruta)
+    ids = [fila[0] for fila in almacen._conn.execute("SELECT id FROM comments ORDER BY id")]
+    almacen.cerrar()
+
+    assert ids == [1, 3]
+
+
+def test_listar_video_ids_lee_por_bloques_sin_bloquear_los_guardados():
+    almacen = AlmacenSQLite(":memory:")
+    for numero in range(3):
+        info_video = dict(INFO_VIDEO, video_url=f"https://www.tiktok.com/@canal.peru/video/{numero + 1}")
+        almacen.guardar_video(INFO_CANAL, info_video, subtitulos=f"Transcripción {numero}")
+
+    video_ids = almacen._recorrer("SELECT video_id FROM scrapper_results ORDER BY id", 2)
+    assert next(video_ids) == "1"
+    # Entre bloques el almacén sigue aceptando guardados
+    almacen.guardar_comentarios("1", [{'usuario': "mili", 'contenido': "Ya era hora", 'likes': 3}])
+
+    assert list(video_ids) == ["2", "3"]
+    assert sorted(almacen.listar_video_ids()) == ["1", "2", "3"]
+    assert len(list(almacen.listar_transcripciones())) == 3
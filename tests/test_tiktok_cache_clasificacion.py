@@ -0,0 +1,129 @@
+"""
+Pruebas de la caché de clasificaciones (sin OpenAI).
+"""
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from app.api.agents.services.tiktok_service.tiktok_cache_clasificacion import (
+    CacheClasificacion, clave_clasificacion
+)
+
+
+def clasificar_como(resultado, llamadas):
+    def clasificar(texto_subtitulos, texto_descripcion):
+        llamadas.append((texto_subtitulos, texto_descripcion))
+        return resultado
+    return clasificar
+
+
+def esperar_espera_compartida(cache):
+    limite = time.time() + 5
+    while cache.obtener_estadisticas()["esperas_compartidas"] == 0:
+        assert time.time() < limite, "El segundo hilo no llegó a esperar al primero"
+        time.sleep(0.01)
+
+
+def test_descarta_la_clasificacion_menos_usada():
+    cache = CacheClasificacion(capacidad=2, archivo="")
+    llamadas = []
+    cache.obtener_o_clasificar("uno", "", clasificar_como(True, llamadas))
+    cache.obtener_o_clasificar("dos", "", clasificar_como(False, llamadas))
+    # Usar "uno" lo vuelve el más reciente: el que sale es "dos"
+    cache.obtener_o_clasificar("uno", "", clasificar_como(None, llamadas))
+    cache.obtener_o_clasificar("tres", "", clasificar_como(True, llamadas))
+
+    assert cache.consultar("uno") is True
+    assert cache.consultar("dos") is None
+    assert cache.consultar("tres") is True
+    assert len(llamadas) == 3
+
+
+def test_la_clave_ignora_tildes_mayusculas_y_signos():
+    assert clave_clasificacion("¡El Presidente habló!", "Política") == clave_clasificacion("el presidente hablo", "politica")
+    assert clave_clasificacion("presidente", "") != clave_clasificacion("", "presidente")
+
+    cache = CacheClasificacion(archivo="")
+    llamadas = []
+    cache.obtener_o_clasificar("¡El Presidente habló!", "", clasificar_como(True, llamadas))
+    assert cache.obtener_o_clasificar("el presidente hablo", "", clasificar_como(False, llamadas)) is True
+    assert len(llamadas) == 1
+
+
+def test_dos_consultas_simultaneas_clasifican_una_sola_vez():
+    cache = CacheClasificacion(archivo="")
+    liberar = threading.Event()
+    llamadas = []
+
+    def clasificar(texto_subtitulos, texto_descripcion):
+        llamadas.append(texto_subtitulos)
+        liberar.wait(5)
+        return True
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        primero = executor.submit(cache.obtener_o_clasificar, "mismo texto", "", clasificar)
+        segundo = executor.submit(cache.obtener_o_clasificar, "mismo texto", "", clasificar)
+        esperar_espera_compartida(cache)
+        liberar.set()
+        assert primero.result(timeout=5) is True
+        assert segundo.result(timeout=5) is True
+
+    assert llamadas == ["mismo texto"]
+    assert cache.obtener_estadisticas()["en_curso"] == 0
+
+
+def test_el_error_llega_a_todos_los_que_esperan_y_no_se_guarda():
+    cache = CacheClasificacion(archivo="")
+    liberar = threading.Event()
+    llamadas = []
+
+    def clasificar(texto_subtitulos, texto_descripcion):
+        llamadas.append(texto_subtitulos)
+        liberar.wait(5)
+        raise RuntimeError("OpenAI no respondió")
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        primero = executor.submit(cache.obtener_o_clasificar, "mismo texto", "", clasificar)
+        segundo = executor.submit(cache.obtener_o_clasificar, "mismo texto", "", clasificar)
+        esperar_espera_compartida(cache)
+        liberar.set()
+        for futuro in (primero, segundo):
+            with pytest.raises(RuntimeError):
+                futuro.result(timeout=5)
+
+    assert llamadas == ["mismo texto"]
+    # El próximo intento vuelve a consultar
+    assert cache.consultar("mismo texto") is None
+    assert cache.obtener_o_clasificar("mismo texto", "", clasificar_como(False, llamadas)) is False
+
+
+def test_recarga_las_clasificaciones_guardadas_en_disco(tmp_path):
+    archivo = str(tmp_path / "cache.jsonl")
+    cache = CacheClasificacion(capacidad=10, archivo=archivo)
+    llamadas = []
+    cache.obtener_o_clasificar("uno", "desc", clasificar_como(True, llamadas))
+    cache.obtener_o_clasificar("dos", "", clasificar_como(False, llamadas))
+
+    recargada = CacheClasificacion(capacidad=10, archivo=archivo)
+    assert recargada.consultar("uno", "desc") is True
+    assert recargada.consultar("dos") is False
+    assert recargada.obtener_o_clasificar("uno", "desc", clasificar_como(None, llamadas)) is True
+    assert len(llamadas) == 2
+
+
+def test_compacta_el_archivo_al_cargar(tmp_path):
+    archivo = tmp_path / "cache.jsonl"
+    with open(archivo, "w", encoding="utf-8") as f:
+        for numero in range(7):
+            f.write(json.dumps({"clave": clave_clasificacion(f"texto {numero}"), "resultado": numero}) + "\n")
+        f.write("línea corrupta\n")
+
+    cache = CacheClasificacion(capacidad=3, archivo=str(archivo))
+
+    # Solo quedan las tres más recientes, en memoria y en disco
+    assert [cache.consultar(f"texto {numero}") for numero in range(7)] == [None] * 4 + [4, 5, 6]
+    with open(archivo, encoding="utf-8") as f:
+        assert [json.loads(linea)["resultado"] for linea in f] == [4, 5, 6]
@@ -0,0 +1,110 @@
+"""
+Pruebas de los errores del servicio de clasificación con OpenAI (sin llamadas reales a la API).
+"""
+import asyncio
+
+import openai
+import pytest
+
+from app.api.agents.services.tiktok_service import tiktok_clasificador_llm as modulo
+from app.api.agents.services.tiktok_service.tiktok_clasificador_llm import ClasificadorLLM, ErrorClasificacionLLM
+
+
+@pytest.fixture
+def clasificador(monkeypatch):
+    monkeypatch.setenv("OPENAI_API_KEY", "sk-prueba")
+    monkeypatch.setattr(modulo, "ESPERA_LOTE_LLM", 0.01)
+    monkeypatch.setattr(modulo, "ESPERA_REINTENTO_LLM", 0.01)
+    servicio = ClasificadorLLM(tamano_lote=1)
+    yield servicio
+    servicio.cerrar()
+
+
+def error_api(clase):
+    # Sin la respuesta HTTP: solo importa el tipo de la excepción
+    error = Exception.__new__(clase)
+    Exception.__init__(error, "rechazada")
+    return error
+
+
+@pytest.mark.parametrize("error", [
+    error_api(openai.AuthenticationError),
+    error_api(openai.BadRequestError),
+])
+def test_errores_no_transitorios_no_se_reintentan(clasificador, error):
+    llamadas = []
+
+    async def llamar_uno(texto):
+        llamadas.append(texto)
+        raise error
+
+    clasificador._llamar_uno = llamar_uno
+    with pytest.raises(ErrorClasificacionLLM):
+        clasificador.clasificar("texto")
+
+    assert len(llamadas) == 1
+    assert clasificador.estadisticas["reintentos"] == 0
+
+
+def test_plazo_total_agotado_se_reporta_como_error_de_clasificacion(clasificador, monkeypatch):
+    monkeypatch.setattr(modulo, "REINTENTOS_LLM", 0)
+    monkeypatch.setattr(modulo, "TIMEOUT_LLM", 0.05)
+    cancelado = asyncio.Event()
+
+    async def encolar(texto):
+        try:
+            await asyncio.sleep(60)
+        except asyncio.CancelledError:
+            cancelado.set()
+            raise
+
+    clasificador._encolar = encolar
+    with pytest.raises(ErrorClasificacionLLM):
+        clasificador.clasificar("texto")
+
+    asyncio.run_coroutine_threadsafe(asyncio.wait_for(cancelado.wait(), 1), clasificador._loop).result(2)
+    assert clasificador.estadisticas["errores"] == 1
+
+
+def procesar_lote(clasificador, textos):
+    """Procesa un lote en el loop del servicio y devuelve la excepción o el resultado de cada texto."""
+    async def procesar():
+        futuros = [clasificador._loop.create_future() for _ in textos]
+        await clasificador._procesar_lote(list(zip(textos, futuros)))
+        return [futuro.exception() or futuro.result() for futuro in futuros]
+
+    return asyncio.run_coroutine_threadsafe(procesar(), clasificador._loop).result(2)
+
+
+def test_respuesta_de_lote_malformada_se_reporta_como_error_de_clasificacion(clasificador):
+    async def llamar_lote(textos):
+        # Respuesta sin "choices": no se puede interpretar
+        raise IndexError("list index out of range")
+
+    async def llamar_uno(texto):
+        if texto == "b":
+            raise KeyError("resultados")
+        return True
+
+    clasificador._llamar_lote = llamar_lote
+    clasificador._llamar_uno = llamar_uno
+    resultados = procesar_lote(clasificador, ["a", "b"])
+
+    assert resultados[0] is True
+    assert isinstance(resultados[1], ErrorClasificacionLLM)
+    assert isinstance(resultados[1].__cause__, KeyError)
+    assert clasificador.estadisticas["lotes_fallidos"] == 1
+
+
+def test_cancelacion_de_una_llamada_se_reporta_como_error_de_clasificacion(clasificador):
+    async def llamar_lote(textos):
+        raise ValueError("JSON inválido")
+
+    async def llamar_uno(texto):
+        raise asyncio.CancelledError()
+
+    clasificador._llamar_lote = llamar_lote
+    clasificador._llamar_uno = llamar_uno
+    resultados = procesar_lote(clasificador, ["a", "b"])
+
+    assert all(isinstance(resultado, ErrorClasificacionLLM) for resultado in resultados)
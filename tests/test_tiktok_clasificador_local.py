@@ -0,0 +1,111 @@
+"""
+Pruebas del clasificador local (entrenamiento, calibración y archivo del modelo).
+"""
+import json
+
+import numpy as np
+import pytest
+
+from app.api.agents.services.tiktok_service import tiktok_clasificador_local
+from app.api.agents.services.tiktok_service.tiktok_clasificador_local import (
+    ClasificadorLocal, _ajustar_platt, entrenar, leer_negativos, registrar_negativo
+)
+
+DIMENSION = 2 ** 12
+
+POSITIVOS = [
+    f"el candidato {candidato} habló del {tema} rumbo a las elecciones generales"
+    for candidato in ("de renovación popular", "de fuerza popular", "de alianza para el progreso", "del apra")
+    for tema in ("congreso", "jurado nacional de elecciones", "debate presidencial", "plan de gobierno")
+]
+NEGATIVOS = [
+    f"hoy les enseño {receta} con {ingrediente} para toda la familia"
+    for receta in ("una receta fácil", "un postre rápido", "un truco de cocina", "mi desayuno favorito")
+    for ingrediente in ("pollo", "chocolate", "quinua", "palta")
+]
+
+
+@pytest.fixture(scope="module")
+def clasificador():
+    return entrenar(POSITIVOS, NEGATIVOS, dimension=DIMENSION, epocas=100)
+
+
+def test_platt_no_diverge_con_puntajes_separables():
+    puntajes = np.array([6.0, 8.0, 6.0, 8.0, -6.0, -8.0, -6.0, -8.0])
+    etiquetas = np.array([1, 1, 1, 1, 0, 0, 0, 0], dtype=np.float64)
+
+    a, b = _ajustar_platt(puntajes, etiquetas)
+
+    assert np.isfinite(a) and np.isfinite(b)
+    assert 0 < a < 5
+    assert abs(b) < 1
+
+
+def test_platt_recupera_la_calibracion_de_puntajes_ruidosos():
+    rng = np.random.default_rng(0)
+    # Con clases N(1, 1) y N(-1, 1) la probabilidad exacta es sigmoide(2 * puntaje)
+    puntajes = np.concatenate([rng.normal(1, 1, 2000), rng.normal(-1, 1, 2000)])
+    etiquetas = np.concatenate([np.ones(2000), np.zeros(2000)])
+
+    a, b = _ajustar_platt(puntajes, etiquetas)
+
+    assert a == pytest.approx(2, abs=0.2)
+    assert b == pytest.approx(0, abs=0.2)
+
+
+def test_entrena_y_separa_las_clases(clasificador):
+    assert clasificador.clasificar("el debate presidencial de fuerza popular rumbo a las elecciones")
+    assert not clasificador.clasificar("un postre rápido con chocolate para la familia")
+    assert clasificador.metadatos["positivos"] == len(POSITIVOS)
+    assert clasificador.metadatos["negativos"] == len(NEGATIVOS)
+
+
+def test_entrenar_sin_alguna_clase_falla():
+    with pytest.raises(ValueError):
+        entrenar(POSITIVOS, [], dimension=DIMENSION, epocas=1)
+
+
+def test_guarda_y_carga_el_modelo(clasificador, tmp_path):
+    ruta = str(tmp_path / "modelo.npz")
+    clasificador.guardar(ruta)
+
+    cargado = ClasificadorLocal.cargar(ruta)
+
+    texto = "el jurado nacional de elecciones y el congreso"
+    assert cargado.probabilidad(texto) == pytest.approx(clasificador.probabilidad(texto))
+    assert cargado.platt == pytest.approx(clasificador.platt)
+    assert cargado.metadatos == clasificador.metadatos
+
+
+def test_rechaza_un_modelo_de_otro_formato(clasificador, tmp_path):
+    ruta = str(tmp_path / "modelo.npz")
+    metadatos = dict(clasificador.metadatos, formato=tiktok_clasificador_local.FORMATO_MODELO + 1)
+    ClasificadorLocal(clasificador.pesos, clasificador.sesgo, clasificador.platt, metadatos).guardar(ruta)
+
+    with pytest.raises(ValueError):
+        ClasificadorLocal.cargar(ruta)
+
+
+def test_registra_negativos_hasta_el_limite(tmp_path, monkeypatch):
+    ruta = tmp_path / "negativos.jsonl"
+    monkeypatch.setattr(tiktok_clasificador_local, "ARCHIVO_NEGATIVOS", str(ruta))
+
+    registrar_negativo("receta de ceviche")
+    registrar_negativo("   ")
+    assert leer_negativos(str(ruta)) == ["receta de ceviche"]
+
+    # Con el archivo en el tamaño máximo se deja de recolectar
+    monkeypatch.setattr(tiktok_clasificador_local, "MAX_MB_NEGATIVOS", ruta.stat().st_size / (1024 * 1024))
+    registrar_negativo("tutorial de maquillaje")
+    assert leer_negativos(str(ruta)) == ["receta de ceviche"]
+    with open(ruta, encoding="utf-8") as f:
+        assert [json.loads(linea) for linea in f] == [{"texto": "receta de ceviche"}]
+
+
+def test_sin_archivo_de_negativos_no_registra(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiktok_clasificador_local, "ARCHIVO_NEGATIVOS", "")
+    monkeypatch.chdir(tmp_path)
+
+    registrar_negativo("receta de ceviche")
+
+    assert list(tmp_path.iterdir()) == []
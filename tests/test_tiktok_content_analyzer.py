@@ -0,0 +1,106 @@
+"""
+Pruebas del bucle de captura y análisis de subtítulos (sin navegador ni OpenAI).
+"""
+from concurrent.futures import Future
+
+import pytest
+
+from app.api.agents.services.tiktok_service import tiktok_content_analyzer, tiktok_data_extractor
+from app.api.agents.services.tiktok_service.tiktok_clasificador_llm import ErrorClasificacionLLM
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import CONSULTAR
+
+
+class EtapaFija:
+    """Etapa de clasificación que resuelve cada envío con el mismo resultado o error."""
+
+    def __init__(self, resultado=None, error=None):
+        self.resultado = resultado
+        self.error = error
+        self.envios = 0
+
+    def enviar(self, textos):
+        self.envios += 1
+        futuro = Future()
+        if self.error is not None:
+            futuro.set_exception(self.error)
+        else:
+            futuro.set_result(self.resultado)
+        return futuro
+
+
+class PrefiltroIndeciso:
+    def evaluar(self, texto):
+        return CONSULTAR
+
+
+@pytest.fixture
+def captura(monkeypatch):
+    """Prepara un video con un subtítulo y devuelve una función para instalar la etapa de clasificación."""
+    lotes = [{"items": [{"texto": "el congreso debatió la vacancia", "t": 1}], "presente": True}]
+    monkeypatch.setattr(tiktok_data_extractor, "extraer_descripcion_video",
+                        lambda driver: {"texto_completo": "", "hashtags": []})
+    monkeypatch.setattr(tiktok_content_analyzer, "DECISION_POR_DESCRIPCION", False)
+    monkeypatch.setattr(tiktok_content_analyzer, "INTERVALO_DRENADO", 0.01)
+    monkeypatch.setattr(tiktok_content_analyzer, "instalar_colector_subtitulos", lambda driver: None)
+    monkeypatch.setattr(tiktok_content_analyzer, "drenar_subtitulos",
+                        lambda driver: lotes.pop() if lotes else {"items": [], "presente": False})
+    monkeypatch.setattr(tiktok_content_analyzer, "obtener_prefiltro", lambda: PrefiltroIndeciso())
+    monkeypatch.setattr(tiktok_content_analyzer, "registrar_negativo", lambda texto: None)
+
+    def con_etapa(etapa):
+        monkeypatch.setattr(tiktok_content_analyzer, "obtener_etapa_clasificacion", lambda: etapa)
+        return etapa
+    return con_etapa
+
+
+def test_un_veredicto_negativo_termina_la_captura(captura):
+    etapa = captura(EtapaFija(resultado=False))
+
+    resultado = tiktok_content_analyzer.capturar_y_analizar_subtitulos(None, tiempo_minimo_segundos=0.2)
+
+    assert resultado["es_politico"] is False
+    assert resultado["error_clasificacion"] is False
+    assert etapa.envios == 1
+
+
+def test_un_error_de_clasificacion_no_termina_la_captura_como_negativo(captura, monkeypatch):
+    monkeypatch.setattr(tiktok_content_analyzer, "MAX_CAPTURA_COMPLETA_SEGUNDOS", 0.5)
+    captura(EtapaFija(error=ErrorClasificacionLLM("OpenAI no respondió")))
+
+    resultado = tiktok_content_analyzer.capturar_y_analizar_subtitulos(None, tiempo_minimo_segundos=0.2)
+
+    assert resultado["es_politico"] is False
+    assert resultado["error_clasificacion"] is True
+    # Sin veredicto la captura sigue hasta el límite, a la espera de reintentar
+    assert resultado["tiempo_captura"] >= 0.5
+
+
+class LocalRegistrador:
+    """Modelo local seguro de todo lo que ve, que anota los textos que recibe."""
+
+    def __init__(self):
+        self.textos = []
+
+    def probabilidad(self, texto):
+        self.textos.append(texto)
+        return 0.99
+
+
+def test_el_modelo_local_ve_solo_subtitulos_como_en_el_entrenamiento(monkeypatch):
+    local = LocalRegistrador()
+    monkeypatch.setattr(tiktok_content_analyzer, "CLASIFICADOR_PRINCIPAL", "local")
+    monkeypatch.setattr(tiktok_content_analyzer, "obtener_clasificador_local", lambda: local)
+
+    assert tiktok_content_analyzer.analizar_contenido_politico("debate presidencial", "#elecciones2026") is True
+    assert local.textos == ["debate presidencial"]
+
+
+def test_sin_subtitulos_no_se_consulta_el_modelo_local(monkeypatch):
+    local = LocalRegistrador()
+    monkeypatch.setattr(tiktok_content_analyzer, "CLASIFICADOR_PRINCIPAL", "local")
+    monkeypatch.setattr(tiktok_content_analyzer, "obtener_clasificador_local", lambda: local)
+    monkeypatch.setattr(tiktok_content_analyzer, "_clasificar_con_openai",
+                        lambda texto_subtitulos, texto_descripcion: False)
+
+    assert tiktok_content_analyzer.analizar_contenido_politico("", "receta de ceviche sin subtítulos 2026") is False
+    assert local.textos == []
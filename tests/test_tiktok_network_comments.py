@@ -0,0 +1,222 @@
+"""
+Pruebas del parseo de /api/comment/list/ con respuestas grabadas en tests/fixtures/comentarios_api.
+"""
+import base64
+import json
+import os
+from datetime import datetime
+
+import pytest
+
+from app.api.agents.services.tiktok_service.tiktok_network_comments import (
+    ColectorComentariosRed, extraer_comentarios_red, parsear_respuesta_comentarios, vaciar_log_red
+)
+
+DIRECTORIO_FIXTURES = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "comentarios_api")
+VIDEO_ID = "7501847835747388727"
+URL_API = f"https://www.tiktok.com/api/comment/list/?aweme_id={VIDEO_ID}&count=20&cursor=0"
+
+
+def cargar_fixture(nombre):
+    with open(os.path.join(DIRECTORIO_FIXTURES, nombre), "r", encoding="utf-8") as f:
+        return f.read()
+
+
+def fecha_local(timestamp):
+    return datetime.fromtimestamp(timestamp).strftime('%Y-%m-%d %H:%M:%S')
+
+
+class DriverLogRendimiento:
+    """Driver mínimo que devuelve un log de rendimiento de Chrome con las respuestas indicadas."""
+
+    def __init__(self, respuestas):
+        self.cuerpos = {}
+        self.log = []
+        for url, cuerpo in respuestas:
+            self.agregar_respuesta(url, cuerpo)
+
+    def agregar_respuesta(self, url, cuerpo):
+        request_id = f"1000.{len(self.cuerpos)}"
+        self.cuerpos[request_id] = cuerpo
+        self.log.append(self._entrada("Network.responseReceived",
+                                      {"requestId": request_id, "response": {"url": url}}))
+        self.log.append(self._entrada("Network.loadingFinished", {"requestId": request_id}))
+
+    @staticmethod
+    def _entrada(metodo, params):
+        return {"message": json.dumps({"message": {"method": metodo, "params": params}})}
+
+    def get_log(self, tipo):
+        assert tipo == "performance"
+        log, self.log = self.log, []
+        return log
+
+    def execute_cdp_cmd(self, comando, params):
+        assert comando == "Network.getResponseBody"
+        cuerpo = self.cuerpos[params["requestId"]]
+        return {"body": base64.b64encode(cuerpo.encode("utf-8")).decode("ascii"), "base64Encoded": True}
+
+
+class DriverConScroll(DriverLogRendimiento):
+    """Driver que entrega la primera página de inmediato y una página más por cada scroll."""
+
+    def __init__(self, paginas):
+        super().__init__([paginas[0]])
+        self.siguientes = list(paginas[1:])
+        self.scrolls = 0
+
+    def execute_script(self, script, *args):
+        self.scrolls += 1
+        if self.siguientes:
+            self.agregar_respuesta(*self.siguientes.pop(0))
+        return True
+
+
+def test_mapea_los_campos_de_cada_comentario():
+    comentarios, total, hay_mas = parsear_respuesta_comentarios(json.loads(cargar_fixture("pagina_1.json")))
+
+    assert total == 5
+    assert hay_mas is True
+    assert comentarios[0] == {
+        'id': "7501900112233445566",
+        'usuario': "rosa.quispe",
+        'contenido': "Por fin alguien lo dice claro 👏",
+        'likes': 1520,
+        'respuestas': 14,
+        'fecha': fecha_local(1746720000),
+        'fecha_exacta': fecha_local(1746720000)
+    }
+    # Sin unique_id se usa el nickname
+    assert comentarios[2]['usuario'] == "mili"
+
+
+def test_ultima_pagina_sin_has_more():
+    comentarios, total, hay_mas = parsear_respuesta_comentarios(json.loads(cargar_fixture("pagina_2.json")))
+
+    assert len(comentarios) == 3
+    assert total == 5
+    assert hay_mas is False
+
+
+def test_respuesta_sin_comentarios_ni_total():
+    comentarios, total, hay_mas = parsear_respuesta_comentarios(json.loads(cargar_fixture("sin_comentarios.json")))
+
+    assert comentarios == []
+    assert total is None
+    assert hay_mas is False
+
+
+def test_campos_faltantes_o_invalidos_usan_valores_por_defecto():
+    comentarios, total, hay_mas = parsear_respuesta_comentarios(json.loads(cargar_fixture("campos_incompletos.json")))
+
+    assert total is None
+    assert comentarios[0] == {
+        'id': None,
+        'usuario': "Desconocido",
+        'contenido': "",
+        'likes': 0,
+        'respuestas': 0,
+        'fecha': "",
+        'fecha_exacta': None
+    }
+    assert comentarios[1]['id'] == "7501900112233445571"
+    assert comentarios[1]['usuario'] == "Desconocido"
+    assert comentarios[1]['likes'] == 42
+    assert comentarios[1]['respuestas'] == 3
+
+
+def test_colector_descarta_duplicados_entre_paginas():
+    colector = ColectorComentariosRed(VIDEO_ID)
+
+    assert colector.procesar_cuerpo(json.loads(cargar_fixture("pagina_1.json"))) == 3
+    assert colector.hay_mas is True
+    # La segunda página repite el último comentario de la primera
+    assert colector.procesar_cuerpo(json.loads(cargar_fixture("pagina_2.json"))) == 2
+
+    ids = [comentario['id'] for comentario in colector.comentarios]
+    assert len(ids) == len(set(ids)) == 5
+    assert colector.total == 5
+    assert colector.hay_mas is False
+    assert colector.respuestas_procesadas == 2
+
+
+def test_colector_conserva_el_total_si_una_pagina_no_lo_trae():
+    colector = ColectorComentariosRed(VIDEO_ID)
+    colector.procesar_cuerpo(json.loads(cargar_fixture("pagina_1.json")))
+    colector.procesar_cuerpo(json.loads(cargar_fixture("sin_comentarios.json")))
+
+    assert colector.total == 5
+    assert colector.hay_mas is False
+
+
+def test_recolectar_lee_las_respuestas_del_log_de_rendimiento():
+    driver = DriverLogRendimiento([
+        (URL_API, cargar_fixture("pagina_1.json")),
+        (URL_API.replace("cursor=0", "cursor=3"), cargar_fixture("pagina_2.json")),
+        # Comentarios de otro video y otras peticiones se ignoran
+        (URL_API.replace(VIDEO_ID, "7000000000000000000"), cargar_fixture("pagina_1.json")),
+        ("https://www.tiktok.com/api/recommend/item_list/", "{}"),
+    ])
+    colector = ColectorComentariosRed(VIDEO_ID)
+
+    assert colector.recolectar(driver) == 5
+    assert colector.respuestas_procesadas == 2
+    assert colector.total == 5
+
+
+@pytest.mark.parametrize("cuerpo", [cargar_fixture("truncado.json"), "", "<html>captcha</html>"])
+def test_recolectar_ignora_cuerpos_malformados(cuerpo, capsys):
+    driver = DriverLogRendimiento([(URL_API, cuerpo), (URL_API, cargar_fixture("pagina_2.json"))])
+    colector = ColectorComentariosRed(VIDEO_ID)
+
+    assert colector.recolectar(driver) == 3
+    assert colector.respuestas_procesadas == 1
+    assert "No se pudo leer la respuesta de comentarios" in capsys.readouterr().out
+
+
+def test_vaciar_log_red_descarta_las_respuestas_de_videos_anteriores():
+    driver = DriverLogRendimiento([(URL_API, cargar_fixture("pagina_1.json"))])
+    vaciar_log_red(driver)
+    colector = ColectorComentariosRed(None)
+
+    assert colector.recolectar(driver) == 0
+    assert colector.respuestas_procesadas == 0
+
+
+def test_extraer_entrega_cada_pagina_en_cuanto_llega():
+    driver = DriverConScroll([
+        (URL_API, cargar_fixture("pagina_1.json")),
+        (URL_API.replace("cursor=0", "cursor=3"), cargar_fixture("pagina_2.json")),
+    ])
+    entregas = []
+
+    resultado = extraer_comentarios_red(driver, VIDEO_ID, entregas.append)
+
+    assert [len(pagina) for pagina in entregas] == [3, 2]
+    assert resultado == {"total": 5, "total_video": 5, "motivo": "fin"}
+
+
+def test_extraer_para_al_alcanzar_el_limite_sin_pedir_mas_paginas():
+    driver = DriverConScroll([
+        (URL_API, cargar_fixture("pagina_1.json")),
+        (URL_API.replace("cursor=0", "cursor=3"), cargar_fixture("pagina_2.json")),
+    ])
+    entregas = []
+
+    resultado = extraer_comentarios_red(driver, VIDEO_ID, entregas.append, limite=2)
+
+    assert [len(pagina) for pagina in entregas] == [2]
+    assert resultado["motivo"] == "objetivo"
+    assert driver.scrolls == 0
+
+
+def test_extraer_para_al_agotar_el_presupuesto():
+    driver = DriverConScroll([
+        (URL_API, cargar_fixture("pagina_1.json")),
+        (URL_API.replace("cursor=0", "cursor=3"), cargar_fixture("pagina_2.json")),
+    ])
+
+    resultado = extraer_comentarios_red(driver, VIDEO_ID, lambda pagina: None, presupuesto_segundos=0)
+
+    assert resultado == {"total": 3, "total_video": 5, "motivo": "presupuesto"}
+    assert driver.scrolls == 0
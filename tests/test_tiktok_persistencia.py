@@ -0,0 +1,139 @@
+"""
+Pruebas del derrame a disco del persistidor diferido (sin base de datos).
+"""
+import json
+import os
+
+from app.api.agents.services.tiktok_service import tiktok_persistencia
+from app.api.agents.services.tiktok_service.tiktok_persistencia import PersistidorDiferido
+
+# PID fuera del rango de Linux: ningún proceso vivo lo tiene
+PID_TERMINADO = 99999999
+
+
+def escribir_derrame(ruta, registros):
+    with open(ruta, "w", encoding="utf-8") as f:
+        for numero, registro in enumerate(registros):
+            f.write(json.dumps({"clave": f"anterior-{numero}", "registro": registro}) + "\n")
+
+
+def guardar_en(guardados):
+    def guardar(registros):
+        guardados.extend(registros)
+        return [registro["n"] for registro in registros]
+    return guardar
+
+
+def test_cada_proceso_derrama_en_su_propio_archivo(tmp_path):
+    base = str(tmp_path / "derrame.jsonl")
+    persistidor = PersistidorDiferido(guardar=guardar_en([]), archivo_derrame=base)
+    try:
+        assert persistidor.archivo_derrame == f"{base}.{os.getpid()}"
+    finally:
+        persistidor.cerrar(timeout=1)
+
+
+def test_adopta_los_derrames_de_procesos_terminados(tmp_path):
+    base = str(tmp_path / "derrame.jsonl")
+    escribir_derrame(base, [{"tipo": "video", "n": 1}])
+    escribir_derrame(f"{base}.{PID_TERMINADO}", [{"tipo": "video", "n": 2}, {"tipo": "video", "n": 3}])
+    # El archivo de un proceso vivo (el padre de las pruebas) no se toca
+    vivo = f"{base}.{os.getppid()}"
+    escribir_derrame(vivo, [{"tipo": "video", "n": 4}])
+
+    guardados = []
+    persistidor = PersistidorDiferido(guardar=guardar_en(guardados), archivo_derrame=base)
+    futuro = persistidor.enviar({"tipo": "video", "n": 5})
+    persistidor.cerrar(timeout=5)
+
+    assert futuro.result(timeout=1) == 5
+    assert [registro["n"] for registro in guardados] == [1, 2, 3, 5]
+    assert not os.path.exists(base)
+    assert not os.path.exists(f"{base}.{PID_TERMINADO}")
+    assert os.path.getsize(vivo) > 0
+    assert not os.path.exists(persistidor.archivo_derrame)
+
+
+def test_recupera_el_derrame_por_lotes_y_descarta_lo_guardado(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiktok_persistencia, "ESPERA_LOTE_PERSISTIDOR", 0.05)
+    base = str(tmp_path / "derrame.jsonl")
+    escribir_derrame(f"{base}.{PID_TERMINADO}", [{"tipo": "video", "n": n} for n in range(7)])
+    propio = f"{base}.{os.getpid()}"
+
+    lotes = []
+    lineas_pendientes = []
+
+    def guardar(registros):
+        lotes.append([registro["n"] for registro in registros])
+        with open(propio, "rb") as f:
+            f.seek(tiktok_persistencia._leer_posicion(propio))
+            lineas_pendientes.append(len(f.readlines()))
+        return [registro["n"] for registro in registros]
+
+    persistidor = PersistidorDiferido(guardar=guardar, tamano_lote=3, archivo_derrame=base)
+    persistidor.cerrar(timeout=5)
+
+    assert lotes == [[0, 1, 2], [3, 4, 5], [6]]
+    # Cada lote guardado sale del archivo antes de leer el siguiente
+    assert lineas_pendientes == [7, 4, 1]
+    assert not os.path.exists(propio)
+    assert not os.path.exists(propio + ".pos")
+
+
+def test_retoma_un_derrame_desde_la_posicion_guardada(tmp_path):
+    base = str(tmp_path / "derrame.jsonl")
+    huerfano = f"{base}.{PID_TERMINADO}"
+    escribir_derrame(huerfano, [{"tipo": "video", "n": 1}, {"tipo": "video", "n": 2}])
+    with open(huerfano, "rb") as f:
+        primera_linea = len(f.readline())
+    with open(huerfano + ".pos", "w", encoding="utf-8") as f:
+        f.write(str(primera_linea))
+
+    guardados = []
+    persistidor = PersistidorDiferido(guardar=guardar_en(guardados), archivo_derrame=base)
+    persistidor.cerrar(timeout=5)
+
+    assert [registro["n"] for registro in guardados] == [2]
+    assert not os.path.exists(huerfano + ".pos")
+
+
+def test_rechaza_sin_reintentar_los_errores_que_no_son_de_conexion(tmp_path):
+    base = str(tmp_path / "derrame.jsonl")
+    llamadas = []
+
+    def guardar(registros):
+        llamadas.append(len(registros))
+        if any(registro.get("invalido") for registro in registros):
+            raise ValueError("dato inválido")
+        return [registro["n"] for registro in registros]
+
+    persistidor = PersistidorDiferido(guardar=guardar, archivo_derrame=base)
+    futuros = [persistidor.enviar({"tipo": "video", "n": n, "invalido": n == 1}) for n in range(3)]
+    persistidor.cerrar(timeout=5)
+
+    assert futuros[0].result(timeout=1) == 0
+    assert isinstance(futuros[1].exception(timeout=1), ValueError)
+    assert futuros[2].result(timeout=1) == 2
+    estadisticas = persistidor.obtener_estadisticas()
+    assert estadisticas["reintentos"] == 0
+    assert estadisticas["rechazados"] == 1
+    with open(persistidor.archivo_derrame + ".rechazados", encoding="utf-8") as f:
+        rechazos = [json.loads(linea) for linea in f]
+    assert [rechazo["registro"]["n"] for rechazo in rechazos] == [1]
+
+
+def test_reintenta_los_errores_de_conexion(tmp_path, monkeypatch):
+    monkeypatch.setattr(tiktok_persistencia, "REINTENTO_BASE_SEGUNDOS", 0.01)
+    fallos = [ConnectionError("sin conexión")]
+
+    def guardar(registros):
+        if fallos:
+            raise fallos.pop()
+        return [registro["n"] for registro in registros]
+
+    persistidor = PersistidorDiferido(guardar=guardar, archivo_derrame="")
+    futuro = persistidor.enviar({"tipo": "video", "n": 1})
+    persistidor.cerrar(timeout=5)
+
+    assert futuro.result(timeout=1) == 1
+    assert persistidor.obtener_estadisticas()["reintentos"] == 1
@@ -0,0 +1,68 @@
+"""
+Pruebas del prefiltro local de contenido político.
+"""
+import pytest
+
+from app.api.agents.services.tiktok_service.tiktok_prefiltro import (
+    AutomataPatrones, PrefiltroPolitico, normalizar_texto, SI, NO, CONSULTAR
+)
+
+
+@pytest.fixture
+def prefiltro():
+    return PrefiltroPolitico()
+
+
+def test_normalizar_texto_quita_tildes_signos_y_mayusculas():
+    assert normalizar_texto("¡ÓNPE: Elecciones-Perú #2026!") == "onpe elecciones peru 2026"
+
+
+def test_automata_encuentra_patrones_solapados():
+    automata = AutomataPatrones({"he": 1, "she": 2, "hers": 3, "his": 4})
+    encontrados = sorted((fin, patron) for fin, patron, _ in automata.buscar("ushers"))
+    assert encontrados == [(3, "he"), (3, "she"), (5, "hers")]
+
+
+@pytest.mark.parametrize("texto", [
+    "Keiko Fujimori presentó su plan de gobierno",
+    "Rafael López Aliaga en el mitin",
+    "#keikofujimori #fyp",
+    "Rumbo a las Elecciones Generales 2026",
+    "#peru2026",
+])
+def test_nombre_completo_o_proceso_2026_es_si(prefiltro, texto):
+    assert prefiltro.evaluar(texto) == SI
+
+
+@pytest.mark.parametrize("texto", [
+    "Tengo un nuevo perú",
+    "Alberto Fujimori murió",
+    "Carlos Alvarez humor",
+    "acción popular",
+    "país para todos",
+    "fuerza popular",
+    "Keiko ya llegó",
+    "Elecciones 2026 en Colombia",
+    "el debate de anoche",
+])
+def test_partidos_apellidos_y_vocabulario_generico_se_consultan(prefiltro, texto):
+    assert prefiltro.evaluar(texto) == CONSULTAR
+
+
+@pytest.mark.parametrize("texto", [
+    "receta de ceviche con leche de tigre",
+    "peanut butter",
+    "",
+])
+def test_sin_vocabulario_politico_es_no(prefiltro, texto):
+    assert prefiltro.evaluar(texto) == NO
+
+
+def test_estadisticas_cuentan_lo_resuelto_localmente(prefiltro):
+    prefiltro.evaluar("Keiko Fujimori")
+    prefiltro.evaluar("receta de ceviche")
+    prefiltro.evaluar("el debate")
+
+    estadisticas = prefiltro.obtener_estadisticas()
+    assert estadisticas["evaluaciones"] == 3
+    assert estadisticas["tasa_resuelta_local"] == round(2 / 3, 3)
@@ -0,0 +1,37 @@
+"""
+Pruebas del filtro de videos ya vistos (sin base de datos).
+"""
+from concurrent.futures import Future
+
+from app.api.agents.services.tiktok_service.tiktok_vistos import FiltroVideosVistos
+
+VIDEO_ID = "7501847835747388727"
+
+
+def test_marca_el_video_cuando_queda_guardado():
+    filtro = FiltroVideosVistos()
+    futuro = Future()
+    filtro.agregar_al_guardar(VIDEO_ID, futuro)
+
+    assert not filtro.contiene(VIDEO_ID)
+    futuro.set_result({"scrapper_result_id": 42, "video_id": VIDEO_ID})
+    assert filtro.contiene(VIDEO_ID)
+
+
+def test_no_marca_el_video_guardado_sin_scrapper_result_id():
+    # Sin URL o nombre del canal el guardado termina bien pero no inserta el video
+    filtro = FiltroVideosVistos()
+    futuro = Future()
+    filtro.agregar_al_guardar(VIDEO_ID, futuro)
+    futuro.set_result({"scrapper_result_id": None, "channel_id": None, "video_id": VIDEO_ID})
+
+    assert not filtro.contiene(VIDEO_ID)
+
+
+def test_no_marca_el_video_rechazado():
+    filtro = FiltroVideosVistos()
+    futuro = Future()
+    filtro.agregar_al_guardar(VIDEO_ID, futuro)
+    futuro.set_exception(ValueError("registro inválido"))
+
+    assert not filtro.contiene(VIDEO_ID)